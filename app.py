@@ -1,8 +1,5 @@
 import streamlit as st
 import os
-import tempfile
-import pandas as pd
-import plotly.express as px
 from datetime import datetime
 import json
 import time
@@ -16,10 +13,11 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 # Import local modules
 from auth import show_auth, logout
-from models import User, Job, Analysis
-from resume_parser import extract_text, extract_name, extract_contact_info
-from similarity import analyze_resumes, serialize_results, deserialize_results
-from database import init_db, get_db_connection
+from models import User, Job, Analysis, AnalysisQueue
+from model_registry import warm_up, MODEL_WARMUP
+from talent_pool import search_talent_pool
+from database import init_db
+import scheduler
 
 # Initialize database
 init_db()
@@ -31,25 +29,227 @@ st.set_page_config(
     layout="wide"
 )
 
-# Load skills database
-with open("skills_db.txt") as f:
-    SKILLS_DB = [line.strip() for line in f.readlines()]
-
 # ----- Authentication -----
 if not show_auth():
     st.stop()
 
+# Heavy imports and model loading wait until after login so the login page renders fast
+import pandas as pd
+import plotly.express as px
+from resume_parser import content_hash
+from archive_ingest import archive_type, count_members
+from similarity import analysis_fingerprint
+from skill_matcher import get_skill_matcher
+
+# Analyses run in workers; the UI itself only embeds job descriptions for talent pool searches
+if MODEL_WARMUP:
+    warm_up(["sbert", "embedding_store", "talent_pool"])
+
 # User is authenticated
 user = st.session_state['user']
 subscription_limit = User(user['email'], "").get_subscription_limit()  # Get subscription limits
 
+# ----- Helpers -----
+QUEUE_POLL_SECONDS = 2
+HISTORY_PAGE_SIZE = 20
+RESULTS_PAGE_SIZE = 50
+SKILLS_DB_PATH = os.getenv("SKILLS_DB_PATH", "skills_db.txt")
+
+def show_file_problems(unreadable, degraded, skipped=None):
+    """Warn about files that could not be read, hit a parser limit or were skipped in an archive"""
+    if skipped:
+        st.warning(f"Skipped {len(skipped)} file(s) in the archive")
+        st.dataframe(pd.DataFrame([{"File": s['file_name'], "Reason": s['reason']} for s in skipped]),
+                     hide_index=True, use_container_width=True)
+    if unreadable:
+        st.warning(f"Could not read {len(unreadable)} file(s): {', '.join(unreadable)}")
+    if degraded:
+        st.warning(f"{len(degraded)} file(s) hit a parser limit; files without text were not scored")
+        st.dataframe(pd.DataFrame([{
+            "File": d['file_name'],
+            "Limit": d['limit'],
+            "Details": d['reason'],
+            "Scored": "Yes (partial text)" if d['scored'] else "No"
+        } for d in degraded]), hide_index=True, use_container_width=True)
+
+def show_analysis_progress(queue_id):
+    """Per-stage status of a queued analysis; re-run periodically as a fragment"""
+    queued = AnalysisQueue.get(queue_id)
+    if queued['status'] not in ("queued", "running"):
+        st.rerun()
+    
+    if queued['status'] == "queued":
+        ahead = AnalysisQueue.position(queue_id)
+        waited = time.time() - queued['submitted_at']
+        st.info(f"Analysis queued, waiting for a worker ({ahead} ahead of it, waiting {waited:.0f}s)...")
+    st.progress(queued['progress'], text=f"Processing ({queued['stage'] or 'queued'})")
+    current = AnalysisQueue.STAGES.index(queued['stage']) if queued['stage'] in AnalysisQueue.STAGES else -1
+    for i, stage in enumerate(AnalysisQueue.STAGES):
+        if queued['status'] == "running" and i < current:
+            st.write(f"✅ {stage.capitalize()}")
+        elif queued['status'] == "running" and i == current:
+            st.write(f"⏳ {stage.capitalize()}...")
+        else:
+            st.write(f"⬜ {stage.capitalize()}")
+    
+    # Live leaderboard from the batches scored so far
+    details = queued['details']
+    if details.get('leaderboard'):
+        col1, col2 = st.columns(2)
+        col1.metric("Resumes Scored", details['summary']['total_resumes'])
+        col2.metric("Average Score So Far", f"{details['summary']['average_score']:.1f}/100")
+        st.dataframe(pd.DataFrame([{
+            "Rank": idx+1,
+            "Candidate": r['candidate_name'],
+            "Score": f"{r['score']:.1f}/100",
+            "File": r['file_name']
+        } for idx, r in enumerate(details['leaderboard'])]), hide_index=True, use_container_width=True)
+
+def _results_table(results):
+    return pd.DataFrame([{
+        "Rank": r['rank'],
+        "Candidate": r['candidate_name'],
+        "Score": f"{r['score']:.1f}/100",
+        "Matched Skills": len(r['matched_skills']),
+        "Missing Skills": len(r['missing_skills']),
+        "Contact": r['contact']['email'] or r['contact']['phone'] or "N/A",
+        "File": r['file_name']
+    } for r in results])
+
+def render_results(analysis_id):
+    """Summary, charts, ranked table and candidate details of one stored analysis
+
+    Only the selected page of candidates is loaded and rendered, so the
+    page costs the same however many resumes the analysis holds.
+    """
+    summary = Analysis.get_summary(analysis_id)
+    result_count = Analysis.count_results(analysis_id)
+    st.subheader("Analysis Summary")
+    
+    # Summary metrics
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Total Resumes", summary['total_resumes'])
+    col2.metric("Average Score", f"{summary['average_score']:.1f}/100")
+    top = Analysis.get_results(analysis_id, limit=1)
+    top_candidate = top[0]['candidate_name'] if top else "N/A"
+    col3.metric("Top Candidate", top_candidate)
+    
+    # Score distribution, binned in the database
+    st.subheader("Score Distribution")
+    histogram = pd.DataFrame(Analysis.get_score_histogram(analysis_id), columns=['Score', 'Resumes'])
+    fig = px.bar(histogram, x='Score', y='Resumes')
+    fig.update_traces(width=5, offset=0)
+    fig.update_xaxes(range=[0, 100])
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Top missing skills
+    if summary['top_missing_skills']:
+        st.subheader("Top Missing Skills Across Resumes")
+        missing_df = pd.DataFrame(summary['top_missing_skills'], columns=['Skill', 'Count'])
+        st.bar_chart(missing_df.set_index('Skill'))
+    
+    # Results table and details, one page of ranked candidates at a time
+    st.subheader("Ranked Resumes")
+    pages = max(1, (result_count - 1) // RESULTS_PAGE_SIZE + 1)
+    page = st.number_input(f"Page (of {pages}, {RESULTS_PAGE_SIZE} candidates each)", min_value=1,
+                           max_value=pages, value=1, key=f"analysis_page_{analysis_id}")
+    results = Analysis.get_results(analysis_id, offset=(page - 1) * RESULTS_PAGE_SIZE, limit=RESULTS_PAGE_SIZE)
+    st.dataframe(_results_table(results), hide_index=True, use_container_width=True)
+    
+    # Detailed view
+    st.subheader("Candidate Details")
+    for res in results:
+        with st.expander(f"{res['rank']}. {res['candidate_name']} - {res['score']:.1f}/100"):
+            col1, col2 = st.columns([1, 1])
+            with col1:
+                st.subheader("✅ Matched Skills")
+                if res['matched_skills']:
+                    st.write(", ".join(res['matched_skills']))
+                else:
+                    st.info("No skills matched")
+            
+            with col2:
+                st.subheader("⚠️ Missing Skills")
+                if res['missing_skills']:
+                    st.write(", ".join(res['missing_skills']))
+                else:
+                    st.success("No missing skills - perfect match!")
+            
+            # Contact info
+            contact_info = []
+            if res['contact']['email']:
+                contact_info.append(f"✉️ {res['contact']['email']}")
+            if res['contact']['phone']:
+                contact_info.append(f"📞 {res['contact']['phone']}")
+            
+            if contact_info:
+                st.write(" | ".join(contact_info))
+    
+    # Export options; the full result set is only read when the button is clicked
+    st.download_button(
+        "Export Results as CSV",
+        lambda: _results_table(Analysis.get_results(analysis_id)).to_csv(index=False),
+        f"resume_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        "text/csv"
+    )
+
+def render_multi_results(result):
+    """Candidate-by-role matrix, best-fit roles and per-role shortlists"""
+    titles, candidates = result['titles'], result['candidates']
+    col1, col2 = st.columns(2)
+    col1.metric("Candidates", len(candidates))
+    col2.metric("Open Roles", len(titles))
+    
+    # Candidate x role heatmap
+    st.subheader("Match Matrix")
+    labels = [f"{c['candidate_name']} ({c['file_name']})" for c in candidates]
+    fig = px.imshow([c['scores'] for c in candidates], x=titles, y=labels, text_auto=".0f",
+                    color_continuous_scale="Blues", aspect="auto", labels={'color': 'Score'})
+    fig.update_layout(height=max(300, 28 * len(candidates)))
+    st.plotly_chart(fig, use_container_width=True)
+    
+    # Best fit per candidate, with every role's score
+    st.subheader("Best-Fit Role per Candidate")
+    matrix_df = pd.DataFrame([{
+        "Candidate": c['candidate_name'],
+        "Best-Fit Role": c['best_role'],
+        "Best Score": c['best_score'],
+        **{title: score for title, score in zip(titles, c['scores'])},
+        "Contact": c['contact']['email'] or c['contact']['phone'] or "N/A",
+        "File": c['file_name']
+    } for c in candidates]).sort_values("Best Score", ascending=False)
+    st.dataframe(matrix_df, hide_index=True, use_container_width=True)
+    
+    # Shortlist and common gaps per role
+    st.subheader("Roles")
+    for j, role in enumerate(result['roles']):
+        with st.expander(f"{role['title']} - average {role['average_score']:.1f}/100, "
+                         f"best fit for {role['best_fit_count']} candidate(s)"):
+            st.dataframe(pd.DataFrame([{
+                "Rank": rank + 1,
+                "Candidate": candidates[i]['candidate_name'],
+                "Score": f"{candidates[i]['scores'][j]:.1f}/100",
+                "Missing Skills": ", ".join(candidates[i]['missing_skills'][j]) or "None"
+            } for rank, i in enumerate(role['ranking'][:10])]), hide_index=True, use_container_width=True)
+            if role['top_missing_skills']:
+                st.caption("Most common gaps: " + ", ".join(
+                    f"{skill} ({count})" for skill, count in role['top_missing_skills']))
+    
+    st.download_button(
+        "Export Matrix as CSV",
+        matrix_df.to_csv(index=False),
+        f"multi_role_matching_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
+        "text/csv"
+    )
+
 # ----- Main App -----
 st.title("📄 ResumeRanker Pro")
 st.subheader(f"Welcome, {user['email']}")
 st.caption(f"Subscription: {user['subscription_level'].upper()} | Resumes per job: {subscription_limit}")
 
 # Navigation
-tab1, tab2, tab3, tab4 = st.tabs(["Analyze Resumes", "Analysis History", "Account Settings", "Documentation"])
+tab1, tab_multi, tab2, tab3, tab4 = st.tabs(["Analyze Resumes", "Multi-Role Matching", "Analysis History",
+                                             "Account Settings", "Documentation"])
 
 with tab1:  # Analyze Resumes Tab
     st.header("Analyze Resumes")
@@ -71,197 +271,222 @@ with tab1:  # Analyze Resumes Tab
         if jd_file:
             job_desc_text = jd_file.read().decode("utf-8")
     
+    # Talent Pool Search
+    with st.expander("🔎 Search past candidates for this job"):
+        pool_scope = f"company {user['company']}" if user.get('company') else "your account"
+        st.caption(f"Searches every resume previously analyzed by {pool_scope}")
+        pool_k = st.slider("Candidates to show", 5, 50, 10, key="pool_k")
+        if st.button("Search Talent Pool", disabled=not job_desc_text):
+            with scheduler.priority(user['subscription_level']):
+                matches = search_talent_pool(job_desc_text, k=pool_k, user_id=user['id'],
+                                             company=user.get('company'))
+            if matches:
+                st.dataframe(pd.DataFrame([{
+                    "Candidate": m['candidate_name'],
+                    "Score": f"{m['score']:.1f}/100",
+                    "Contact": m['email'] or m['phone'] or "N/A",
+                    "File": m['file_name'],
+                    "Added": m['created_at']
+                } for m in matches]), hide_index=True, use_container_width=True)
+            else:
+                st.info("No past candidates found")
+    
     # Resume Upload Section
     st.subheader("Resume Upload")
-    resumes = st.file_uploader(f"Upload Resumes (PDF/DOCX) - Max {subscription_limit}", 
-                             type=["pdf", "docx"], 
-                             accept_multiple_files=True)
+    upload_method = st.radio("Resume Upload Method:", ["Individual Files", "Archive (ZIP/tar.gz)"],
+                             horizontal=True)
+    if upload_method == "Individual Files":
+        resumes = st.file_uploader(f"Upload Resumes (PDF/DOCX) - Max {subscription_limit}", 
+                                 type=["pdf", "docx"], 
+                                 accept_multiple_files=True)
+        resume_count = len(resumes)
+    else:
+        # The archive is queued as one file; the worker parses its members as they are decompressed
+        archive = st.file_uploader(f"Upload an archive of resumes (PDF/DOCX) - Max {subscription_limit}",
+                                   type=["zip", "gz", "tgz"])
+        resumes = [archive] if archive and archive_type(archive.name) else []
+        if archive and not resumes:
+            st.warning("Please upload a .zip, .tar.gz or .tgz archive")
+        resume_count = 0
+        if resumes:
+            # Counting a tar.gz decompresses it, so count each upload once rather than on every rerun
+            if st.session_state.get('archive_count', (None,))[0] != archive.file_id:
+                st.session_state['archive_count'] = (archive.file_id,
+                                                     count_members(archive.getvalue(), archive_type(archive.name)))
+            resume_count = st.session_state['archive_count'][1]
+        if resumes and not resume_count:
+            st.warning("The archive contains no PDF or DOCX resumes")
     
     # Show warning if over subscription limit
-    if len(resumes) > subscription_limit:
+    if resume_count > subscription_limit:
         st.warning(f"Your subscription allows max {subscription_limit} resumes. "
-                  f"Please remove {len(resumes) - subscription_limit} files.")
+                  f"Please remove {resume_count - subscription_limit} files.")
     
     # Analysis Button
-    if st.button("Analyze Resumes", disabled=len(resumes) == 0 or not job_desc_text or len(resumes) > subscription_limit):
+    ready = bool(resume_count) and bool(job_desc_text) and resume_count <= subscription_limit
+    if not resumes or not job_desc_text:
         st.info("Please upload job description and resumes to analyze")
     
-    # Processing
-    if resumes and job_desc_text and len(resumes) <= subscription_limit:
-        with st.spinner(f"Processing {len(resumes)} resumes..."):
-            start_time = time.time()
-            
-            # Save job to database
-            job_id = Job.create(user['id'], job_title, job_desc_text)
-            
-            # Parse resumes
-            parsed_data = []
-            temp_dir = tempfile.mkdtemp()
-            
-            for i, resume in enumerate(resumes):
-                # Save to temp file
-                ext = "pdf" if resume.type == "application/pdf" else "docx"
-                temp_path = os.path.join(temp_dir, f"resume_{i}.{ext}")
-                with open(temp_path, "wb") as f:
-                    f.write(resume.getbuffer())
-                
-                # Extract text and metadata
-                text = extract_text(temp_path, ext)
-                candidate_name = extract_name(text)
-                contact_info = extract_contact_info(text)
-                
-                parsed_data.append({
-                    "file_name": resume.name,
-                    "text": text,
-                    "candidate_name": candidate_name,
-                    "contact": contact_info
-                })
-            
-            # Perform analysis
-            results, summary = analyze_resumes(job_desc_text, parsed_data, SKILLS_DB)
-            
-            # Save analysis to database
-            results_json = serialize_results(results, summary)
-            Analysis.save_results(user['id'], job_id, results_json)
-            
-            # Display results
-            st.success(f"Analysis completed in {time.time() - start_time:.1f} seconds")
-            st.subheader("Analysis Summary")
-            
-            # Summary metrics
-            col1, col2, col3 = st.columns(3)
-            col1.metric("Total Resumes", summary['total_resumes'])
-            col2.metric("Average Score", f"{summary['average_score']:.1f}/100")
-            top_candidate = results[0]['candidate_name'] if results else "N/A"
-            col3.metric("Top Candidate", top_candidate)
-            
-            # Score distribution
-            st.subheader("Score Distribution")
-            scores = [r['score'] for r in results]
-            fig = px.histogram(x=scores, nbins=20, labels={'x': 'Score'})
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Top missing skills
-            if summary['top_missing_skills']:
-                st.subheader("Top Missing Skills Across Resumes")
-                missing_df = pd.DataFrame(summary['top_missing_skills'], columns=['Skill', 'Count'])
-                st.bar_chart(missing_df.set_index('Skill'))
-            
-            # Results table
-            st.subheader("Ranked Resumes")
-            results_df = pd.DataFrame([{
-                "Rank": idx+1,
-                "Candidate": r['candidate_name'],
-                "Score": f"{r['score']:.1f}/100",
-                "Matched Skills": len(r['matched_skills']),
-                "Missing Skills": len(r['missing_skills']),
-                "Contact": r['contact']['email'] or r['contact']['phone'] or "N/A",
-                "File": r['file_name']
-            } for idx, r in enumerate(results)])
-            
-            st.dataframe(results_df, hide_index=True, use_container_width=True)
-            
-            # Detailed view
-            st.subheader("Candidate Details")
-            for i, res in enumerate(results):
-                with st.expander(f"{i+1}. {res['candidate_name']} - {res['score']:.1f}/100"):
-                    col1, col2 = st.columns([1, 1])
-                    with col1:
-                        st.subheader("✅ Matched Skills")
-                        if res['matched_skills']:
-                            st.write(", ".join(res['matched_skills']))
-                        else:
-                            st.info("No skills matched")
-                    
-                    with col2:
-                        st.subheader("⚠️ Missing Skills")
-                        if res['missing_skills']:
-                            st.write(", ".join(res['missing_skills']))
-                        else:
-                            st.success("No missing skills - perfect match!")
-                    
-                    # Contact info
-                    contact_info = []
-                    if res['contact']['email']:
-                        contact_info.append(f"✉️ {res['contact']['email']}")
-                    if res['contact']['phone']:
-                        contact_info.append(f"📞 {res['contact']['phone']}")
-                    
-                    if contact_info:
-                        st.write(" | ".join(contact_info))
-            
-            # Export options
-            st.download_button(
-                "Export Results as CSV",
-                results_df.to_csv(index=False),
-                f"resume_analysis_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv",
-                "text/csv"
-            )
+    # Analyses run in worker processes; widget reruns only poll the submitted job
+    if st.button("Analyze Resumes", disabled=not ready):
+        files = [
+            (resume.name, resume.getvalue(), archive_type(resume.name)
+             or ("pdf" if resume.type == "application/pdf" else "docx"))
+            for resume in resumes
+        ]
+        # The same JD and resumes analyzed before (by this user or a colleague) are not rerun
+        fingerprint = analysis_fingerprint(job_desc_text, [content_hash(data) for _, data, _ in files],
+                                           get_skill_matcher(SKILLS_DB_PATH))
+        stored = Analysis.find_by_fingerprint(fingerprint, user['id'], user.get('company'))
+        job_id = Job.create(user['id'], job_title, job_desc_text)
+        # The stored results are copied to this user's job so their history shows it like any other run
+        analysis_id = Analysis.copy(stored['id'], user['id'], job_id) if stored else None
+        if analysis_id:
+            st.session_state['analysis_queue_id'] = AnalysisQueue.submit_reused(
+                user['id'], job_id, analysis_id, fingerprint)
+        else:
+            st.session_state['analysis_queue_id'] = AnalysisQueue.submit(
+                user['id'], job_id, files, fingerprint, priority=scheduler.tier_priority(user['subscription_level']))
+    
+    # Progress and results of the latest submission
+    queue_id = st.session_state.get('analysis_queue_id')
+    if queue_id:
+        queued = AnalysisQueue.get(queue_id)
+        if queued['status'] in ("queued", "running"):
+            st.fragment(run_every=QUEUE_POLL_SECONDS)(show_analysis_progress)(queue_id)
+        elif queued['status'] == "failed":
+            st.error(f"Analysis failed: {queued['error']}")
+        else:
+            show_file_problems(queued['details'].get('unreadable_files'), queued['details'].get('degraded_files'),
+                               queued['details'].get('skipped_files'))
+            if queued['details'].get('reused'):
+                st.success("These resumes were already analyzed against this job description; showing the stored results")
+            else:
+                st.success(f"Analysis completed in {queued['finished_at'] - queued['submitted_at']:.1f} seconds")
+            performance = queued['details'].get('performance')
+            if performance:
+                with st.expander("⏱️ Performance"):
+                    queued_for = queued['finished_at'] - queued['submitted_at'] - performance['wall_seconds']
+                    col1, col2 = st.columns(2)
+                    col1.metric("Processing Time", f"{performance['wall_seconds']:.2f}s")
+                    col2.metric("Waiting for a Worker", f"{max(queued_for, 0):.2f}s")
+                    st.dataframe(pd.DataFrame([{
+                        "Stage": stage,
+                        "Calls": t['count'],
+                        "Total (s)": round(t['seconds'], 3),
+                        "Average (ms)": round(t['seconds'] * 1000 / t['count'], 2)
+                    } for stage, t in sorted(performance['stages'].items(),
+                                             key=lambda item: item[1]['seconds'], reverse=True)]),
+                        hide_index=True, use_container_width=True)
+                    if performance['slow_documents']:
+                        st.caption("Slow documents")
+                        st.dataframe(pd.DataFrame(performance['slow_documents']),
+                                     hide_index=True, use_container_width=True)
+            render_results(queued['analysis_id'])
 
-with tab2:  # Analysis History Tab
-    st.header("Analysis History")
-    history = Analysis.get_history(user['id'])
+with tab_multi:  # Multi-Role Matching Tab
+    st.header("Multi-Role Matching")
+    st.caption("Score one pool of applicants against several open roles at once; "
+               "resumes are parsed and embedded a single time.")
     
-    if not history:
-        st.info("No analysis history found")
-        st.stop()
+    st.subheader("Open Roles")
+    roles_df = st.data_editor(pd.DataFrame({"Title": ["", ""], "Job Description": ["", ""]}),
+                              num_rows="dynamic", use_container_width=True, key="multi_roles")
+    role_files = st.file_uploader("Or upload job descriptions (one TXT file per role)", type=["txt"],
+                                  accept_multiple_files=True, key="multi_role_files")
+    roles = [
+        (str(row["Title"] or "").strip() or f"Role {i+1}", str(row["Job Description"]))
+        for i, row in enumerate(roles_df.to_dict("records"))
+        if str(row["Job Description"] or "").strip()
+    ]
+    roles += [(f.name.rsplit(".", 1)[0], f.getvalue().decode("utf-8")) for f in role_files]
     
-    # Display history table
-    history_df = pd.DataFrame(history, columns=['id', 'job_title', 'created_at'])
-    history_df['created_at'] = pd.to_datetime(history_df['created_at'])
-    history_df = history_df.sort_values('created_at', ascending=False)
+    st.subheader("Candidate Pool")
+    pool = st.file_uploader(f"Upload Resumes (PDF/DOCX) - Max {subscription_limit}",
+                            type=["pdf", "docx"], accept_multiple_files=True, key="multi_resumes")
+    if len(pool) > subscription_limit:
+        st.warning(f"Your subscription allows max {subscription_limit} resumes. "
+                  f"Please remove {len(pool) - subscription_limit} files.")
     
-    # Create display options for dropdown
-    display_options = [
-        f"{row['job_title']} | {row['created_at'].strftime('%Y-%m-%d %H:%M')}" 
-        for _, row in history_df.iterrows()
-    ]
+    multi_ready = bool(roles) and bool(pool) and len(pool) <= subscription_limit
+    if not roles or not pool:
+        st.info("Please add at least one role and upload resumes to match")
+    
+    # Matching runs in worker processes like single-role analyses; each role is saved as a job
+    if st.button("Match Candidates to Roles", disabled=not multi_ready):
+        files = [
+            (resume.name, resume.getvalue(), "pdf" if resume.type == "application/pdf" else "docx")
+            for resume in pool
+        ]
+        role_job_ids = [Job.create(user['id'], title, desc) for title, desc in roles]
+        st.session_state['multi_queue_id'] = AnalysisQueue.submit(
+            user['id'], role_job_ids[0], files, priority=scheduler.tier_priority(user['subscription_level']),
+            role_job_ids=role_job_ids)
     
-    selected_display = st.selectbox("Select Analysis", display_options)
+    multi_queue_id = st.session_state.get('multi_queue_id')
+    if multi_queue_id:
+        queued = AnalysisQueue.get(multi_queue_id)
+        if queued['status'] in ("queued", "running"):
+            st.fragment(run_every=QUEUE_POLL_SECONDS)(show_analysis_progress)(multi_queue_id)
+        elif queued['status'] == "failed":
+            st.error(f"Matching failed: {queued['error']}")
+        else:
+            show_file_problems(queued['details'].get('unreadable_files'), queued['details'].get('degraded_files'))
+            render_multi_results(queued['details']['multi_result'])
+
+with tab2:  # Analysis History Tab
+    st.header("Analysis History")
+    history_count = Analysis.count_history(user['id'])
     
-    if selected_display:
-        # Find the matching row in the DataFrame
-        match_mask = (
-            history_df['job_title'] + " | " + 
-            history_df['created_at'].dt.strftime('%Y-%m-%d %H:%M')
-        ) == selected_display
+    if not history_count:
+        st.info("No analysis history found")
+    else:
+        # Page through analyses instead of loading the full history
+        history_pages = (history_count - 1) // HISTORY_PAGE_SIZE + 1
+        history_page = st.number_input(f"History page (of {history_pages})", min_value=1,
+                                       max_value=history_pages, value=1, key="history_page")
+        history = Analysis.get_history(user['id'], offset=(history_page - 1) * HISTORY_PAGE_SIZE,
+                                       limit=HISTORY_PAGE_SIZE)
+        history_df = pd.DataFrame(history, columns=['id', 'job_title', 'created_at'])
+        history_df['created_at'] = pd.to_datetime(history_df['created_at'])
+        
+        selected_idx = st.selectbox(
+            "Select Analysis", range(len(history_df)),
+            format_func=lambda i: f"{history_df.iloc[i]['job_title']} | "
+                                  f"{history_df.iloc[i]['created_at'].strftime('%Y-%m-%d %H:%M')}"
+        )
         
-        if any(match_mask):
-            selected_row = history_df[match_mask].iloc[0]
-            selected_id = selected_row['id']
+        if selected_idx is not None:
+            selected_row = history_df.iloc[selected_idx]
+            selected_id = int(selected_row['id'])
+            summary = Analysis.get_summary(selected_id)
             
-            with get_db_connection() as conn:
-                cursor = conn.cursor()
-                cursor.execute('''
-                    SELECT results FROM analyses WHERE id = ?
-                ''', (selected_id,))
-                result_row = cursor.fetchone()
+            if summary:
+                # Display analysis summary
+                st.subheader(f"Analysis: {selected_row['job_title']}")
+                st.caption(f"Date: {selected_row['created_at'].strftime('%Y-%m-%d %H:%M')}")
                 
-                if result_row:
-                    result_json = result_row[0]
-                    analysis = deserialize_results(result_json)
-                    
-                    # Display analysis summary
-                    st.subheader(f"Analysis: {selected_row['job_title']}")
-                    st.caption(f"Date: {selected_row['created_at'].strftime('%Y-%m-%d %H:%M')}")
-                    
-                    # Summary metrics
-                    col1, col2 = st.columns(2)
-                    col1.metric("Total Resumes", analysis['summary']['total_resumes'])
-                    col2.metric("Average Score", f"{analysis['summary']['average_score']:.1f}/100")
-                    
-                    # Results table
-                    results_df = pd.DataFrame([{
-                        "Rank": idx+1,
-                        "Candidate": r['candidate_name'],
-                        "Score": f"{r['score']:.1f}/100"
-                    } for idx, r in enumerate(analysis['results'])])
-                    
-                    st.dataframe(results_df, hide_index=True, use_container_width=True)
-                else:
-                    st.warning("No results found for selected analysis")
-        else:
-            st.error("Selected analysis not found")
+                # Summary metrics
+                col1, col2 = st.columns(2)
+                col1.metric("Total Resumes", summary['total_resumes'])
+                col2.metric("Average Score", f"{summary['average_score']:.1f}/100")
+                
+                # Results table, one page of ranked rows at a time
+                result_count = Analysis.count_results(selected_id)
+                result_pages = max(1, (result_count - 1) // RESULTS_PAGE_SIZE + 1)
+                result_page = st.number_input(f"Results page (of {result_pages})", min_value=1,
+                                              max_value=result_pages, value=1, key=f"results_page_{selected_id}")
+                page_results = Analysis.get_results(selected_id, offset=(result_page - 1) * RESULTS_PAGE_SIZE,
+                                                    limit=RESULTS_PAGE_SIZE)
+                results_df = pd.DataFrame([{
+                    "Rank": r['rank'],
+                    "Candidate": r['candidate_name'],
+                    "Score": f"{r['score']:.1f}/100"
+                } for r in page_results])
+                
+                st.dataframe(results_df, hide_index=True, use_container_width=True)
+            else:
+                st.warning("No results found for selected analysis")
 
 with tab3:  # Account Settings Tab
     st.header("Account Settings")
@@ -352,6 +577,10 @@ with tab4:  # Documentation Tab
     5. **Export**:
         - Download results as CSV for further analysis
         - Access your analysis history anytime
+        
+    6. **Match Many Roles**:
+        - In the Multi-Role Matching tab, add several job descriptions and one set of resumes
+        - See every candidate's score for every role and their best-fit role
     """)
     
     st.subheader("Best Practices")
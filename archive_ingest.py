@@ -0,0 +1,164 @@
+import io
+import os
+import time
+import queue
+import logging
+import tarfile
+import zipfile
+import threading
+import zlib
+import metrics
+from resume_parser import parse_resumes, PARSE_MAX_BYTES
+
+logger = logging.getLogger(__name__)
+
+# Decompressed resume bytes read ahead of the parser at most; reading pauses once it is spent
+ARCHIVE_INFLIGHT_MB = int(os.getenv("ARCHIVE_INFLIGHT_MB", 64))
+
+ARCHIVE_KINDS = ("zip", "tar.gz")
+MEMBER_TYPES = {".pdf": "pdf", ".docx": "docx"}
+
+def archive_type(file_name):
+    """"zip" or "tar.gz" for an archive upload, None for anything else"""
+    name = file_name.lower()
+    if name.endswith(".zip"):
+        return "zip"
+    if name.endswith((".tar.gz", ".tgz")):
+        return "tar.gz"
+    return None
+
+def _member_type(path):
+    """File type of a resume inside an archive; None for unsupported files, "" for OS clutter"""
+    base = path.rstrip("/").rsplit("/", 1)[-1]
+    if not base or base.startswith(".") or path.startswith("__MACOSX/"):
+        return ""
+    return MEMBER_TYPES.get(os.path.splitext(base)[1].lower())
+
+def _members(archive_file, kind):
+    """(path, declared size, encrypted, open member) for every regular file, in archive order"""
+    if kind == "zip":
+        with zipfile.ZipFile(archive_file) as archive:
+            for info in archive.infolist():
+                if not info.is_dir():
+                    yield info.filename, info.file_size, bool(info.flag_bits & 0x1), lambda i=info: archive.open(i)
+    else:
+        # Stream mode reads the gzip data front to back once, without seeking
+        with tarfile.open(fileobj=archive_file, mode="r|gz") as archive:
+            for info in archive:
+                if info.isfile():
+                    yield info.name, info.size, False, lambda i=info: archive.extractfile(i)
+
+def iter_members(file_name, data, kind, skipped, max_bytes=PARSE_MAX_BYTES):
+    """Yield (path, data, file_type) for each resume in an archive as it is decompressed
+
+    Nothing is written to disk and only one member is held at a time.
+    Unsupported, encrypted, oversized and corrupt members are appended to
+    skipped as {"file_name", "reason"} instead of being yielded.
+    """
+    def skip(path, cause, reason):
+        skipped.append({"file_name": path, "reason": reason})
+        metrics.inc("resumeranker_archive_skipped_members_total", cause=cause)
+
+    try:
+        for path, size, encrypted, open_member in _members(io.BytesIO(data), kind):
+            file_type = _member_type(path)
+            if file_type == "":
+                continue
+            if file_type is None:
+                skip(path, "type", "Unsupported file type")
+                continue
+            if encrypted:
+                skip(path, "encrypted", "Encrypted")
+                continue
+            if max_bytes > 0 and size > max_bytes:
+                skip(path, "size", f"Larger than the {max_bytes / 1024 / 1024:g} MB limit")
+                continue
+            start = time.perf_counter()
+            try:
+                with open_member() as member:
+                    # Declared sizes can lie (zip bombs), so never read past the limit
+                    content = member.read(max_bytes + 1) if max_bytes > 0 else member.read()
+            except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, NotImplementedError) as e:
+                skip(path, "corrupt", f"Corrupt member: {str(e)}")
+                continue
+            if max_bytes > 0 and len(content) > max_bytes:
+                skip(path, "size", f"Larger than the {max_bytes / 1024 / 1024:g} MB limit")
+                continue
+            metrics.observe_stage("archive.read", time.perf_counter() - start, file_name=path)
+            yield path, content, file_type
+    except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError) as e:
+        logger.error(f"Error reading archive {file_name}: {str(e)}")
+        skip(file_name, "corrupt", f"Corrupt archive: {str(e)}")
+
+def count_members(data, kind):
+    """Resumes an archive would yield, read from the zip directory or the tar headers"""
+    count = 0
+    try:
+        for path, _, _, _ in _members(io.BytesIO(data), kind):
+            if _member_type(path):
+                count += 1
+    except (zipfile.BadZipFile, tarfile.TarError, zlib.error, EOFError, OSError) as e:
+        logger.error(f"Error reading archive: {str(e)}")
+    return count
+
+def parse_archive(file_name, data, kind, skipped, batch_size, cache=None, budget_mb=ARCHIVE_INFLIGHT_MB):
+    """Yield parse_resumes results for an archive one batch at a time
+
+    A reader thread decompresses the next members while the current batch
+    is parsed. Members count against the in-flight budget until their batch
+    has been parsed, and the reader holds at most one more member while it
+    waits for room. A member larger than the whole budget is still let
+    through once nothing else is in flight.
+    """
+    budget = budget_mb * 1024 * 1024
+    batches = queue.Queue()
+    cond = threading.Condition()
+    inflight = [0]
+    stop = threading.Event()
+
+    def read():
+        batch, size = [], 0
+        try:
+            for member in iter_members(file_name, data, kind, skipped):
+                with cond:
+                    if inflight[0] and inflight[0] + len(member[1]) > budget and batch:
+                        # Hand over what is read so far; it is all the parser can release
+                        batches.put((batch, size))
+                        batch, size = [], 0
+                    while inflight[0] and inflight[0] + len(member[1]) > budget and not stop.is_set():
+                        cond.wait()
+                    if stop.is_set():
+                        return
+                    inflight[0] += len(member[1])
+                batch.append(member)
+                size += len(member[1])
+                if len(batch) >= batch_size or size >= budget // 2:
+                    batches.put((batch, size))
+                    batch, size = [], 0
+            if batch:
+                batches.put((batch, size))
+            batches.put(None)
+        except Exception as e:
+            batches.put(e)
+
+    reader = threading.Thread(target=read, name="archive-reader", daemon=True)
+    reader.start()
+    try:
+        while True:
+            item = batches.get()
+            if item is None:
+                return
+            if isinstance(item, Exception):
+                raise item
+            files, size = item
+            parsed = parse_resumes(files, cache=cache)
+            item = files = None
+            with cond:
+                inflight[0] -= size
+                cond.notify_all()
+            yield parsed
+    finally:
+        stop.set()
+        with cond:
+            cond.notify_all()
+        reader.join()
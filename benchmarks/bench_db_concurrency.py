@@ -0,0 +1,130 @@
+"""Write throughput of concurrent sessions saving analyses to SQLite
+
+Usage:
+    python benchmarks/bench_db_concurrency.py --sessions 8 --saves 50
+    python benchmarks/bench_db_concurrency.py --sessions 8 --processes
+    python benchmarks/bench_db_concurrency.py --sessions 8 --legacy
+
+Each session saves analyses and reads them back, the way a Streamlit
+session does after a run. --legacy reproduces the original access layer:
+a fresh connection per call in rollback-journal mode. The benchmark uses
+a throwaway database and never touches app.db.
+"""
+import argparse
+import multiprocessing
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_db_"), "bench.db")
+
+import database
+import models
+from database import init_db
+from models import Analysis
+
+SKILLS = [f"skill-{i}" for i in range(200)]
+
+def synthetic_results(count, rng):
+    results = []
+    for i in range(count):
+        matched = rng.sample(SKILLS, 8)
+        results.append({
+            "file_name": f"resume-{i}.pdf",
+            "candidate_name": f"Candidate {i}",
+            "contact": {"email": f"candidate{i}@example.com", "phone": None},
+            "score": round(rng.uniform(0, 100), 2),
+            "matched_skills": matched,
+            "missing_skills": [s for s in rng.sample(SKILLS, 4) if s not in matched]
+        })
+    return results
+
+@contextmanager
+def legacy_connection():
+    conn = sqlite3.connect(database.DB_PATH)
+    conn.row_factory = sqlite3.Row
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+@contextmanager
+def legacy_transaction():
+    with legacy_connection() as conn:
+        yield conn
+        conn.commit()
+
+def run_session(session, saves, results_per_save, out):
+    rng = random.Random(session)
+    latencies, errors = [], 0
+    for _ in range(saves):
+        results = synthetic_results(results_per_save, rng)
+        start = time.perf_counter()
+        try:
+            analysis_id = Analysis.save_results(1, 1, results, {"total": len(results)})
+            Analysis.get_results(analysis_id)
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e) and "busy" not in str(e):
+                raise
+            errors += 1
+            continue
+        latencies.append(time.perf_counter() - start)
+    out.put((latencies, errors))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=8)
+    parser.add_argument("--saves", type=int, default=50, help="analyses saved per session")
+    parser.add_argument("--results", type=int, default=50, help="candidates per analysis")
+    parser.add_argument("--processes", action="store_true", help="one process per session instead of a thread")
+    parser.add_argument("--legacy", action="store_true", help="fresh connection per call, rollback journal")
+    args = parser.parse_args()
+
+    init_db()
+    if args.legacy:
+        # WAL is persistent, so switch the file back before any session connects
+        database._local.conn.close()
+        database._local.conn = None
+        with legacy_connection() as conn:
+            conn.execute('PRAGMA journal_mode=DELETE')
+        models.get_db_connection = legacy_connection
+        models.transaction = legacy_transaction
+
+    if args.processes:
+        out = multiprocessing.Queue()
+        runner = multiprocessing.Process
+    else:
+        import queue
+        out = queue.Queue()
+        runner = threading.Thread
+    sessions = [runner(target=run_session, args=(i, args.saves, args.results, out))
+                for i in range(args.sessions)]
+
+    start = time.perf_counter()
+    for session in sessions:
+        session.start()
+    outcomes = [out.get() for _ in sessions]
+    for session in sessions:
+        session.join()
+    elapsed = time.perf_counter() - start
+
+    latencies = sorted(l for session_latencies, _ in outcomes for l in session_latencies)
+    errors = sum(e for _, e in outcomes)
+    mode = "legacy" if args.legacy else "pooled"
+    kind = "processes" if args.processes else "threads"
+    print(f"{mode}, {args.sessions} {kind}: {len(latencies) / elapsed:.1f} saves/s, "
+          f"{len(latencies) * args.results / elapsed:.0f} result rows/s, {errors} lock errors")
+    if latencies:
+        p50 = latencies[len(latencies) // 2]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        print(f"save+read latency: p50 {p50 * 1000:.1f} ms, p95 {p95 * 1000:.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Accuracy vs speed of the sentence encoder backends on a fixed corpus
+
+Usage:
+    python encoders.py --out models/all-MiniLM-L6-v2       # one-off ONNX + int8 export
+    python benchmarks/bench_encoders.py --model-dir models/all-MiniLM-L6-v2 --resumes 500
+    python benchmarks/bench_encoders.py --backends torch,onnx-int8 --output encoders.json
+
+The first backend is the reference. The others are compared on every job
+description by:
+- Spearman correlation of their resume scores
+- overlap of the top-k shortlists
+- the largest score difference on the 0-100 scale
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from scipy.stats import spearmanr
+from corpus import resume_text, job_description, load_skills
+from encoders import encode_chunked, load_sentence_encoder, BACKENDS
+
+def scores_for(model, job_descs, texts):
+    start = time.perf_counter()
+    resume_vectors = encode_chunked(model, texts)
+    seconds = time.perf_counter() - start
+    jd_vectors = encode_chunked(model, job_descs)
+    # Pooled chunk averages are not unit length; normalize so the dot product is cosine
+    resume_vectors /= np.maximum(np.linalg.norm(resume_vectors, axis=1, keepdims=True), 1e-12)
+    jd_vectors /= np.maximum(np.linalg.norm(jd_vectors, axis=1, keepdims=True), 1e-12)
+    return (jd_vectors @ resume_vectors.T) * 100, seconds
+
+def agreement(reference, scores, top_k):
+    rhos, overlaps = [], []
+    for ref_row, row in zip(reference, scores):
+        rhos.append(spearmanr(ref_row, row).correlation)
+        ref_top = set(np.argsort(-ref_row)[:top_k])
+        overlaps.append(len(ref_top & set(np.argsort(-row)[:top_k])) / top_k)
+    return {
+        "spearman": float(np.mean(rhos)),
+        f"top{top_k}_overlap": float(np.mean(overlaps)),
+        "max_abs_score_diff": float(np.max(np.abs(reference - scores)))
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--model-dir", default=os.getenv("ENCODER_MODEL_DIR", ""),
+                        help="local model directory with onnx/ exports")
+    parser.add_argument("--backends", default=",".join(BACKENDS))
+    parser.add_argument("--resumes", type=int, default=300)
+    parser.add_argument("--words", type=int, default=400)
+    parser.add_argument("--jds", type=int, default=5)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    skills = load_skills()
+    texts = [resume_text(rng, skills, args.words, i) for i in range(args.resumes)]
+    job_descs = [job_description(rng, skills) for _ in range(args.jds)]
+
+    report = {"params": vars(args), "backends": {}}
+    reference = None
+    for backend in args.backends.split(","):
+        model = load_sentence_encoder(args.model, backend=backend, model_dir=args.model_dir)
+        encode_chunked(model, texts[:8])  # warm up kernels outside the timing
+        scores, seconds = scores_for(model, job_descs, texts)
+        entry = {"seconds": seconds, "resumes_per_second": len(texts) / seconds}
+        if reference is None:
+            reference, reference_seconds = scores, seconds
+        else:
+            entry["speedup"] = reference_seconds / seconds
+            entry.update(agreement(reference, scores, args.top_k))
+        report["backends"][backend] = entry
+
+        line = f"{backend:>10}: {entry['resumes_per_second']:8.1f} resumes/s"
+        if "speedup" in entry:
+            line += (f"  {entry['speedup']:.2f}x  spearman {entry['spearman']:.4f}  "
+                     f"top{args.top_k} overlap {entry[f'top{args.top_k}_overlap']:.0%}  "
+                     f"max diff {entry['max_abs_score_diff']:.2f}")
+        print(line)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+if __name__ == "__main__":
+    main()
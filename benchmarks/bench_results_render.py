@@ -0,0 +1,77 @@
+"""Render time of the Analyze tab's results view as the analysis grows
+
+Usage:
+    python benchmarks/bench_results_render.py --sizes 50,200,1000,5000
+
+Stores one synthetic analysis per size and times a full script run of
+app.py showing it, with Streamlit's AppTest harness. The results view
+only builds one page of candidates, so the times should stay flat.
+Uses a throwaway database.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+APP_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(APP_DIR)
+
+os.environ["DB_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_render_"), "bench.db")
+os.environ["MODEL_WARMUP"] = "0"
+
+from streamlit.testing.v1 import AppTest
+from database import init_db
+from models import User, Job, Analysis, AnalysisQueue
+
+SKILLS = [f"skill-{i}" for i in range(60)]
+
+def store_analysis(user_id, size, rng):
+    job_id = Job.create(user_id, f"Benchmark {size}", "Synthetic job description")
+    results = sorted(({
+        "file_name": f"resume-{i}.pdf",
+        "candidate_name": f"Candidate {i}",
+        "contact": {"email": f"candidate{i}@example.com", "phone": None},
+        "score": round(rng.uniform(20, 95), 2),
+        "matched_skills": rng.sample(SKILLS, 6),
+        "missing_skills": rng.sample(SKILLS, 3)
+    } for i in range(size)), key=lambda r: r['score'], reverse=True)
+    summary = {"total_resumes": size, "average_score": 57.5, "top_missing_skills": [["skill-1", 3]]}
+    analysis_id = Analysis.save_results(user_id, job_id, results, summary)
+    queue_id = AnalysisQueue.submit(user_id, job_id, [])
+    AnalysisQueue.complete(queue_id, analysis_id)
+    return queue_id
+
+def render_seconds(user, queue_id, repeats):
+    timings = []
+    for _ in range(repeats):
+        at = AppTest.from_file(os.path.join(APP_DIR, "app.py"), default_timeout=120)
+        at.session_state['authenticated'] = True
+        at.session_state['user'] = {'id': user.id, 'email': user.email, 'company': user.company,
+                                    'subscription_level': 'enterprise'}
+        at.session_state['analysis_queue_id'] = queue_id
+        start = time.perf_counter()
+        at.run()
+        timings.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].message)
+    return statistics.median(timings), len(at.expander)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="50,200,1000,5000")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    init_db()
+    rng = random.Random(0)
+    user = User.create(f"bench-{time.time()}@example.com", "bench", "Bench Co")
+    for size in (int(s) for s in args.sizes.split(",")):
+        queue_id = store_analysis(user.id, size, rng)
+        seconds, expanders = render_seconds(user, queue_id, args.repeats)
+        print(f"{size:>6} resumes: {seconds * 1000:7.1f} ms per run ({expanders} expanders on the page)")
+
+if __name__ == "__main__":
+    main()
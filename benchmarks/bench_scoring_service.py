@@ -0,0 +1,77 @@
+"""Throughput of the scoring service with and without dynamic batching
+
+Usage:
+    python benchmarks/bench_scoring_service.py --clients 32 --requests 256
+    python benchmarks/bench_scoring_service.py --max-batch 128 --max-wait-ms 20
+
+Requests go through an in-process client (httpx with the ASGI transport),
+so no server needs to be running. The "unbatched" run caps batches at one
+request, which is one encode call per request. Every resume text is
+unique, so the embedding store cannot answer from cache.
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Keep the benchmark's embeddings and database out of the app's own
+os.environ.setdefault("DB_PATH", os.path.join(tempfile.mkdtemp(prefix="bench_service_"), "bench.db"))
+os.environ.setdefault("EMBEDDING_STORE_DIR", tempfile.mkdtemp(prefix="bench_service_embeddings_"))
+
+import httpx
+from database import init_db
+from model_registry import get_model
+from scoring_service import create_app, DynamicBatcher
+
+WORDS = ("python java docker kubernetes sql spark airflow react typescript aws terraform "
+         "led built shipped designed migrated scaled optimized services pipelines teams").split()
+
+def synthetic_resume(rng, i):
+    return f"Candidate {i} " + " ".join(rng.choice(WORDS) for _ in range(rng.randint(60, 200)))
+
+async def run(label, batcher, clients, requests, seed):
+    rng = random.Random(seed)
+    payloads = [{"job_description": "Senior Python engineer with Docker and AWS",
+                 "resume_text": synthetic_resume(rng, i)} for i in range(requests)]
+    app = create_app(batcher)
+    work = iter(payloads)
+
+    async def client(http):
+        for payload in work:
+            response = await http.post("/score", json=payload)
+            response.raise_for_status()
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as http:
+        start = time.perf_counter()
+        await asyncio.gather(*[client(http) for _ in range(clients)])
+        elapsed = time.perf_counter() - start
+        metrics = (await http.get("/metrics")).json()
+    batcher.close()
+
+    latency = metrics["latency"]["/score"]
+    print(f"{label}: {requests / elapsed:.1f} req/s, {metrics['encoder']['batches']} encode calls "
+          f"(mean {metrics['encoder']['mean_batch_size']:.1f} texts), "
+          f"p50 {latency['p50_ms']} ms, p90 {latency['p90_ms']} ms, p99 {latency['p99_ms']} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--clients", type=int, default=32, help="concurrent callers")
+    parser.add_argument("--requests", type=int, default=256)
+    parser.add_argument("--max-batch", type=int, default=64, help="texts per encode call")
+    parser.add_argument("--max-wait-ms", type=float, default=10)
+    args = parser.parse_args()
+
+    init_db()
+    get_model("sbert")  # load outside the timed runs
+    asyncio.run(run("unbatched", DynamicBatcher(max_batch_size=1, max_wait_ms=0),
+                    args.clients, args.requests, seed=1))
+    asyncio.run(run("batched", DynamicBatcher(max_batch_size=args.max_batch, max_wait_ms=args.max_wait_ms),
+                    args.clients, args.requests, seed=2))
+
+if __name__ == "__main__":
+    main()
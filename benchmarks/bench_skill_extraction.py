@@ -0,0 +1,74 @@
+"""Per-resume latency of skill extraction before and after batching the spaCy stage
+
+Usage:
+    python benchmarks/bench_skill_extraction.py --resumes 200
+    SKILL_NER_MODEL=./models/skill_ner python benchmarks/bench_skill_extraction.py
+
+The "before" path reproduces the original extract_skills: a full
+en_core_web_md pass per document plus a substring scan per skill.
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import spacy
+from skill_matcher import get_skill_matcher, parse_skill_lines
+from similarity import extract_skills_batch
+
+FILLER = ("Led a cross-functional team delivering customer facing features. "
+          "Improved reliability of services and reduced costs across regions. ")
+
+def synthetic_resumes(skills, count, seed=0):
+    rng = random.Random(seed)
+    resumes = []
+    for i in range(count):
+        picked = rng.sample(skills, min(len(skills), rng.randint(5, 15)))
+        body = FILLER * rng.randint(10, 40)
+        resumes.append(f"Candidate {i}\nSkills: {', '.join(picked)}\nExperience\n{body}")
+    return resumes
+
+def legacy_extract_skills(nlp, text, skills_db):
+    doc = nlp(text.lower())
+    found_skills = set()
+    for skill in skills_db:
+        if skill.lower() in text.lower():
+            found_skills.add(skill)
+    for ent in doc.ents:
+        if ent.label_ in ["SKILL", "TECH"] and len(ent.text.split()) < 4:
+            found_skills.add(ent.text)
+    return list(found_skills)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--resumes", type=int, default=200)
+    parser.add_argument("--skills", default="skills_db.txt")
+    parser.add_argument("--legacy-model", default="en_core_web_md")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    with open(args.skills, encoding="utf-8") as f:
+        skills = [canonical for canonical, _ in parse_skill_lines(f)]
+    texts = ["Job description: " + ", ".join(skills[:10])] + synthetic_resumes(skills, args.resumes)
+    per_doc = len(texts)
+
+    if not args.skip_legacy:
+        nlp = spacy.load(args.legacy_model)
+        start = time.perf_counter()
+        for text in texts:
+            legacy_extract_skills(nlp, text, skills)
+        before = (time.perf_counter() - start) / per_doc
+        print(f"before: {before * 1000:.2f} ms/resume ({args.legacy_model} per document)")
+
+    matcher = get_skill_matcher(args.skills)
+    start = time.perf_counter()
+    extract_skills_batch(texts, matcher)
+    after = (time.perf_counter() - start) / per_doc
+    stage = os.getenv("SKILL_NER_MODEL") or "disabled"
+    print(f"after:  {after * 1000:.2f} ms/resume (batched, skill NER: {stage})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""Deterministic synthetic resumes (PDF/DOCX) and job descriptions for benchmarks
+
+Usage:
+    python benchmarks/corpus.py --out ./bench_corpus --count 500 --words 600 --docx-ratio 0.3
+
+The same seed, count and size always produce the same documents, so timings
+from different runs and machines compare like for like.
+"""
+import argparse
+import io
+import os
+import random
+import sys
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(REPO_DIR)
+
+import fitz  # PyMuPDF
+from docx import Document
+from skill_matcher import parse_skill_lines
+
+FIRST_NAMES = ["Jane", "John", "Priya", "Wei", "Carlos", "Amara", "Olga", "Kenji", "Fatima", "Liam"]
+LAST_NAMES = ["Doe", "Smith", "Patel", "Chen", "Garcia", "Okafor", "Ivanova", "Tanaka", "Haddad", "Murphy"]
+VERBS = ["Led", "Built", "Designed", "Shipped", "Migrated", "Scaled", "Automated", "Optimized", "Owned", "Mentored"]
+OBJECTS = ["a payments platform", "data pipelines", "customer facing APIs", "the deployment process",
+           "an analytics dashboard", "internal tooling", "a recommendation service", "the test suite"]
+OUTCOMES = ["cutting latency by 40%", "serving 2M daily users", "reducing costs across regions",
+            "with a team of five engineers", "ahead of schedule", "improving reliability to 99.95%"]
+
+PDF_WORDS_PER_PAGE = 450
+
+def load_skills(path=os.path.join(REPO_DIR, "skills_db.txt")):
+    with open(path, encoding="utf-8") as f:
+        return [canonical for canonical, _ in parse_skill_lines(f)]
+
+def _sentence(rng, skills):
+    return (f"{rng.choice(VERBS)} {rng.choice(OBJECTS)} using {rng.choice(skills)} "
+            f"and {rng.choice(skills)}, {rng.choice(OUTCOMES)}.")
+
+def resume_text(rng, skills, words, index):
+    """Plain text of one resume with about `words` words of experience"""
+    name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    handle = name.lower().replace(" ", ".")
+    phone = f"{rng.randint(200, 999)}-{rng.randint(200, 999)}-{rng.randint(1000, 9999)}"
+    lines = [name, f"{handle}{index}@example.com | {phone}", "", "Summary",
+             f"Engineer with {rng.randint(2, 15)} years of experience.", "", "Experience"]
+    count = 0
+    while count < words:
+        sentence = _sentence(rng, skills)
+        lines.append(f"- {sentence}")
+        count += len(sentence.split())
+    lines += ["", "Skills", ", ".join(rng.sample(skills, min(len(skills), rng.randint(6, 16)))),
+              "", "Education", "B.Sc. Computer Science"]
+    return "\n".join(lines)
+
+def job_description(rng, skills, words=150):
+    required = rng.sample(skills, min(len(skills), 8))
+    text = [f"We are hiring an engineer experienced in {', '.join(required)}."]
+    count = len(text[0].split())
+    while count < words:
+        sentence = _sentence(rng, required)
+        text.append(f"You will have {sentence[0].lower()}{sentence[1:]}")
+        count += len(sentence.split())
+    return " ".join(text)
+
+def to_pdf(text):
+    doc = fitz.open()
+    lines = text.split("\n")
+    page_lines, page_words = [], 0
+    for line in lines + [None]:
+        if line is None or page_words >= PDF_WORDS_PER_PAGE:
+            page = doc.new_page()
+            page.insert_textbox(fitz.Rect(50, 50, 560, 800), "\n".join(page_lines), fontsize=8)
+            page_lines, page_words = [], 0
+        if line is not None:
+            page_lines.append(line)
+            page_words += len(line.split())
+    # No timestamps or random file ID, so the bytes depend only on the text
+    doc.set_metadata({})
+    data = doc.tobytes(no_new_id=True)
+    doc.close()
+    return data
+
+def to_docx(text):
+    doc = Document()
+    for line in text.split("\n"):
+        doc.add_paragraph(line)
+    buffer = io.BytesIO()
+    doc.save(buffer)
+    return buffer.getvalue()
+
+def generate(count, words, docx_ratio=0.3, seed=0, skills=None):
+    """(file_name, data, file_type, text) for count resumes of about `words` words each"""
+    rng = random.Random(seed)
+    skills = skills or load_skills()
+    corpus = []
+    for i in range(count):
+        text = resume_text(rng, skills, words, i)
+        if rng.random() < docx_ratio:
+            corpus.append((f"resume-{i:05d}.docx", to_docx(text), "docx", text))
+        else:
+            corpus.append((f"resume-{i:05d}.pdf", to_pdf(text), "pdf", text))
+    return corpus
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--out", required=True, help="directory for the resumes and jd.txt")
+    parser.add_argument("--count", type=int, default=200)
+    parser.add_argument("--words", type=int, default=500, help="approximate words per resume")
+    parser.add_argument("--jd-words", type=int, default=150)
+    parser.add_argument("--docx-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    os.makedirs(args.out, exist_ok=True)
+    skills = load_skills()
+    for file_name, data, _, _ in generate(args.count, args.words, args.docx_ratio, args.seed, skills):
+        with open(os.path.join(args.out, file_name), "wb") as f:
+            f.write(data)
+    with open(os.path.join(args.out, "jd.txt"), "w", encoding="utf-8") as f:
+        f.write(job_description(random.Random(args.seed), skills, args.jd_words))
+    print(f"Wrote {args.count} resumes and jd.txt to {args.out}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""Stage-by-stage timings of the analysis pipeline on a synthetic corpus
+
+Usage:
+    python benchmarks/run_suite.py --count 200 --words 500 --output results.json
+    python benchmarks/run_suite.py --baseline results.json --threshold 0.15
+    python benchmarks/run_suite.py --skip sbert,sbert_warm
+
+Every stage runs --repeats times on the same generated corpus and reports
+the median. With --baseline, any stage slower than baseline * (1 + threshold)
+is reported as a regression and the run exits with status 1. Runs use a
+throwaway database, embedding store and TF-IDF corpus, never the app's.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# database changes into the app directory on import; --output and --baseline are relative to here
+INVOCATION_DIR = os.getcwd()
+
+_scratch = tempfile.mkdtemp(prefix="bench_suite_")
+os.environ["DB_PATH"] = os.path.join(_scratch, "bench.db")
+os.environ["EMBEDDING_STORE_DIR"] = os.path.join(_scratch, "embeddings")
+os.environ["TFIDF_DIR"] = os.path.join(_scratch, "tfidf")
+
+from corpus import generate, job_description, load_skills, REPO_DIR
+from database import init_db
+from model_registry import get_model
+from models import User, Job, Analysis
+from resume_parser import extract_text, extract_name, extract_contact_info, parse_resumes, segment_resume
+from similarity import calculate_similarity, extract_skills_batch, rank_resumes, skill_text, embedding_text
+from skill_matcher import get_skill_matcher
+from tfidf_engine import TfidfCorpus
+
+STAGES = ["parse", "parse_pool", "segment", "skills", "tfidf", "sbert", "sbert_warm", "db_save", "db_load"]
+
+def _time(fn, repeats):
+    timings = []
+    for repeat in range(repeats):
+        start = time.perf_counter()
+        fn(repeat)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+def run_stages(corpus, job_desc, repeats, skip):
+    files = [(name, data, file_type) for name, data, file_type, _ in corpus]
+    texts = [extract_text(data, file_type) for _, data, file_type in files]
+    matcher = get_skill_matcher(os.path.join(REPO_DIR, "skills_db.txt"))
+    resumes_data = [{"file_name": name, "text": text, "sections": segment_resume(text),
+                     "candidate_name": extract_name(text), "contact": extract_contact_info(text)}
+                    for (name, _, _), text in zip(files, texts)]
+    # Skill matching and embedding see only the relevant sections, as in the pipeline
+    skill_texts = [skill_text(data) for data in resumes_data]
+    embed_texts = [embedding_text(data) for data in resumes_data]
+    results, summary = rank_resumes(job_desc, resumes_data, [50.0] * len(resumes_data), matcher)
+    user = User.create(f"bench-{time.time()}@example.com", "bench")
+    job_id = Job.create(user.id, "Benchmark", job_desc)
+    saved_id = Analysis.save_results(user.id, job_id, results, summary)
+
+    def parse(_):
+        for _, data, file_type in files:
+            extract_text(data, file_type)
+
+    def parse_pool(_):
+        parse_resumes(files)
+
+    def segment(_):
+        for text in texts:
+            sections = segment_resume(text)
+            extract_name(sections["header"])
+            extract_contact_info(sections["header"])
+
+    def skills(_):
+        extract_skills_batch([job_desc] + skill_texts, matcher)
+
+    def tfidf(repeat):
+        # A fresh corpus per repeat, so every run pays for adding the documents
+        corpus = TfidfCorpus(name=f"bench-{repeat}")
+        corpus.score(job_desc, corpus.add_documents(embed_texts))
+
+    def sbert(repeat):
+        # A per-repeat prefix makes every text new to the embedding store
+        calculate_similarity(job_desc, [f"{repeat} {text}" for text in embed_texts], method="sbert")
+
+    def sbert_warm(_):
+        calculate_similarity(job_desc, embed_texts, method="sbert")
+
+    def db_save(_):
+        Analysis.save_results(user.id, job_id, results, summary)
+
+    def db_load(_):
+        Analysis.get_results(saved_id)
+
+    stage_fns = {"parse": parse, "parse_pool": parse_pool, "segment": segment, "skills": skills,
+                 "tfidf": tfidf, "sbert": sbert, "sbert_warm": sbert_warm, "db_save": db_save, "db_load": db_load}
+    stages = {}
+    for name in STAGES:
+        if name in skip:
+            continue
+        if name == "sbert":
+            get_model("sbert")  # load time is not part of the stage
+        elif name == "sbert_warm":
+            calculate_similarity(job_desc, embed_texts, method="sbert")
+        seconds = _time(stage_fns[name], repeats)
+        stages[name] = {
+            "seconds": seconds,
+            "per_item_ms": seconds * 1000 / max(len(files), 1),
+            "items": len(files)
+        }
+        print(f"{name:>13}: {seconds * 1000:9.1f} ms  ({stages[name]['per_item_ms']:.3f} ms/resume)")
+    return stages
+
+def compare(current, baseline, threshold):
+    """Stages slower than the baseline by more than threshold, as (name, ratio) pairs"""
+    regressions = []
+    for name, stage in current["stages"].items():
+        before = baseline["stages"].get(name)
+        if not before or before["seconds"] <= 0:
+            continue
+        ratio = stage["seconds"] / before["seconds"]
+        marker = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:>13}: {ratio:6.2f}x baseline {marker}")
+        if marker:
+            regressions.append((name, ratio))
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--count", type=int, default=200, help="resumes in the corpus")
+    parser.add_argument("--words", type=int, default=500, help="approximate words per resume")
+    parser.add_argument("--jd-words", type=int, default=150)
+    parser.add_argument("--docx-ratio", type=float, default=0.3)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--skip", default="", help=f"comma separated stages to skip: {','.join(STAGES)}")
+    parser.add_argument("--output", help="write results as JSON")
+    parser.add_argument("--baseline", help="JSON from an earlier run to compare against")
+    parser.add_argument("--threshold", type=float, default=0.10, help="allowed slowdown, 0.10 = 10%%")
+    args = parser.parse_args()
+
+    output = os.path.join(INVOCATION_DIR, args.output) if args.output else None
+    baseline_path = os.path.join(INVOCATION_DIR, args.baseline) if args.baseline else None
+
+    init_db()
+    skills = load_skills()
+    corpus = generate(args.count, args.words, args.docx_ratio, args.seed, skills)
+    job_desc = job_description(random.Random(args.seed), skills, args.jd_words)
+    print(f"Corpus: {args.count} resumes, ~{args.words} words, {args.docx_ratio:.0%} DOCX, seed {args.seed}")
+
+    current = {
+        "params": {key: getattr(args, key) for key in ("count", "words", "jd_words", "docx_ratio", "seed", "repeats")},
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count()},
+        "stages": run_stages(corpus, job_desc, args.repeats, set(filter(None, args.skip.split(","))))
+    }
+    if output:
+        with open(output, "w", encoding="utf-8") as f:
+            json.dump(current, f, indent=2)
+
+    if baseline_path:
+        with open(baseline_path, encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("params") != current["params"]:
+            print("Warning: baseline was run with different parameters")
+        regressions = compare(current, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} stage(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,8 @@
 import os
+import json
+import logging
 import sqlite3
+import threading
 from contextlib import contextmanager
 from dotenv import load_dotenv
 
@@ -8,16 +11,67 @@ os.chdir(os.path.dirname(os.path.abspath(__file__)))
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 DB_PATH = os.getenv("DB_PATH", "app.db")
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", 5000))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", 65536))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", 256 * 1024 * 1024))
+
+# One connection per thread (and per process, since forked children must not share it)
+_local = threading.local()
+
+def _connect():
+    conn = sqlite3.connect(DB_PATH, timeout=DB_BUSY_TIMEOUT_MS / 1000)
+    conn.row_factory = sqlite3.Row
+    # WAL lets readers proceed while one writer commits; NORMAL sync is safe under WAL
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute(f'PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}')
+    conn.execute(f'PRAGMA cache_size=-{DB_CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={DB_MMAP_SIZE}')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    return conn
 
 @contextmanager
 def get_db_connection():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """The calling thread's connection, opened on first use and then reused
+
+    Nested uses share the connection. When the outermost block exits, any
+    transaction left uncommitted is rolled back, as closing a connection did.
+    """
+    conn = getattr(_local, 'conn', None)
+    if conn is None or _local.pid != os.getpid():
+        conn = _local.conn = _connect()
+        _local.pid = os.getpid()
+        _local.depth = 0
+    _local.depth += 1
     try:
         yield conn
     finally:
-        conn.close()
+        _local.depth -= 1
+        if _local.depth == 0 and conn.in_transaction:
+            conn.rollback()
+
+@contextmanager
+def transaction():
+    """Run a block of writes as one IMMEDIATE transaction
+
+    Taking the write lock up front avoids lock upgrades failing midway and
+    serializes writers across processes. Joins an enclosing transaction
+    when one is already open on this thread.
+    """
+    with get_db_connection() as conn:
+        if conn.in_transaction:
+            yield conn
+            return
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
 
 def init_db():
     with get_db_connection() as conn:
@@ -52,6 +106,234 @@ def init_db():
                 FOREIGN KEY (job_id) REFERENCES jobs (id)
             )
         ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS skills (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT UNIQUE NOT NULL
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_results (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                analysis_id INTEGER NOT NULL,
+                rank INTEGER NOT NULL,  -- 1-based position by score
+                file_name TEXT,
+                candidate_name TEXT,
+                email TEXT,
+                phone TEXT,
+                score REAL NOT NULL,
+                FOREIGN KEY (analysis_id) REFERENCES analyses (id)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_result_skills (
+                result_id INTEGER NOT NULL,
+                skill_id INTEGER NOT NULL,
+                matched INTEGER NOT NULL,  -- 1 matched, 0 missing
+                PRIMARY KEY (result_id, skill_id),
+                FOREIGN KEY (result_id) REFERENCES analysis_results (id),
+                FOREIGN KEY (skill_id) REFERENCES skills (id)
+            )
+        ''')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_jobs_user ON jobs (user_id)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_analyses_user_created ON analyses (user_id, created_at)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_analyses_job ON analyses (job_id)')
+        conn.execute('''
+            CREATE UNIQUE INDEX IF NOT EXISTS idx_analysis_results_rank
+            ON analysis_results (analysis_id, rank)
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS parse_cache (
+                content_hash TEXT PRIMARY KEY,  -- sha256 of the uploaded file bytes
+                parser_version INTEGER NOT NULL,
+                text TEXT NOT NULL,
+                candidate_name TEXT,
+                email TEXT,
+                phone TEXT,
+                size_bytes INTEGER NOT NULL,
+                last_used_at REAL NOT NULL,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_parse_cache_last_used
+            ON parse_cache (last_used_at)
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS embedding_index (
+                text_hash TEXT NOT NULL,
+                model_name TEXT NOT NULL,
+                max_seq_length INTEGER NOT NULL,
+                dtype TEXT NOT NULL,
+                row_index INTEGER NOT NULL,  -- row in the memory-mapped embedding matrix
+                PRIMARY KEY (text_hash, model_name, max_seq_length, dtype)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS candidates (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,  -- label in the talent pool vector index
+                user_id INTEGER NOT NULL,
+                company TEXT,
+                text_hash TEXT NOT NULL,
+                file_name TEXT,
+                candidate_name TEXT,
+                email TEXT,
+                phone TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                UNIQUE (user_id, text_hash),
+                FOREIGN KEY (user_id) REFERENCES users (id)
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_candidates_company
+            ON candidates (company)
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tfidf_terms (
+                corpus TEXT NOT NULL,
+                term TEXT NOT NULL,
+                column_index INTEGER NOT NULL,
+                PRIMARY KEY (corpus, term)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tfidf_documents (
+                corpus TEXT NOT NULL,
+                text_hash TEXT NOT NULL,
+                row_index INTEGER NOT NULL,
+                PRIMARY KEY (corpus, text_hash)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS tfidf_segments (
+                corpus TEXT NOT NULL,
+                segment_id INTEGER NOT NULL,
+                file_name TEXT NOT NULL,  -- sparse term-count matrix (.npz)
+                start_row INTEGER NOT NULL,
+                n_rows INTEGER NOT NULL,
+                PRIMARY KEY (corpus, segment_id)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_queue (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER NOT NULL,
+                job_id INTEGER NOT NULL,
+                status TEXT NOT NULL DEFAULT 'queued',  -- queued, running, done, failed
+                stage TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                details TEXT,  -- JSON: warnings and other per-run information
+                analysis_id INTEGER,
+                error TEXT,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                worker TEXT,
+                heartbeat_at REAL,
+                submitted_at REAL NOT NULL,
+                finished_at REAL,
+                FOREIGN KEY (user_id) REFERENCES users (id),
+                FOREIGN KEY (job_id) REFERENCES jobs (id),
+                FOREIGN KEY (analysis_id) REFERENCES analyses (id)
+            )
+        ''')
+        conn.execute('''
+            CREATE INDEX IF NOT EXISTS idx_analysis_queue_status
+            ON analysis_queue (status, id)
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS analysis_queue_files (
+                queue_id INTEGER NOT NULL,
+                position INTEGER NOT NULL,
+                file_name TEXT NOT NULL,
+                file_type TEXT NOT NULL,
+                content BLOB NOT NULL,
+                PRIMARY KEY (queue_id, position),
+                FOREIGN KEY (queue_id) REFERENCES analysis_queue (id)
+            )
+        ''')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_stats (
+                name TEXT PRIMARY KEY,
+                hits INTEGER NOT NULL DEFAULT 0,
+                misses INTEGER NOT NULL DEFAULT 0,
+                evictions INTEGER NOT NULL DEFAULT 0
+            )
+        ''')
+        conn.commit()
+        migrate_db(conn)
+
+def insert_analysis_results(conn, analysis_id, results):
+    """Store ranked results and their matched/missing skills as rows"""
+    names = {skill for r in results for skill in r['matched_skills'] + r['missing_skills']}
+    conn.executemany('INSERT OR IGNORE INTO skills (name) VALUES (?)', [(name,) for name in names])
+    skill_ids = {}
+    names = list(names)
+    for i in range(0, len(names), 500):
+        chunk = names[i:i + 500]
+        placeholders = ",".join("?" * len(chunk))
+        for row in conn.execute(f'SELECT id, name FROM skills WHERE name IN ({placeholders})', chunk):
+            skill_ids[row['name']] = row['id']
+
+    for rank, r in enumerate(results, start=1):
+        cursor = conn.execute('''
+            INSERT INTO analysis_results
+            (analysis_id, rank, file_name, candidate_name, email, phone, score)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (analysis_id, rank, r['file_name'], r['candidate_name'],
+              r['contact'].get('email'), r['contact'].get('phone'), r['score']))
+        skills = {skill_ids[name]: 1 for name in r['matched_skills']}
+        skills.update((skill_ids[name], 0) for name in r['missing_skills'] if skill_ids[name] not in skills)
+        conn.executemany('''
+            INSERT INTO analysis_result_skills (result_id, skill_id, matched) VALUES (?, ?, ?)
+        ''', [(cursor.lastrowid, skill_id, matched) for skill_id, matched in skills.items()])
+
+def migrate_db(conn):
+    """Bring an existing database up to the current schema (tracked in PRAGMA user_version)"""
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    if version < 1:
+        # v1: analyses keep a small summary column; per-candidate results move out of the JSON blob
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(analyses)')}
+        if 'summary' not in columns:
+            conn.execute('ALTER TABLE analyses ADD COLUMN summary TEXT')
+        rows = conn.execute('SELECT id, results FROM analyses WHERE results IS NOT NULL').fetchall()
+        for row in rows:
+            try:
+                stored = json.loads(row['results'])
+            except (TypeError, ValueError) as e:
+                logger.error(f"Skipping analysis {row['id']} during migration: {str(e)}")
+                continue
+            insert_analysis_results(conn, row['id'], stored.get('results', []))
+            conn.execute('UPDATE analyses SET summary = ?, results = NULL WHERE id = ?',
+                         (json.dumps(stored.get('summary', {})), row['id']))
+        conn.execute('PRAGMA user_version = 1')
+        conn.commit()
+    if version < 2:
+        # v2: analyses and queued jobs carry a fingerprint of their inputs so repeats can be reused
+        for table in ('analyses', 'analysis_queue'):
+            columns = {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+            if 'fingerprint' not in columns:
+                conn.execute(f'ALTER TABLE {table} ADD COLUMN fingerprint TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_analyses_fingerprint ON analyses (fingerprint)')
+        conn.execute('PRAGMA user_version = 2')
+        conn.commit()
+    if version < 3:
+        # v3: queued jobs carry their owner's tier priority, claimed highest first
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(analysis_queue)')}
+        if 'priority' not in columns:
+            conn.execute('ALTER TABLE analysis_queue ADD COLUMN priority INTEGER NOT NULL DEFAULT 0')
+        conn.execute('PRAGMA user_version = 3')
+        conn.commit()
+    if version < 4:
+        # v4: talent pool candidates are keyed by the text their vector was embedded from
+        from talent_pool import rekey_candidates
+        rekey_candidates(conn)
+        conn.execute('PRAGMA user_version = 4')
+        conn.commit()
+    if version < 5:
+        # v5: multi-role matching jobs list the job of every role they score against
+        columns = {row['name'] for row in conn.execute('PRAGMA table_info(analysis_queue)')}
+        if 'roles' not in columns:
+            conn.execute('ALTER TABLE analysis_queue ADD COLUMN roles TEXT')
+        conn.execute('PRAGMA user_version = 5')
         conn.commit()
 
 if __name__ == "__main__":
@@ -0,0 +1,138 @@
+import os
+import re
+import hashlib
+import logging
+import threading
+import numpy as np
+import metrics
+from database import get_db_connection, transaction
+
+logger = logging.getLogger(__name__)
+
+EMBEDDING_STORE_DIR = os.getenv("EMBEDDING_STORE_DIR", "embeddings")
+EMBEDDING_STORE_DTYPE = os.getenv("EMBEDDING_STORE_DTYPE", "float32")
+
+# Keep IN (...) lookups under SQLite's bound parameter limit
+_LOOKUP_CHUNK = 500
+
+def text_hash(text):
+    """Stable hash of a text, used as the embedding store key"""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+class EmbeddingStore:
+    """Append-only memory-mapped embedding matrix indexed by SQLite
+
+    Each (model, max_seq_length, dtype) combination gets its own matrix file;
+    the embedding_index table maps text hashes to rows in that file.
+    """
+
+    def __init__(self, model_name, max_seq_length, dim, dtype=EMBEDDING_STORE_DTYPE,
+                 directory=EMBEDDING_STORE_DIR):
+        self.model_name = model_name
+        self.max_seq_length = int(max_seq_length)
+        self.dim = int(dim)
+        self.dtype = np.dtype(dtype)
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', model_name)
+        self.path = os.path.join(directory, f"{safe_name}-{self.max_seq_length}-{self.dim}.{self.dtype.name}")
+        self._row_bytes = self.dim * self.dtype.itemsize
+        self._matrix = None
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _key(self):
+        return (self.model_name, self.max_seq_length, self.dtype.name)
+
+    def _view(self, min_rows):
+        """Memory map of the matrix, remapped when other writers have grown the file"""
+        matrix = self._matrix
+        if matrix is None or matrix.shape[0] < min_rows:
+            rows = os.path.getsize(self.path) // self._row_bytes if os.path.exists(self.path) else 0
+            matrix = np.memmap(self.path, dtype=self.dtype, mode='r', shape=(rows, self.dim)) if rows else None
+            self._matrix = matrix
+        return matrix
+
+    def _lookup(self, conn, hashes):
+        rows = {}
+        for i in range(0, len(hashes), _LOOKUP_CHUNK):
+            chunk = hashes[i:i + _LOOKUP_CHUNK]
+            placeholders = ",".join("?" * len(chunk))
+            cursor = conn.execute(f'''
+                SELECT text_hash, row_index FROM embedding_index
+                WHERE model_name = ? AND max_seq_length = ? AND dtype = ?
+                AND text_hash IN ({placeholders})
+            ''', self._key() + tuple(chunk))
+            rows.update((row['text_hash'], row['row_index']) for row in cursor)
+        return rows
+
+    def get_many(self, hashes):
+        """Return {hash: float32 vector} for every hash already in the store"""
+        hashes = list(dict.fromkeys(hashes))
+        if not hashes:
+            return {}
+        with get_db_connection() as conn:
+            rows = self._lookup(conn, hashes)
+        if not rows:
+            return {}
+        matrix = self._view(max(rows.values()) + 1)
+        if matrix is None:
+            return {}
+        found = {}
+        for h, row in rows.items():
+            if row < matrix.shape[0]:
+                found[h] = np.asarray(matrix[row], dtype=np.float32)
+        return found
+
+    def put_many(self, hashes, vectors):
+        """Append vectors for hashes that are not stored yet"""
+        vectors = np.ascontiguousarray(vectors, dtype=self.dtype).reshape(-1, self.dim)
+        # The IMMEDIATE transaction serializes appends across processes
+        with self._lock, transaction() as conn:
+            existing = self._lookup(conn, list(hashes))
+            new_rows = {}
+            for h, vector in zip(hashes, vectors):
+                if h not in existing and h not in new_rows:
+                    new_rows[h] = vector
+            if new_rows:
+                self._append(conn, new_rows)
+
+    def _append(self, conn, new_rows):
+        with open(self.path, 'ab') as f:
+            size = f.seek(0, os.SEEK_END)
+            start = size // self._row_bytes
+            if size % self._row_bytes:
+                # Drop a torn row left behind by an interrupted writer
+                f.truncate(start * self._row_bytes)
+            f.write(np.vstack(list(new_rows.values())).tobytes())
+        conn.executemany('''
+            INSERT OR REPLACE INTO embedding_index
+            (text_hash, model_name, max_seq_length, dtype, row_index)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(h,) + self._key() + (start + i,) for i, h in enumerate(new_rows)])
+
+def encode_with_store(encode, texts, store):
+    """Embed texts, sending only those missing from the store to encode()
+
+    encode takes a list of texts and returns one vector per text.
+    """
+    hashes = [text_hash(text) for text in texts]
+    found = store.get_many(hashes)
+
+    missing = {}
+    for h, text in zip(hashes, texts):
+        if h not in found:
+            missing.setdefault(h, text)
+    metrics.inc("resumeranker_cache_requests_total", len(hashes) - len(missing), cache="embedding_store", result="hit")
+    metrics.inc("resumeranker_cache_requests_total", len(missing), cache="embedding_store", result="miss")
+
+    if missing:
+        with metrics.span("sbert.encode"):
+            vectors = np.asarray(encode(list(missing.values())), dtype=np.float32)
+        found.update(zip(missing, vectors))
+        try:
+            store.put_many(list(missing), vectors)
+        except Exception as e:
+            logger.error(f"Error writing embeddings to store: {str(e)}")
+
+    if not hashes:
+        return np.zeros((0, store.dim), dtype=np.float32)
+    return np.vstack([found[h] for h in hashes])
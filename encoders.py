@@ -0,0 +1,140 @@
+import os
+import json
+import hashlib
+from functools import lru_cache
+import numpy as np
+
+SBERT_BATCH_SIZE = int(os.getenv("SBERT_BATCH_SIZE", 32))
+# Tokens per chunk; 0 uses the model's max_seq_length
+SBERT_CHUNK_TOKENS = int(os.getenv("SBERT_CHUNK_TOKENS", 0))
+# The model's max_seq_length, for when it is needed without loading the model; a model
+# directory's sentence_bert_config.json takes precedence
+SBERT_MAX_SEQ_LENGTH = int(os.getenv("SBERT_MAX_SEQ_LENGTH", 256))
+
+# Inference backend for the sentence encoder: torch, onnx, or onnx-int8 (dynamically quantized ONNX)
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch")
+# Local directory with the model and its onnx/ exports (see export_onnx); empty loads by model name
+ENCODER_MODEL_DIR = os.getenv("ENCODER_MODEL_DIR", "")
+# Instruction set targeted by the int8 export: arm64, avx2, avx512 or avx512_vnni
+ENCODER_QUANTIZATION = os.getenv("ENCODER_QUANTIZATION", "avx512_vnni")
+
+BACKENDS = ("torch", "onnx", "onnx-int8")
+_ONNX_FILES = {"onnx": "onnx/model.onnx", "onnx-int8": "onnx/model_qint8.onnx"}
+
+# [CLS] and [SEP] are added by the encoder and count against max_seq_length
+_SPECIAL_TOKENS = 2
+
+def load_sentence_encoder(model_name, backend=ENCODER_BACKEND, model_dir=ENCODER_MODEL_DIR):
+    """SentenceTransformer running on the chosen backend
+
+    With model_dir set, the model is read from that directory only and
+    nothing is downloaded. ONNX backends expect the files export_onnx writes.
+    """
+    from sentence_transformers import SentenceTransformer
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown encoder backend '{backend}', expected one of {', '.join(BACKENDS)}")
+    source = model_dir or model_name
+    if backend == "torch":
+        return SentenceTransformer(source, local_files_only=bool(model_dir))
+    return SentenceTransformer(source, backend="onnx", local_files_only=bool(model_dir),
+                               model_kwargs={"file_name": _ONNX_FILES[backend],
+                                             "provider": "CPUExecutionProvider"})
+
+@lru_cache(maxsize=8)
+def model_dir_id(model_dir=ENCODER_MODEL_DIR):
+    """Short digest of a model directory's location and files, "" when models load by name
+
+    Re-exporting or replacing the model in place changes the digest, so
+    vectors stored for the old files are not reused.
+    """
+    if not model_dir:
+        return ""
+    root = os.path.realpath(model_dir)
+    digest = hashlib.sha256(root.encode("utf-8"))
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            stat = os.stat(os.path.join(directory, name))
+            path = os.path.relpath(os.path.join(directory, name), root)
+            digest.update(f"\0{path}:{stat.st_size}:{stat.st_mtime_ns}".encode("utf-8"))
+    return digest.hexdigest()[:12]
+
+def export_onnx(model_name, model_dir, quantization=ENCODER_QUANTIZATION):
+    """Save model_name to model_dir with an ONNX export and an int8 dynamically quantized copy"""
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    # Loading with the ONNX backend exports the model when no .onnx file exists yet
+    model = SentenceTransformer(model_name, backend="onnx")
+    model.save_pretrained(model_dir)
+    export_dynamic_quantized_onnx_model(model, quantization, model_dir, file_suffix="qint8")
+
+def chunk_token_budget(model, token_budget=None, max_seq_length=None):
+    """Content tokens per chunk, capped so nothing is truncated by the model
+
+    Pass max_seq_length instead of a model to compute it without one.
+    """
+    max_seq_length = max_seq_length or model.max_seq_length
+    budget = token_budget or SBERT_CHUNK_TOKENS or max_seq_length
+    return max(1, min(budget, max_seq_length) - _SPECIAL_TOKENS)
+
+def configured_max_seq_length(model_dir=ENCODER_MODEL_DIR):
+    """max_seq_length from the model directory's config, else SBERT_MAX_SEQ_LENGTH"""
+    if model_dir:
+        try:
+            with open(os.path.join(model_dir, "sentence_bert_config.json"), encoding="utf-8") as f:
+                return int(json.load(f)["max_seq_length"])
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+    return SBERT_MAX_SEQ_LENGTH
+
+def chunk_text(tokenizer, text, token_budget):
+    """Split text into (chunk, token count) pieces cut on token boundaries"""
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    offsets = encoding["offset_mapping"]
+    if len(offsets) <= token_budget:
+        return [(text, len(offsets))]
+    chunks = []
+    for start in range(0, len(offsets), token_budget):
+        window = offsets[start:start + token_budget]
+        chunks.append((text[window[0][0]:window[-1][1]], len(window)))
+    return chunks
+
+def encode_chunked(model, texts, token_budget=None, batch_size=SBERT_BATCH_SIZE):
+    """Embed texts of any length by chunking, length bucketing and pooling
+
+    Every text is split into chunks that fit the model, all chunks are
+    sorted by token count so each batch holds similarly sized inputs, and
+    the whole set is encoded in one call. Chunk embeddings are then
+    averaged back per text, weighted by their token counts.
+    """
+    budget = chunk_token_budget(model, token_budget)
+    pieces = []
+    for i, text in enumerate(texts):
+        for chunk, length in chunk_text(model.tokenizer, text, budget):
+            pieces.append((length, i, chunk))
+    pieces.sort(key=lambda piece: piece[0])
+
+    if not pieces:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+    vectors = model.encode([piece[2] for piece in pieces], batch_size=batch_size,
+                           convert_to_numpy=True, normalize_embeddings=True)
+
+    owners = np.array([piece[1] for piece in pieces])
+    weights = np.array([max(piece[0], 1) for piece in pieces], dtype=np.float32)
+    pooled = np.zeros((len(texts), vectors.shape[1]), dtype=np.float32)
+    np.add.at(pooled, owners, vectors * weights[:, None])
+    totals = np.bincount(owners, weights=weights, minlength=len(texts))
+    return pooled / np.maximum(totals, 1)[:, None].astype(np.float32)
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description="Export a sentence encoder for the ONNX backends")
+    parser.add_argument("--model", default="all-MiniLM-L6-v2")
+    parser.add_argument("--out", required=True, help="directory to use as ENCODER_MODEL_DIR")
+    parser.add_argument("--quantization", default=ENCODER_QUANTIZATION,
+                        choices=["arm64", "avx2", "avx512", "avx512_vnni"])
+    args = parser.parse_args()
+    export_onnx(args.model, args.out, args.quantization)
+    print(f"Exported {args.model} to {args.out}; set ENCODER_MODEL_DIR={args.out} and ENCODER_BACKEND")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Prometheus text is written here after every analysis job; unset disables the file
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+# Documents whose parsing takes longer than this are logged and listed per job
+METRICS_SLOW_DOC_SECONDS = float(os.getenv("METRICS_SLOW_DOC_SECONDS", 2.0))
+
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+HELP = {
+    "resumeranker_stage_seconds": ("histogram", "Time spent per pipeline stage (per document for parse stages)"),
+    "resumeranker_cache_requests_total": ("counter", "Cache lookups by cache and result"),
+    "resumeranker_model_loads_total": ("counter", "Models loaded in this process"),
+    "resumeranker_model_load_seconds_total": ("counter", "Seconds spent loading models"),
+    "resumeranker_slow_documents_total": ("counter", "Documents slower than METRICS_SLOW_DOC_SECONDS"),
+    "resumeranker_degraded_documents_total": ("counter", "Documents that hit a parser size, page, time or memory limit"),
+    "resumeranker_archive_skipped_members_total": ("counter", "Archive members skipped as unsupported, encrypted, oversized or corrupt"),
+    "resumeranker_scheduler_wait_seconds": ("histogram", "Time inference requests waited for a slot, by tier"),
+    "resumeranker_scheduler_queue_depth": ("gauge", "Inference requests waiting for a slot"),
+    "resumeranker_scheduler_active_slots": ("gauge", "Inference slots in use"),
+}
+
+# Process-wide, like the model registry; each process exports its own numbers
+_lock = threading.Lock()
+_counters = {}
+_gauges = {}
+_histograms = {}
+_slow_documents = deque(maxlen=100)
+_local = threading.local()
+
+class Trace:
+    """Per-stage totals and slow documents collected on one thread, e.g. for one job"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.slow_documents = []
+
+    def add(self, stage, seconds):
+        total = self.stages.setdefault(stage, {"count": 0, "seconds": 0.0})
+        total["count"] += 1
+        total["seconds"] += seconds
+
+    def summary(self):
+        return {
+            "wall_seconds": round(time.perf_counter() - self.started, 3),
+            "stages": {stage: {"count": t["count"], "seconds": round(t["seconds"], 4)}
+                       for stage, t in self.stages.items()},
+            "slow_documents": self.slow_documents[-20:]
+        }
+
+def _key(name, labels):
+    return name, tuple(sorted(labels.items()))
+
+def inc(name, amount=1, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _counters[key] = _counters.get(key, 0) + amount
+
+def set_gauge(name, value, **labels):
+    key = _key(name, labels)
+    with _lock:
+        _gauges[key] = value
+
+def observe(name, seconds, **labels):
+    key = _key(name, labels)
+    with _lock:
+        histogram = _histograms.get(key)
+        if histogram is None:
+            histogram = _histograms[key] = {"buckets": [0] * len(BUCKETS), "sum": 0.0, "count": 0}
+        for i, bound in enumerate(BUCKETS):
+            if seconds <= bound:
+                histogram["buckets"][i] += 1
+        histogram["sum"] += seconds
+        histogram["count"] += 1
+
+def observe_stage(stage, seconds, file_name=None):
+    """Record one stage timing, flagging slow documents when a file name is given"""
+    observe("resumeranker_stage_seconds", seconds, stage=stage)
+    trace = getattr(_local, "trace", None)
+    if trace is not None:
+        trace.add(stage, seconds)
+    if file_name is not None and seconds > METRICS_SLOW_DOC_SECONDS:
+        entry = {"file_name": file_name, "stage": stage, "seconds": round(seconds, 3)}
+        inc("resumeranker_slow_documents_total", stage=stage)
+        with _lock:
+            _slow_documents.append(entry)
+        if trace is not None:
+            trace.slow_documents.append(entry)
+        logger.warning(f"Slow document {file_name}: {stage} took {seconds:.2f}s")
+
+@contextmanager
+def span(stage):
+    """Time a block as one observation of the stage"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+@contextmanager
+def trace():
+    """Collect every stage recorded on this thread inside the block"""
+    collected = Trace()
+    previous = getattr(_local, "trace", None)
+    _local.trace = collected
+    try:
+        yield collected
+    finally:
+        _local.trace = previous
+
+def slow_documents():
+    with _lock:
+        return list(_slow_documents)
+
+def _labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+def prometheus_text():
+    """All metrics of this process in the Prometheus text exposition format"""
+    with _lock:
+        counters = dict(_counters)
+        counters.update(_gauges)
+        histograms = {key: {"buckets": list(h["buckets"]), "sum": h["sum"], "count": h["count"]}
+                      for key, h in _histograms.items()}
+    lines = []
+    for name in sorted({name for name, _ in counters} | {name for name, _ in histograms}):
+        kind, help_text = HELP.get(name, ("untyped", name))
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        for (metric, labels), value in sorted(counters.items()):
+            if metric == name:
+                lines.append(f"{name}{_labels(labels)} {value}")
+        for (metric, labels), histogram in sorted(histograms.items()):
+            if metric != name:
+                continue
+            for bound, count in zip(BUCKETS, histogram["buckets"]):
+                lines.append(f"{name}_bucket{_labels(labels, [('le', bound)])} {count}")
+            lines.append(f"{name}_bucket{_labels(labels, [('le', '+Inf')])} {histogram['count']}")
+            lines.append(f"{name}_sum{_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{_labels(labels)} {histogram['count']}")
+    return "\n".join(lines) + "\n"
+
+def write_prometheus(path=None):
+    """Write the metrics to a file atomically, for a node exporter textfile collector"""
+    path = path or METRICS_FILE
+    if not path:
+        return
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(prometheus_text())
+    os.replace(tmp_path, path)
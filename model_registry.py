@@ -0,0 +1,68 @@
+import os
+import time
+import logging
+import threading
+import metrics
+
+logger = logging.getLogger(__name__)
+
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "1") == "1"
+
+# Module state is process-wide, so every Streamlit session in a process shares one copy of each model
+_loaders = {}
+_models = {}
+_load_times = {}
+_locks = {}
+_warming = set()
+_registry_lock = threading.Lock()
+
+def register_model(name, loader):
+    """Register a zero-argument loader; nothing is loaded until first use"""
+    with _registry_lock:
+        _loaders[name] = loader
+        _locks.setdefault(name, threading.Lock())
+
+def get_model(name):
+    """Return the named model, loading it on first use"""
+    model = _models.get(name)
+    if model is not None:
+        return model
+    with _locks[name]:
+        if name not in _models:
+            start = time.perf_counter()
+            _models[name] = _loaders[name]()
+            _load_times[name] = time.perf_counter() - start
+            metrics.inc("resumeranker_model_loads_total", model=name)
+            metrics.inc("resumeranker_model_load_seconds_total", _load_times[name], model=name)
+            logger.info(f"Loaded model '{name}' in {_load_times[name]:.2f}s")
+    return _models[name]
+
+def is_loaded(name):
+    return name in _models
+
+def model_load_times():
+    """Seconds spent loading each model that has been loaded in this process"""
+    return dict(_load_times)
+
+def warm_up(names=None):
+    """Load models in a background thread so the first analysis does not wait"""
+    with _registry_lock:
+        pending = [name for name in (names or list(_loaders))
+                   if name in _loaders and name not in _models and name not in _warming]
+        _warming.update(pending)
+    if not pending:
+        return None
+
+    def _load():
+        for name in pending:
+            try:
+                get_model(name)
+            except Exception as e:
+                logger.error(f"Error warming up model '{name}': {str(e)}")
+            finally:
+                with _registry_lock:
+                    _warming.discard(name)
+
+    thread = threading.Thread(target=_load, name="model-warmup", daemon=True)
+    thread.start()
+    return thread
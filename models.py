@@ -1,6 +1,21 @@
+import os
+import json
+import time
 import sqlite3
+import threading
 import bcrypt
-from database import get_db_connection
+import metrics
+from collections import OrderedDict
+from database import get_db_connection, transaction, insert_analysis_results
+
+PARSE_CACHE_MAX_BYTES = int(os.getenv("PARSE_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+# Fingerprint lookups remembered per process in front of the analyses table
+ANALYSIS_MEMO_SIZE = int(os.getenv("ANALYSIS_MEMO_SIZE", 256))
+# Queued analyses of higher tiers are claimed first; this much waiting counts as one tier
+QUEUE_AGING_SECONDS = float(os.getenv("QUEUE_AGING_SECONDS", 120))
+
+_analysis_memo = OrderedDict()
+_analysis_memo_lock = threading.Lock()
 
 class User:
     def __init__(self, email, password_hash, company=None, subscription_level="free", id=None):
@@ -38,6 +53,46 @@ class User:
                 )
         return None
     
+    @staticmethod
+    def delete(user_id):
+        """Remove a user with their jobs, analyses, queued jobs and talent pool candidates"""
+        from talent_pool import remove_user_candidates
+        remove_user_candidates(user_id)
+        with transaction() as conn:
+            conn.execute('''
+                DELETE FROM analysis_result_skills WHERE result_id IN (
+                    SELECT r.id FROM analysis_results r JOIN analyses a ON a.id = r.analysis_id
+                    WHERE a.user_id = ?)
+            ''', (user_id,))
+            conn.execute('''
+                DELETE FROM analysis_results
+                WHERE analysis_id IN (SELECT id FROM analyses WHERE user_id = ?)
+            ''', (user_id,))
+            conn.execute('''
+                DELETE FROM analysis_queue_files
+                WHERE queue_id IN (SELECT id FROM analysis_queue WHERE user_id = ?)
+            ''', (user_id,))
+            conn.execute('DELETE FROM analysis_queue WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM analyses WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM jobs WHERE user_id = ?', (user_id,))
+            conn.execute('DELETE FROM users WHERE id = ?', (user_id,))
+        with _analysis_memo_lock:
+            _analysis_memo.clear()
+    
+    @staticmethod
+    def get_by_id(user_id):
+        with get_db_connection() as conn:
+            user_data = conn.execute('SELECT * FROM users WHERE id = ?', (user_id,)).fetchone()
+            if user_data:
+                return User(
+                    id=user_data['id'],
+                    email=user_data['email'],
+                    password_hash=user_data['password_hash'],
+                    company=user_data['company'],
+                    subscription_level=user_data['subscription_level']
+                )
+        return None
+    
     def verify_password(self, password):
         return bcrypt.checkpw(password.encode('utf-8'), self.password_hash.encode('utf-8'))
     
@@ -60,19 +115,147 @@ class Job:
             ''', (user_id, job_title, job_description))
             conn.commit()
             return cursor.lastrowid
+    
+    @staticmethod
+    def get(job_id):
+        with get_db_connection() as conn:
+            return conn.execute('SELECT * FROM jobs WHERE id = ?', (job_id,)).fetchone()
 
 class Analysis:
     @staticmethod
-    def save_results(user_id, job_id, results):
-        with get_db_connection() as conn:
+    def save_results(user_id, job_id, results, summary, fingerprint=None):
+        with metrics.span("db.save_results"), transaction() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO analyses (user_id, job_id, summary, fingerprint)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, job_id, json.dumps(summary), fingerprint))
+            analysis_id = cursor.lastrowid
+            insert_analysis_results(conn, analysis_id, results)
+            return analysis_id
+    
+    @staticmethod
+    def copy(analysis_id, user_id, job_id):
+        """Store an existing analysis again under a user's job, e.g. when reusing a colleague's
+
+        The copy does not depend on the original, which its owner may
+        delete. Returns the new id, or None if the original is gone.
+        """
+        with metrics.span("db.save_results"), transaction() as conn:
+            source = conn.execute('SELECT summary, fingerprint FROM analyses WHERE id = ?',
+                                  (analysis_id,)).fetchone()
+            if source is None:
+                return None
+            copy_id = conn.execute('''
+                INSERT INTO analyses (user_id, job_id, summary, fingerprint)
+                VALUES (?, ?, ?, ?)
+            ''', (user_id, job_id, source['summary'], source['fingerprint'])).lastrowid
             conn.execute('''
-                INSERT INTO analyses (user_id, job_id, results)
-                VALUES (?, ?, ?)
-            ''', (user_id, job_id, results))
-            conn.commit()
+                INSERT INTO analysis_results (analysis_id, rank, file_name, candidate_name, email, phone, score)
+                SELECT ?, rank, file_name, candidate_name, email, phone, score
+                FROM analysis_results WHERE analysis_id = ?
+            ''', (copy_id, analysis_id))
+            conn.execute('''
+                INSERT INTO analysis_result_skills (result_id, skill_id, matched)
+                SELECT copied.id, s.skill_id, s.matched FROM analysis_result_skills s
+                JOIN analysis_results original ON original.id = s.result_id
+                JOIN analysis_results copied ON copied.analysis_id = ? AND copied.rank = original.rank
+                WHERE original.analysis_id = ?
+            ''', (copy_id, analysis_id))
+            return copy_id
     
     @staticmethod
-    def get_history(user_id):
+    def find_by_fingerprint(fingerprint, user_id, company=None):
+        """Latest stored analysis with these inputs visible to the user, as {id, job_id}
+
+        Analyses by the user and, when they have a company, by their
+        colleagues are considered. Hits are remembered in a small
+        in-process LRU; the fingerprint already changes with the model
+        and skills file, so entries never need invalidating.
+        """
+        # Signup stores a blank company as "", which must not pool unrelated users together
+        company = company or None
+        key = (fingerprint, user_id, company)
+        with _analysis_memo_lock:
+            found = _analysis_memo.get(key)
+            if found is not None:
+                _analysis_memo.move_to_end(key)
+        if found is None:
+            with get_db_connection() as conn:
+                row = conn.execute('''
+                    SELECT a.id, a.job_id FROM analyses a
+                    JOIN users u ON u.id = a.user_id
+                    WHERE a.fingerprint = ? AND (a.user_id = ? OR (? IS NOT NULL AND u.company = ?))
+                    ORDER BY a.id DESC LIMIT 1
+                ''', (fingerprint, user_id, company, company)).fetchone()
+            if row is None:
+                metrics.inc("resumeranker_cache_requests_total", cache="analyses", result="miss")
+                return None
+            found = {"id": row['id'], "job_id": row['job_id']}
+            with _analysis_memo_lock:
+                _analysis_memo[key] = found
+                while len(_analysis_memo) > ANALYSIS_MEMO_SIZE:
+                    _analysis_memo.popitem(last=False)
+        metrics.inc("resumeranker_cache_requests_total", cache="analyses", result="hit")
+        return dict(found)
+    
+    @staticmethod
+    def get_summary(analysis_id):
+        with get_db_connection() as conn:
+            row = conn.execute('SELECT summary FROM analyses WHERE id = ?', (analysis_id,)).fetchone()
+        return json.loads(row['summary']) if row and row['summary'] else None
+    
+    @staticmethod
+    def count_results(analysis_id):
+        with get_db_connection() as conn:
+            return conn.execute('''
+                SELECT COUNT(*) FROM analysis_results WHERE analysis_id = ?
+            ''', (analysis_id,)).fetchone()[0]
+    
+    @staticmethod
+    def get_score_histogram(analysis_id, bin_width=5):
+        """(bin start, count) pairs of the 0-100 scores, counted in SQL"""
+        with get_db_connection() as conn:
+            rows = conn.execute('''
+                SELECT MIN(CAST(score / ? AS INTEGER), ?) AS bin, COUNT(*) FROM analysis_results
+                WHERE analysis_id = ? GROUP BY bin ORDER BY bin
+            ''', (bin_width, int(100 / bin_width) - 1, analysis_id)).fetchall()
+        return [(row[0] * bin_width, row[1]) for row in rows]
+    
+    @staticmethod
+    def get_results(analysis_id, offset=0, limit=None):
+        """Ranked results with their skills; one indexed query per page"""
+        last_rank = offset + limit if limit is not None else -1
+        with metrics.span("db.get_results"), get_db_connection() as conn:
+            rows = conn.execute('''
+                SELECT r.id, r.rank, r.file_name, r.candidate_name, r.email, r.phone, r.score,
+                       s.name AS skill, rs.matched
+                FROM analysis_results r
+                LEFT JOIN analysis_result_skills rs ON rs.result_id = r.id
+                LEFT JOIN skills s ON s.id = rs.skill_id
+                WHERE r.analysis_id = ? AND r.rank > ? AND (? < 0 OR r.rank <= ?)
+                ORDER BY r.rank
+            ''', (analysis_id, offset, last_rank, last_rank)).fetchall()
+        
+        results = {}
+        for row in rows:
+            result = results.get(row['id'])
+            if result is None:
+                result = results[row['id']] = {
+                    "rank": row['rank'],
+                    "file_name": row['file_name'],
+                    "candidate_name": row['candidate_name'],
+                    "contact": {"email": row['email'], "phone": row['phone']},
+                    "score": row['score'],
+                    "matched_skills": [],
+                    "missing_skills": []
+                }
+            if row['skill'] is not None:
+                result["matched_skills" if row['matched'] else "missing_skills"].append(row['skill'])
+        return list(results.values())
+    
+    @staticmethod
+    def get_history(user_id, offset=0, limit=None):
         with get_db_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
@@ -81,5 +264,277 @@ class Analysis:
                 JOIN jobs j ON a.job_id = j.id
                 WHERE a.user_id = ?
                 ORDER BY a.created_at DESC
-            ''', (user_id,))
-            return cursor.fetchall()
\ No newline at end of file
+                LIMIT ? OFFSET ?
+            ''', (user_id, limit if limit is not None else -1, offset))
+            return cursor.fetchall()
+    
+    @staticmethod
+    def count_history(user_id):
+        with get_db_connection() as conn:
+            return conn.execute('''
+                SELECT COUNT(*) FROM analyses WHERE user_id = ?
+            ''', (user_id,)).fetchone()[0]
+
+class AnalysisQueue:
+    """Durable queue of analyses waiting for, or being run by, worker processes"""
+    STAGES = ["parsing", "scoring", "saving"]
+
+    @staticmethod
+    def submit(user_id, job_id, files, fingerprint=None, priority=0, role_job_ids=None):
+        """Queue an analysis of the files against a job
+
+        With role_job_ids the files are instead matched against every one of
+        those jobs at once (multi-role matching), and the result is kept in
+        the job's details rather than stored as an analysis.
+        """
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO analysis_queue (user_id, job_id, fingerprint, priority, roles, submitted_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (user_id, job_id, fingerprint, priority,
+                  json.dumps(role_job_ids) if role_job_ids else None, time.time()))
+            queue_id = cursor.lastrowid
+            conn.executemany('''
+                INSERT INTO analysis_queue_files (queue_id, position, file_name, file_type, content)
+                VALUES (?, ?, ?, ?, ?)
+            ''', [(queue_id, i, name, file_type, sqlite3.Binary(data))
+                  for i, (name, data, file_type) in enumerate(files)])
+            conn.commit()
+            return queue_id
+
+    @staticmethod
+    def submit_reused(user_id, job_id, analysis_id, fingerprint=None):
+        """Record a submission answered by an already stored analysis; no worker is involved"""
+        now = time.time()
+        with get_db_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO analysis_queue
+                (user_id, job_id, status, progress, details, analysis_id, fingerprint, submitted_at, finished_at)
+                VALUES (?, ?, 'done', 1, ?, ?, ?, ?, ?)
+            ''', (user_id, job_id, json.dumps({"reused": True}), analysis_id, fingerprint, now, now))
+            conn.commit()
+            return cursor.lastrowid
+
+    @staticmethod
+    def claim(worker, stale_after, max_attempts):
+        """Atomically take the next queued job, first re-queuing abandoned ones
+
+        Higher priority (subscription tier) goes first; every
+        QUEUE_AGING_SECONDS of waiting counts as one level, so jobs of lower
+        tiers are not starved.
+        """
+        now = time.time()
+        with transaction() as conn:
+            # Jobs whose worker stopped heartbeating were interrupted (crash or restart)
+            conn.execute('''
+                UPDATE analysis_queue
+                SET status = CASE WHEN attempts >= ? THEN 'failed' ELSE 'queued' END,
+                    error = CASE WHEN attempts >= ? THEN 'Interrupted too many times' ELSE error END,
+                    finished_at = CASE WHEN attempts >= ? THEN ? ELSE finished_at END,
+                    worker = NULL
+                WHERE status = 'running' AND heartbeat_at < ?
+            ''', (max_attempts, max_attempts, max_attempts, now, now - stale_after))
+            row = conn.execute('''
+                SELECT * FROM analysis_queue WHERE status = 'queued'
+                ORDER BY priority + (? - submitted_at) / ? DESC, id LIMIT 1
+            ''', (now, QUEUE_AGING_SECONDS)).fetchone()
+            if row:
+                conn.execute('''
+                    UPDATE analysis_queue
+                    SET status = 'running', stage = ?, progress = 0, worker = ?,
+                        attempts = attempts + 1, heartbeat_at = ?
+                    WHERE id = ?
+                ''', (AnalysisQueue.STAGES[0], worker, now, row['id']))
+        return AnalysisQueue.get(row['id']) if row else None
+
+    @staticmethod
+    def position(queue_id):
+        """Queued jobs that will be claimed before this one if nothing else arrives"""
+        with get_db_connection() as conn:
+            return conn.execute('''
+                SELECT COUNT(*) FROM analysis_queue q JOIN analysis_queue mine ON mine.id = ?
+                WHERE q.status = 'queued' AND q.id != mine.id
+                AND (q.priority - mine.priority + (mine.submitted_at - q.submitted_at) / ? > 0
+                     OR (q.priority - mine.priority + (mine.submitted_at - q.submitted_at) / ? = 0
+                         AND q.id < mine.id))
+            ''', (queue_id, QUEUE_AGING_SECONDS, QUEUE_AGING_SECONDS)).fetchone()[0]
+
+    @staticmethod
+    def get(queue_id):
+        with get_db_connection() as conn:
+            row = conn.execute('SELECT * FROM analysis_queue WHERE id = ?', (queue_id,)).fetchone()
+        if not row:
+            return None
+        job = dict(row)
+        job['details'] = json.loads(job['details']) if job['details'] else {}
+        job['roles'] = json.loads(job['roles']) if job['roles'] else None
+        return job
+
+    @staticmethod
+    def get_files(queue_id):
+        with get_db_connection() as conn:
+            rows = conn.execute('''
+                SELECT file_name, content, file_type FROM analysis_queue_files
+                WHERE queue_id = ? ORDER BY position
+            ''', (queue_id,)).fetchall()
+        return [(row['file_name'], bytes(row['content']), row['file_type']) for row in rows]
+
+    @staticmethod
+    def count_files(queue_id):
+        with get_db_connection() as conn:
+            return conn.execute('''
+                SELECT COUNT(*) FROM analysis_queue_files WHERE queue_id = ?
+            ''', (queue_id,)).fetchone()[0]
+
+    @staticmethod
+    def iter_files(queue_id, batch_size):
+        """Yield the job's files in upload order, one batch in memory at a time"""
+        position = 0
+        while True:
+            with get_db_connection() as conn:
+                rows = conn.execute('''
+                    SELECT position, file_name, content, file_type FROM analysis_queue_files
+                    WHERE queue_id = ? AND position >= ? ORDER BY position LIMIT ?
+                ''', (queue_id, position, batch_size)).fetchall()
+            if not rows:
+                return
+            position = rows[-1]['position'] + 1
+            yield [(row['file_name'], bytes(row['content']), row['file_type']) for row in rows]
+
+    @staticmethod
+    def update(queue_id, stage=None, progress=None, details=None):
+        """Record progress; also serves as the worker's heartbeat"""
+        with get_db_connection() as conn:
+            conn.execute('''
+                UPDATE analysis_queue
+                SET stage = COALESCE(?, stage), progress = COALESCE(?, progress),
+                    details = COALESCE(?, details), heartbeat_at = ?
+                WHERE id = ?
+            ''', (stage, progress, json.dumps(details) if details is not None else None,
+                  time.time(), queue_id))
+            conn.commit()
+
+    @staticmethod
+    def complete(queue_id, analysis_id):
+        with get_db_connection() as conn:
+            conn.execute('''
+                UPDATE analysis_queue
+                SET status = 'done', stage = NULL, progress = 1, analysis_id = ?, finished_at = ?
+                WHERE id = ?
+            ''', (analysis_id, time.time(), queue_id))
+            # Uploaded files are only needed until the analysis is stored
+            conn.execute('DELETE FROM analysis_queue_files WHERE queue_id = ?', (queue_id,))
+            conn.commit()
+
+    @staticmethod
+    def fail(queue_id, error):
+        with get_db_connection() as conn:
+            conn.execute('''
+                UPDATE analysis_queue SET status = 'failed', error = ?, finished_at = ?
+                WHERE id = ?
+            ''', (error, time.time(), queue_id))
+            conn.execute('DELETE FROM analysis_queue_files WHERE queue_id = ?', (queue_id,))
+            conn.commit()
+
+class ParseCache:
+    """Parsed resume text and metadata keyed by a hash of the file bytes"""
+    NAME = "parse_cache"
+
+    @staticmethod
+    def get(content_hash, parser_version):
+        return ParseCache.get_many([content_hash], parser_version).get(content_hash)
+
+    @staticmethod
+    def get_many(content_hashes, parser_version):
+        """Cached entries for the given hashes, looked up in one transaction"""
+        hashes = list(dict.fromkeys(content_hashes))
+        if not hashes:
+            return {}
+        found = {}
+        with transaction() as conn:
+            for start in range(0, len(hashes), 500):
+                chunk = hashes[start:start + 500]
+                placeholders = ','.join('?' * len(chunk))
+                rows = conn.execute(f'''
+                    SELECT content_hash, text, candidate_name, email, phone FROM parse_cache
+                    WHERE parser_version = ? AND content_hash IN ({placeholders})
+                ''', (parser_version, *chunk)).fetchall()
+                for row in rows:
+                    found[row['content_hash']] = {
+                        "text": row['text'],
+                        "candidate_name": row['candidate_name'],
+                        "contact": {"email": row['email'], "phone": row['phone']}
+                    }
+            now = time.time()
+            conn.executemany('''
+                UPDATE parse_cache SET last_used_at = ? WHERE content_hash = ?
+            ''', [(now, h) for h in found])
+            if found:
+                ParseCache._count(conn, "hits", len(found))
+            if len(hashes) > len(found):
+                ParseCache._count(conn, "misses", len(hashes) - len(found))
+        metrics.inc("resumeranker_cache_requests_total", len(found), cache=ParseCache.NAME, result="hit")
+        metrics.inc("resumeranker_cache_requests_total", len(hashes) - len(found), cache=ParseCache.NAME, result="miss")
+        return found
+
+    @staticmethod
+    def put(content_hash, parser_version, text, candidate_name, contact):
+        ParseCache.put_many([(content_hash, text, candidate_name, contact)], parser_version)
+
+    @staticmethod
+    def put_many(entries, parser_version):
+        """Store (content_hash, text, candidate_name, contact) entries in one transaction"""
+        if not entries:
+            return
+        now = time.time()
+        with transaction() as conn:
+            conn.executemany('''
+                INSERT OR REPLACE INTO parse_cache
+                (content_hash, parser_version, text, candidate_name, email, phone, size_bytes, last_used_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', [(h, parser_version, text, candidate_name, contact.get('email'), contact.get('phone'),
+                   len(text.encode('utf-8')), now) for h, text, candidate_name, contact in entries])
+            ParseCache._evict(conn)
+
+    @staticmethod
+    def _evict(conn):
+        # Drop least recently used entries once the cache exceeds its byte budget
+        cursor = conn.execute('''
+            DELETE FROM parse_cache WHERE content_hash IN (
+                SELECT content_hash FROM (
+                    SELECT content_hash,
+                           SUM(size_bytes) OVER (ORDER BY last_used_at DESC, content_hash) AS running
+                    FROM parse_cache
+                ) WHERE running > ?
+            )
+        ''', (PARSE_CACHE_MAX_BYTES,))
+        if cursor.rowcount > 0:
+            ParseCache._count(conn, "evictions", cursor.rowcount)
+
+    @staticmethod
+    def _count(conn, column, amount=1):
+        conn.execute(f'''
+            INSERT INTO cache_stats (name, {column}) VALUES (?, ?)
+            ON CONFLICT(name) DO UPDATE SET {column} = {column} + excluded.{column}
+        ''', (ParseCache.NAME, amount))
+
+    @staticmethod
+    def stats():
+        with get_db_connection() as conn:
+            usage = conn.execute('''
+                SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM parse_cache
+            ''').fetchone()
+            counters = conn.execute('''
+                SELECT hits, misses, evictions FROM cache_stats WHERE name = ?
+            ''', (ParseCache.NAME,)).fetchone()
+        hits, misses, evictions = tuple(counters) if counters else (0, 0, 0)
+        return {
+            "entries": usage[0],
+            "size_bytes": usage[1],
+            "max_bytes": PARSE_CACHE_MAX_BYTES,
+            "hits": hits,
+            "misses": misses,
+            "evictions": evictions
+        }
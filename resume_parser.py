@@ -1,38 +1,387 @@
-import pdfplumber
 import fitz  # PyMuPDF
 from docx import Document
+from io import BytesIO
+from collections import deque
+from multiprocessing.connection import wait
+import multiprocessing
 import re
 import os
+import hashlib
+import time
 import logging
+import threading
+import metrics
+
+try:
+    import resource
+except ImportError:  # Windows: no address-space limit for parser processes
+    resource = None
 
 logger = logging.getLogger(__name__)
 
-def extract_text(file_path, file_type):
-    text = ""
+# Bump when extraction logic changes so cached parses are not reused
+PARSER_VERSION = 2
+
+# Parser subprocesses; 0 parses in the calling process without the time and memory limits
+PARSE_WORKERS = int(os.getenv("PARSE_WORKERS", os.cpu_count() or 1))
+# Per-document limits; a document that hits one is reported as degraded
+PARSE_TIMEOUT_SECONDS = float(os.getenv("PARSE_TIMEOUT_SECONDS", 30))
+PARSE_MAX_MEMORY_MB = int(os.getenv("PARSE_MAX_MEMORY_MB", 1024))  # on top of what a parser process starts with
+PARSE_MAX_PAGES = int(os.getenv("PARSE_MAX_PAGES", 50))
+PARSE_MAX_BYTES = int(os.getenv("PARSE_MAX_BYTES", 20 * 1024 * 1024))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def content_hash(data):
+    """Stable hash of raw file bytes, used as the parse cache key"""
+    return hashlib.sha256(data).hexdigest()
+
+def _read_text(source, file_type):
+    """Text of the document and the number of PDF pages skipped by the page cap"""
+    in_memory = isinstance(source, (bytes, bytearray, memoryview))
+    parts = []
+    skipped = 0
+    if file_type == "pdf":
+        # Using PyMuPDF for better text extraction
+        doc = fitz.open(stream=bytes(source), filetype="pdf") if in_memory else fitz.open(source)
+        with doc:
+            pages = min(doc.page_count, PARSE_MAX_PAGES) if PARSE_MAX_PAGES > 0 else doc.page_count
+            skipped = doc.page_count - pages
+            for number in range(pages):
+                parts.append(doc[number].get_text())
+    elif file_type == "docx":
+        doc = Document(BytesIO(source) if in_memory else source)
+        for para in doc.paragraphs:
+            parts.append(para.text + "\n")
+    return "".join(parts), skipped
+
+def extract_text(source, file_type):
+    """Extract plain text from a file path or the raw bytes of a PDF/DOCX"""
     try:
-        if file_type == "pdf":
-            # Using PyMuPDF for better text extraction
-            with fitz.open(file_path) as doc:
-                for page in doc:
-                    text += page.get_text()
-        elif file_type == "docx":
-            doc = Document(file_path)
-            for para in doc.paragraphs:
-                text += para.text + "\n"
+        return _read_text(source, file_type)[0]
     except Exception as e:
-        logger.error(f"Error parsing {file_path}: {str(e)}")
-    return text
+        name = source if isinstance(source, str) else "<memory>"
+        logger.error(f"Error parsing {name}: {str(e)}")
+    return ""
+
+# Headings recognized by segment_resume, per section; text before the first one is the header
+SECTION_HEADINGS = {
+    "summary": ("summary", "profile", "objective", "about me", "professional summary", "career objective"),
+    "skills": ("skills", "technical skills", "key skills", "core competencies", "competencies",
+               "technologies", "tools", "certifications", "licenses and certifications"),
+    "experience": ("experience", "work experience", "professional experience", "employment",
+                   "employment history", "work history", "projects"),
+    "education": ("education", "academic background", "qualifications"),
+    "other": ("interests", "hobbies", "languages", "awards", "publications", "volunteering", "references")
+}
+SECTIONS = ("header", "summary", "skills", "experience", "education", "other")
+
+_HEADINGS = {heading: section for section, headings in SECTION_HEADINGS.items() for heading in headings}
+_HEADING_RE = re.compile(r"^[\W_]*([A-Za-z][A-Za-z &/]{1,38}?)[\s:|-]*$")
+_INLINE_HEADING_RE = re.compile(r"^[\W_]*([A-Za-z][A-Za-z &/]{1,38}?)\s*:\s*(\S.*)$")
+_NAME_RE = re.compile(r"^\s*([A-Z][a-z]+([ \t]+[A-Z][a-z]+)+)")
+_EMAIL_RE = re.compile(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b')
+_PHONE_RE = re.compile(r'(\d{3}[-\.\s]??\d{3}[-\.\s]??\d{4}|\(\d{3}\)\s*\d{3}[-\.\s]??\d{4}|\d{3}[-\.\s]??\d{4})')
+
+def _heading(label):
+    return _HEADINGS.get(" ".join(label.lower().replace("&", "and").split()))
+
+def segment_resume(text):
+    """Split resume text into SECTIONS in one pass over its lines
+
+    Lines before the first recognized heading form the header (name and
+    contact details). A "Skills: Python, SQL" line opens the section and
+    keeps its content. Text without recognized headings stays entirely
+    in the header.
+    """
+    parts = {name: [] for name in SECTIONS}
+    current = parts["header"]
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped:
+            match = _HEADING_RE.match(stripped) if len(stripped) <= 40 else None
+            section = match and _heading(match.group(1))
+            if section:
+                current = parts[section]
+                continue
+            match = _INLINE_HEADING_RE.match(stripped) if ":" in stripped else None
+            section = match and _heading(match.group(1))
+            if section:
+                current = parts[section]
+                line = match.group(2)
+        current.append(line)
+    return {name: "\n".join(lines).strip() for name, lines in parts.items()}
+
+def section_text(sections, names):
+    """The named sections joined, or every section when none of them has text"""
+    text = "\n\n".join(sections[name] for name in names if sections.get(name))
+    return text or "\n\n".join(part for part in sections.values() if part)
 
 def extract_name(text):
-    # Simple heuristic to find candidate name
-    name_pattern = r"^([A-Z][a-z]+(\s+[A-Z][a-z]+)+)"
-    match = re.search(name_pattern, text)
-    return match.group(0) if match else "Unknown"
+    # Simple heuristic: capitalized words starting the text, on one line
+    match = _NAME_RE.match(text)
+    return match.group(1) if match else "Unknown"
 
 def extract_contact_info(text):
-    email = re.search(r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b', text)
-    phone = re.search(r'(\d{3}[-\.\s]??\d{3}[-\.\s]??\d{4}|\(\d{3}\)\s*\d{3}[-\.\s]??\d{4}|\d{3}[-\.\s]??\d{4})', text)
+    email = _EMAIL_RE.search(text)
+    phone = _PHONE_RE.search(text)
     return {
         "email": email.group(0) if email else None,
         "phone": phone.group(0) if phone else None
-    }
\ No newline at end of file
+    }
+
+def _name_and_contact(sections, text):
+    """Name and contact details from the header, searching the full text only for what is missing"""
+    candidate_name = extract_name(sections["header"] or text)
+    contact = extract_contact_info(sections["header"])
+    if None in contact.values():
+        found = extract_contact_info(text)
+        contact = {key: value or found[key] for key, value in contact.items()}
+    return candidate_name, contact
+
+def parse_resume(data, file_type):
+    """Extract text, name and contact info from in-memory file bytes
+
+    Stage timings travel back in "timings", since this usually runs in a
+    worker process whose metrics the parent never sees.
+    """
+    start = time.perf_counter()
+    try:
+        text, skipped_pages = _read_text(data, file_type)
+    except MemoryError:
+        return _failed(f"Exceeded the {PARSE_MAX_MEMORY_MB} MB parser memory limit", limit="memory")
+    except Exception as e:
+        return _failed(str(e))
+    extracted = time.perf_counter()
+    sections = segment_resume(text)
+    candidate_name, contact = _name_and_contact(sections, text)
+    result = {
+        "text": text,
+        "sections": sections,
+        "candidate_name": candidate_name,
+        "contact": contact,
+        "timings": {
+            "parse.extract_text": extracted - start,
+            "parse.segment": time.perf_counter() - extracted
+        }
+    }
+    if skipped_pages:
+        result["degraded"] = {
+            "limit": "pages",
+            "reason": f"Only the first {PARSE_MAX_PAGES} pages were read ({skipped_pages} skipped)"
+        }
+    return result
+
+def _failed(error, limit=None):
+    failed = {
+        "text": "",
+        "sections": segment_resume(""),
+        "candidate_name": "Unknown",
+        "contact": {"email": None, "phone": None},
+        "error": error
+    }
+    if limit:
+        failed["degraded"] = {"limit": limit, "reason": error}
+    return failed
+
+def _limit_memory():
+    """Cap the address space at what the process already maps plus the parser budget
+
+    Forked parser processes inherit the parent's models and mappings, so
+    the budget is added to the current size rather than used as the cap.
+    """
+    if resource is None or PARSE_MAX_MEMORY_MB <= 0:
+        return
+    try:
+        with open("/proc/self/statm") as f:
+            mapped = int(f.read().split()[0]) * resource.getpagesize()
+    except OSError:
+        return  # the current size is only cheap to read on Linux
+    limit = mapped + PARSE_MAX_MEMORY_MB * 1024 * 1024
+    resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+
+def _serve(conn):
+    """Parser process loop: receive (data, file_type) pairs and send back their parses"""
+    _limit_memory()
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, MemoryError):
+            return
+        try:
+            result = parse_resume(*job)
+        except MemoryError:
+            result = _failed(f"Exceeded the {PARSE_MAX_MEMORY_MB} MB parser memory limit", limit="memory")
+        except Exception as e:
+            result = _failed(str(e))
+        conn.send(result)
+
+class ParserPool:
+    """Supervised parser subprocesses, each working on one document at a time
+
+    Every process runs under the memory limit. A document still parsing
+    after the timeout has its process killed and replaced, and a process
+    that dies loses only its own document, so a batch takes at most about
+    the timeout longer than its normal files.
+    """
+    
+    def __init__(self, size):
+        self.size = size
+        self._idle = []  # (process, connection) pairs
+        self._started = 0
+        self._cond = threading.Condition()
+    
+    def _spawn(self):
+        conn, child_conn = multiprocessing.Pipe()
+        process = multiprocessing.Process(target=_serve, args=(child_conn,), daemon=True)
+        try:
+            process.start()
+        except BaseException:
+            with self._cond:
+                self._started -= 1
+                self._cond.notify_all()
+            raise
+        finally:
+            child_conn.close()
+        return process, conn
+    
+    def _acquire(self, wanted, block=True):
+        """Up to wanted processes, started as needed within the pool size
+
+        Blocks until at least one is free unless block is false.
+        """
+        with self._cond:
+            while block and not self._idle and self._started >= self.size:
+                self._cond.wait()
+            taken = self._idle[:wanted]
+            del self._idle[:wanted]
+            new = min(wanted - len(taken), self.size - self._started)
+            self._started += new
+        return taken + [self._spawn() for _ in range(new)]
+    
+    def _release(self, workers):
+        with self._cond:
+            self._idle.extend(workers)
+            self._cond.notify_all()
+    
+    def _discard(self, worker):
+        process, conn = worker
+        process.kill()
+        process.join()
+        conn.close()
+        with self._cond:
+            self._started -= 1
+            self._cond.notify_all()
+    
+    def map(self, jobs, timeout=PARSE_TIMEOUT_SECONDS):
+        """Parse (data, file_type) pairs, returning results in order"""
+        results = [None] * len(jobs)
+        pending = deque(range(len(jobs)))
+        idle = []
+        busy = {}  # connection -> (worker, job index, deadline)
+        try:
+            while pending or busy:
+                if pending and not idle and not busy:
+                    idle = self._acquire(len(pending))
+                while pending and idle:
+                    worker = idle.pop()
+                    if not worker[0].is_alive():
+                        self._discard(worker)
+                        continue
+                    i = pending.popleft()
+                    try:
+                        worker[1].send(jobs[i])
+                    except (OSError, ValueError):
+                        # The process died taking in the file, usually at the memory limit
+                        results[i] = _failed("Parser process crashed", limit="crash")
+                        self._discard(worker)
+                        continue
+                    busy[worker[1]] = (worker, i, time.monotonic() + timeout)
+                if not busy:
+                    continue
+                
+                next_deadline = min(deadline for _, _, deadline in busy.values())
+                for conn in wait(list(busy), timeout=max(next_deadline - time.monotonic(), 0)):
+                    worker, i, _ = busy.pop(conn)
+                    try:
+                        results[i] = conn.recv()
+                        idle.append(worker)
+                    except (EOFError, OSError):
+                        # Killed by the OS (e.g. out of memory) or crashed inside the native parser
+                        results[i] = _failed("Parser process crashed", limit="crash")
+                        self._discard(worker)
+                
+                now = time.monotonic()
+                for conn, (worker, i, deadline) in list(busy.items()):
+                    if now >= deadline:
+                        del busy[conn]
+                        results[i] = _failed(f"Parsing took longer than {timeout:g}s", limit="timeout")
+                        self._discard(worker)
+                if pending:
+                    # Replace processes lost to crashes and timeouts while slots are free
+                    idle += self._acquire(len(pending), block=False)
+        finally:
+            for worker, _, _ in busy.values():
+                self._discard(worker)
+            self._release(idle)
+        return results
+
+def _get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ParserPool(PARSE_WORKERS)
+        return _pool
+
+def _parse_all(jobs):
+    """Parse (data, file_type) pairs in the supervised parser processes"""
+    if PARSE_WORKERS <= 0:
+        results = []
+        for data, file_type in jobs:
+            try:
+                results.append(parse_resume(data, file_type))
+            except Exception as e:
+                results.append(_failed(str(e)))
+        return results
+    return _get_pool().map(jobs)
+
+def parse_resumes(files, cache=None):
+    """Parse a batch of (file_name, data, file_type) uploads in upload order
+
+    Files already in the cache are returned without parsing; the rest are
+    parsed in supervised worker processes. A failing file gets an "error"
+    entry and empty text instead of aborting the batch, and a file that
+    hit a size, page, time or memory limit also gets a "degraded" entry
+    with the limit and reason.
+    """
+    parsed = [None] * len(files)
+    pending = []
+    hashes = [content_hash(data) for _, data, _ in files]
+    cached = cache.get_many(hashes, PARSER_VERSION) if cache else {}
+    for i, (file_name, data, file_type) in enumerate(files):
+        if hashes[i] in cached:
+            parsed[i] = {"file_name": file_name, "sections": segment_resume(cached[hashes[i]]["text"]),
+                         **cached[hashes[i]]}
+        elif PARSE_MAX_BYTES > 0 and len(data) > PARSE_MAX_BYTES:
+            parsed[i] = {"file_name": file_name,
+                         **_failed(f"File is larger than the {PARSE_MAX_BYTES / 1024 / 1024:g} MB limit", limit="size")}
+        else:
+            pending.append((i, hashes[i]))
+
+    results = _parse_all([(files[i][1], files[i][2]) for i, _ in pending])
+    new_entries = []
+    for (i, file_hash), result in zip(pending, results):
+        for stage, seconds in result.pop("timings", {}).items():
+            metrics.observe_stage(stage, seconds, file_name=files[i][0])
+        if result.get("error"):
+            logger.error(f"Error parsing {files[i][0]}: {result['error']}")
+        elif result["text"] and not result.get("degraded"):
+            new_entries.append((file_hash, result["text"], result["candidate_name"], result["contact"]))
+        parsed[i] = {"file_name": files[i][0], **result}
+    if cache and new_entries:
+        cache.put_many(new_entries, PARSER_VERSION)
+    for data in parsed:
+        if data.get("degraded"):
+            metrics.inc("resumeranker_degraded_documents_total", limit=data["degraded"]["limit"])
+    return parsed
@@ -0,0 +1,276 @@
+"""Headless bulk ranking of a resume directory against a job description
+
+Usage:
+    python -m resumeranker rank --jd jd.txt --resumes ./dir --method sbert --checkpoint run.partial
+    python -m resumeranker rank --jd jd.txt --resumes ./dir --output ranked.jsonl --top-k 500
+
+Scored resumes are appended to a checkpoint file after every batch, so an
+interrupted run picks up where it stopped when started again with the same
+checkpoint, job description and method. The checkpoint defaults to
+<output>.partial and must be given when writing to stdout. The ranked JSONL
+is written once every file has been scored.
+
+TF-IDF runs first add every resume to the corpus and then score them all
+against the IDF at that point, which is recorded in the checkpoint, so
+scores do not depend on batch order or on documents added later.
+"""
+import os
+import sys
+import json
+import hashlib
+import logging
+import argparse
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+# Add current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+# database changes into the app directory on import; CLI paths are relative to where we were run
+INVOCATION_DIR = os.getcwd()
+
+from database import init_db
+from models import ParseCache
+from resume_parser import parse_resumes
+from similarity import analyze_resumes_iter, analysis_fingerprint, embedding_text
+from model_registry import get_model
+from skill_matcher import get_skill_matcher
+
+logger = logging.getLogger(__name__)
+
+SKILLS_DB_PATH = os.getenv("SKILLS_DB_PATH", "skills_db.txt")
+CLI_BATCH_SIZE = int(os.getenv("CLI_BATCH_SIZE", 256))
+
+FILE_TYPES = {".pdf": "pdf", ".docx": "docx"}
+
+def iter_resume_paths(root):
+    """Relative paths of PDF/DOCX files under root, walked in a stable order"""
+    for directory, dirs, files in os.walk(root):
+        dirs.sort()
+        for name in sorted(files):
+            if os.path.splitext(name)[1].lower() in FILE_TYPES:
+                yield os.path.relpath(os.path.join(directory, name), root)
+
+def checkpoint_header(job_desc, method, skills_db):
+    """First checkpoint line: what the recorded scores depend on"""
+    return {"checkpoint": {
+        "job_desc_sha256": hashlib.sha256(job_desc.encode("utf-8")).hexdigest(),
+        "method": method,
+        "skills": skills_db.version,
+        # Also covers the encoder, parser version and section settings
+        "scoring": analysis_fingerprint(job_desc, [], skills_db, method)
+    }}
+
+def load_checkpoint(path, header):
+    """Paths already recorded in a checkpoint and its header, dropping a torn last line
+
+    The header is None for a new checkpoint, which is left empty for the
+    caller to write its header into. Resuming one written for a different
+    job description, method or scoring setup raises ValueError rather than
+    mixing incompatible scores.
+    """
+    done = set()
+    with open(path, "ab+") as f:
+        f.seek(0)
+        first = f.readline()
+        if not first.endswith(b"\n"):
+            # New, or the header itself was torn: nothing has been scored yet
+            f.truncate(0)
+            return done, None
+        try:
+            recorded = json.loads(first).get("checkpoint")
+        except (ValueError, AttributeError):
+            recorded = None
+        # The IDF snapshot is taken by the run itself, so it is not part of the match
+        if not isinstance(recorded, dict) or \
+                {key: value for key, value in recorded.items() if key != "idf_as_of"} != header["checkpoint"]:
+            raise ValueError(f"Checkpoint {path} was written for a different job description, method or "
+                             f"scoring setup; delete it or pass another --checkpoint")
+        good = len(first)
+        for line in f:
+            try:
+                done.add(json.loads(line)["file_name"])
+            except (ValueError, KeyError):
+                break
+            good += len(line)
+        f.truncate(good)
+    return done, {"checkpoint": recorded}
+
+def _read_batch(root, paths):
+    files = []
+    for path in paths:
+        with open(os.path.join(root, path), "rb") as f:
+            files.append((path, f.read(), FILE_TYPES[os.path.splitext(path)[1].lower()]))
+    return files
+
+def _batches(paths, done, batch_size):
+    batch = []
+    for path in paths:
+        if path in done:
+            continue
+        batch.append(path)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def add_to_corpus(root, batch_size=CLI_BATCH_SIZE, cache=None):
+    """First pass of a TF-IDF run: add every resume under root to the corpus
+
+    Returns the corpus snapshot afterwards, which the run is scored against.
+    """
+    corpus = get_model("tfidf_corpus")
+    for paths in _batches(iter_resume_paths(root), set(), batch_size):
+        parsed = parse_resumes(_read_batch(root, paths), cache=cache)
+        corpus.add_documents([embedding_text(data) for data in parsed if not data.get("error")])
+    return corpus.snapshot()
+
+def score_directory(job_desc, root, checkpoint, method="sbert", batch_size=CLI_BATCH_SIZE, cache=None):
+    """Score every resume under root not yet in the checkpoint, appending as it goes
+
+    The next batch is parsed (across the parser process pool) while the
+    current one is embedded and scored, and only one batch of text is held
+    in memory at a time. Files that fail to parse are recorded with their
+    error so they are not retried.
+    """
+    skills_db = get_skill_matcher(SKILLS_DB_PATH)
+    header = checkpoint_header(job_desc, method, skills_db)
+    done, recorded = load_checkpoint(checkpoint, header)
+    if recorded is None:
+        if method == "tfidf":
+            header["checkpoint"]["idf_as_of"] = add_to_corpus(root, batch_size, cache)
+        with open(checkpoint, "a", encoding="utf-8") as out:
+            out.write(json.dumps(header) + "\n")
+    else:
+        header = recorded
+    if done:
+        logger.info(f"Resuming: {len(done)} resumes already scored")
+    failed = []
+
+    def parsed_resumes():
+        with ThreadPoolExecutor(max_workers=1) as prefetch:
+            pending = None
+            for paths in _batches(iter_resume_paths(root), done, batch_size):
+                upcoming = prefetch.submit(lambda p=paths: parse_resumes(_read_batch(root, p), cache=cache))
+                if pending is not None:
+                    yield from _readable(pending.result())
+                pending = upcoming
+            if pending is not None:
+                yield from _readable(pending.result())
+
+    def _readable(parsed):
+        for data in parsed:
+            if data.get("error"):
+                failed.append({"file_name": data["file_name"], "error": data["error"],
+                               **({"degraded": data["degraded"]} if data.get("degraded") else {})})
+            else:
+                yield data
+
+    scored = 0
+    with open(checkpoint, "a", encoding="utf-8") as out:
+        updates = analyze_resumes_iter(job_desc, parsed_resumes(), skills_db, batch_size=batch_size,
+                                       method=method, idf_as_of=header["checkpoint"].get("idf_as_of"))
+        for update in updates:
+            lines = [json.dumps(r) for r in update["results"]] + [json.dumps(f) for f in failed]
+            failed.clear()
+            out.write("".join(line + "\n" for line in lines))
+            out.flush()
+            os.fsync(out.fileno())
+            scored = update["processed"]
+            logger.info(f"Scored {scored} resumes ({len(done)} from earlier runs)")
+        if failed:
+            out.write("".join(json.dumps(f) + "\n" for f in failed))
+    return scored
+
+def write_ranked(checkpoint, out, top_k=None):
+    """Write checkpointed results best-first with a rank, returning the summary
+
+    Only (score, offset) pairs are held in memory; each result is re-read
+    from the checkpoint when it is written out.
+    """
+    entries = []
+    missing_counts = Counter()
+    score_sum, unreadable = 0.0, 0
+    with open(checkpoint, "rb") as f:
+        offset = 0
+        for line in f:
+            result = json.loads(line)
+            if "checkpoint" in result:
+                pass  # header line
+            elif "error" in result:
+                unreadable += 1
+            else:
+                entries.append((-result["score"], offset))
+                score_sum += result["score"]
+                missing_counts.update(result["missing_skills"])
+            offset += len(line)
+
+        entries.sort()
+        for rank, (_, offset) in enumerate(entries[:top_k] if top_k else entries, start=1):
+            f.seek(offset)
+            result = json.loads(f.readline())
+            out.write(json.dumps({"rank": rank, **result}) + "\n")
+
+    return {
+        "total_resumes": len(entries),
+        "unreadable_files": unreadable,
+        "average_score": score_sum / len(entries) if entries else 0.0,
+        "top_missing_skills": missing_counts.most_common(5)
+    }
+
+def rank(args):
+    with open(args.jd, encoding="utf-8") as f:
+        job_desc = f.read()
+    to_stdout = args.output == "-"
+    checkpoint = args.checkpoint or args.output + ".partial"
+
+    init_db()
+    try:
+        score_directory(job_desc, args.resumes, checkpoint, method=args.method,
+                        batch_size=args.batch_size, cache=None if args.no_cache else ParseCache)
+    except ValueError as e:
+        logger.error(str(e))
+        sys.exit(1)
+
+    if to_stdout:
+        summary = write_ranked(checkpoint, sys.stdout, args.top_k)
+    else:
+        # Written beside the target and renamed, so a crash never leaves a half-ranked file
+        tmp_path = args.output + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as out:
+            summary = write_ranked(checkpoint, out, args.top_k)
+        os.replace(tmp_path, args.output)
+    if not args.keep_checkpoint:
+        os.remove(checkpoint)
+    logger.info(f"Summary: {json.dumps(summary)}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="resumeranker", description="Headless ResumeRanker tools")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    rank_parser = commands.add_parser("rank", help="rank a directory of resumes against a job description")
+    rank_parser.add_argument("--jd", required=True, help="text file with the job description")
+    rank_parser.add_argument("--resumes", required=True, help="directory searched recursively for PDF/DOCX")
+    rank_parser.add_argument("--method", choices=["sbert", "tfidf"], default="sbert")
+    rank_parser.add_argument("--output", default="-", help="ranked JSONL path, or - for stdout")
+    rank_parser.add_argument("--checkpoint", help="progress file (default: <output>.partial; required with stdout)")
+    rank_parser.add_argument("--keep-checkpoint", action="store_true")
+    rank_parser.add_argument("--top-k", type=int, help="only write the best K resumes")
+    rank_parser.add_argument("--batch-size", type=int, default=CLI_BATCH_SIZE)
+    rank_parser.add_argument("--no-cache", action="store_true", help="skip the shared parse cache")
+    rank_parser.set_defaults(func=rank)
+
+    args = parser.parse_args(argv)
+    if args.output == "-" and not args.checkpoint:
+        parser.error("--checkpoint is required when writing to stdout")
+    for name in ("jd", "resumes", "output", "checkpoint"):
+        value = getattr(args, name)
+        if value and value != "-":
+            setattr(args, name, os.path.join(INVOCATION_DIR, value))
+    logging.basicConfig(level=logging.INFO, stream=sys.stderr,
+                        format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    args.func(args)
+
+if __name__ == "__main__":
+    main()
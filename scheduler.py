@@ -0,0 +1,147 @@
+import os
+import sys
+import time
+import logging
+import threading
+from contextlib import contextmanager
+import metrics
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:  # installed with scikit-learn; without it only torch threads are capped
+    threadpool_limits = None
+
+logger = logging.getLogger(__name__)
+
+# CPU cores this process may use for inference, shared by the concurrent slots
+INFERENCE_CORES = int(os.getenv("INFERENCE_CORES", os.cpu_count() or 1))
+# Encode/NLP calls allowed to run at once; the rest wait in priority order
+INFERENCE_SLOTS = int(os.getenv("INFERENCE_SLOTS", 2))
+# Waiting this long raises a request by one tier, so lower tiers are never starved
+SCHEDULER_AGING_SECONDS = float(os.getenv("SCHEDULER_AGING_SECONDS", 30))
+# Tier of work started outside any user's request
+SCHEDULER_DEFAULT_TIER = os.getenv("SCHEDULER_DEFAULT_TIER", "free")
+
+TIER_PRIORITY = {"free": 0, "pro": 1, "enterprise": 2}
+
+# Process-wide, like the model registry: every session and worker thread shares the slots
+_cond = threading.Condition()
+_waiting = []  # [priority, enqueued_at, sequence, tier] per waiting request
+_active = 0
+_sequence = 0
+_admitted = {}
+_wait_totals = {}
+_max_wait = 0.0
+_budgeted = set()
+_local = threading.local()
+
+def tier_priority(subscription_level):
+    return TIER_PRIORITY.get(subscription_level, 0)
+
+def threads_per_slot():
+    return max(1, INFERENCE_CORES // max(INFERENCE_SLOTS, 1))
+
+def _apply_thread_budget():
+    """Cap torch and BLAS/OpenMP pools so all slots together stay within the core budget"""
+    threads = threads_per_slot()
+    if "blas" not in _budgeted and threadpool_limits is not None:
+        threadpool_limits(limits=threads)
+        _budgeted.add("blas")
+    # torch is only imported once the encoder loads, so this is retried until it is
+    if "torch" not in _budgeted and "torch" in sys.modules:
+        sys.modules["torch"].set_num_threads(threads)
+        _budgeted.add("torch")
+        logger.info(f"Inference limited to {INFERENCE_SLOTS} slot(s) of {threads} thread(s)")
+
+def _effective(entry, now):
+    rank, enqueued_at, sequence, _ = entry
+    return rank + (now - enqueued_at) / SCHEDULER_AGING_SECONDS, -sequence
+
+def _publish_depth():
+    metrics.set_gauge("resumeranker_scheduler_queue_depth", len(_waiting))
+    metrics.set_gauge("resumeranker_scheduler_active_slots", _active)
+
+def set_tier(subscription_level):
+    """Tier of inference started on this thread from now on, e.g. for a dedicated thread"""
+    _local.tier = subscription_level
+
+@contextmanager
+def priority(subscription_level):
+    """Run inference started on this thread inside the block at the given tier"""
+    previous = getattr(_local, "tier", None)
+    set_tier(subscription_level)
+    try:
+        yield
+    finally:
+        set_tier(previous)
+
+@contextmanager
+def slot():
+    """Hold one inference slot for the block, waiting in tier order for a free one
+
+    Re-entrant: nested use on a thread that already holds a slot does not
+    wait again.
+    """
+    global _active, _sequence, _max_wait
+    depth = getattr(_local, "depth", 0)
+    if depth:
+        _local.depth = depth + 1
+        try:
+            yield
+        finally:
+            _local.depth -= 1
+        return
+
+    tier = getattr(_local, "tier", None) or SCHEDULER_DEFAULT_TIER
+    start = time.monotonic()
+    with _cond:
+        _sequence += 1
+        entry = [tier_priority(tier), start, _sequence, tier]
+        _waiting.append(entry)
+        _publish_depth()
+        while True:
+            now = time.monotonic()
+            if _active < INFERENCE_SLOTS and max(_waiting, key=lambda e: _effective(e, now)) is entry:
+                break
+            # Timed wait so aging can reorder waiters even without releases
+            _cond.wait(SCHEDULER_AGING_SECONDS / 4)
+        _waiting.remove(entry)
+        _active += 1
+        waited = time.monotonic() - start
+        _admitted[tier] = _admitted.get(tier, 0) + 1
+        _wait_totals[tier] = _wait_totals.get(tier, 0.0) + waited
+        _max_wait = max(_max_wait, waited)
+        _apply_thread_budget()
+        _publish_depth()
+        # Other waiters may now be first in line for a remaining slot
+        _cond.notify_all()
+    metrics.observe("resumeranker_scheduler_wait_seconds", waited, tier=tier)
+    metrics.observe_stage("scheduler.wait", waited)
+
+    _local.depth = 1
+    try:
+        yield
+    finally:
+        _local.depth = 0
+        with _cond:
+            _active -= 1
+            _publish_depth()
+            _cond.notify_all()
+
+def stats():
+    """Slots in use, queue depth per tier and waiting times so far"""
+    with _cond:
+        queued = {}
+        for entry in _waiting:
+            queued[entry[3]] = queued.get(entry[3], 0) + 1
+        return {
+            "slots": INFERENCE_SLOTS,
+            "threads_per_slot": threads_per_slot(),
+            "active": _active,
+            "queue_depth": len(_waiting),
+            "queued_by_tier": queued,
+            "admitted_by_tier": dict(_admitted),
+            "mean_wait_ms_by_tier": {tier: round(_wait_totals[tier] * 1000 / count, 2)
+                                     for tier, count in _admitted.items()},
+            "max_wait_ms": round(_max_wait * 1000, 2)
+        }
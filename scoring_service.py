@@ -0,0 +1,298 @@
+"""HTTP scoring service for calling the ranking engine from other systems
+
+Usage:
+    python scoring_service.py --host 127.0.0.1 --port 8502
+
+Endpoints:
+    POST /analyze  {"job_description": ..., "resumes": [{"file_name": ..., "text": ...}]}
+                   resumes may instead carry base64 "content" and a "file_type" (pdf/docx)
+    POST /score    {"job_description": ..., "resume_text": ...}
+    GET  /metrics  latency percentiles per endpoint and encoder batch statistics
+    GET  /metrics/prometheus  pipeline stage timings and counters in Prometheus text format
+    GET  /health
+
+Concurrent requests share SBERT encode calls through a DynamicBatcher.
+"""
+import os
+import sys
+import time
+import base64
+import asyncio
+import logging
+import argparse
+from collections import deque
+from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, PlainTextResponse
+from starlette.routing import Route
+
+# Add current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+import scheduler
+from database import init_db
+from models import ParseCache
+from resume_parser import parse_resumes, extract_name, extract_contact_info, segment_resume
+from similarity import encode_texts, rank_resumes, scoring_texts, section_scores
+from skill_matcher import get_skill_matcher
+
+logger = logging.getLogger(__name__)
+
+SKILLS_DB_PATH = os.getenv("SKILLS_DB_PATH", "skills_db.txt")
+SERVICE_MAX_BATCH = int(os.getenv("SERVICE_MAX_BATCH", 64))
+SERVICE_MAX_WAIT_MS = float(os.getenv("SERVICE_MAX_WAIT_MS", 10))
+# Inference scheduler tier of service requests, relative to the app's users
+SERVICE_TIER = os.getenv("SERVICE_TIER", "enterprise")
+# Requests kept per endpoint for the latency percentiles
+SERVICE_LATENCY_WINDOW = int(os.getenv("SERVICE_LATENCY_WINDOW", 2000))
+
+FILE_TYPES = ("pdf", "docx")
+
+class DynamicBatcher:
+    """Combines texts from concurrent callers into shared encode calls
+
+    A batch is dispatched once it holds max_batch_size texts or the oldest
+    waiting caller has waited max_wait_ms. Encoding runs on one dedicated
+    thread so the event loop stays responsive and the model is never
+    called concurrently. A caller's texts are never split across batches.
+    """
+
+    def __init__(self, encode=encode_texts, max_batch_size=SERVICE_MAX_BATCH, max_wait_ms=SERVICE_MAX_WAIT_MS):
+        self.encode = encode
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = None
+        self._task = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="encoder",
+                                            initializer=scheduler.set_tier, initargs=(SERVICE_TIER,))
+        self.batches = 0
+        self.texts = 0
+
+    async def encode_many(self, texts):
+        """Embeddings for texts, encoded together with other callers' texts"""
+        if self._task is None or self._task.done():
+            self._queue = asyncio.Queue()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((list(texts), future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        carry = None
+        while True:
+            pending = [carry or await self._queue.get()]
+            carry = None
+            size = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            while size < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if size + len(item[0]) > self.max_batch_size:
+                    carry = item  # starts the next batch
+                    break
+                pending.append(item)
+                size += len(item[0])
+
+            texts = [text for item_texts, _ in pending for text in item_texts]
+            try:
+                vectors = await loop.run_in_executor(self._executor, self.encode, texts)
+            except Exception as e:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.texts += len(texts)
+            start = 0
+            for item_texts, future in pending:
+                if not future.done():
+                    future.set_result(vectors[start:start + len(item_texts)])
+                start += len(item_texts)
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "texts": self.texts,
+            "mean_batch_size": self.texts / self.batches if self.batches else 0.0,
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000
+        }
+
+    def close(self):
+        if self._task is not None:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+class LatencyTracker:
+    """Rolling request latencies per endpoint"""
+
+    def __init__(self, window=SERVICE_LATENCY_WINDOW):
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+
+    def record(self, endpoint, seconds):
+        self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def percentiles(self):
+        report = {}
+        for endpoint, samples in self.samples.items():
+            p50, p90, p99 = np.percentile(np.array(samples) * 1000, [50, 90, 99])
+            report[endpoint] = {
+                "requests": self.counts[endpoint],
+                "p50_ms": round(float(p50), 2),
+                "p90_ms": round(float(p90), 2),
+                "p99_ms": round(float(p99), 2)
+            }
+        return report
+
+def _error(message, status=400):
+    return JSONResponse({"error": message}, status_code=status)
+
+def _resume_from_text(file_name, text, item):
+    # Plain-text resumes skip the parser, so name and contact come from the caller or the text
+    if not isinstance(text, str):
+        raise ValueError("text must be a string")
+    if item.get("contact") is not None and not isinstance(item["contact"], dict):
+        raise ValueError("contact must be an object")
+    return {
+        "file_name": file_name,
+        "text": text,
+        "sections": segment_resume(text),
+        "candidate_name": item.get("candidate_name") or extract_name(text),
+        "contact": item.get("contact") or extract_contact_info(text)
+    }
+
+def _resumes_from_payload(items):
+    """Parsed resume dicts from request items carrying text or base64 file content"""
+    texts, uploads = {}, []
+    for i, item in enumerate(items):
+        file_name = item.get("file_name") or f"resume-{i + 1}"
+        if "text" in item:
+            texts[i] = _resume_from_text(file_name, item["text"], item)
+        else:
+            if item.get("file_type") not in FILE_TYPES:
+                raise ValueError(f"file_type must be one of {', '.join(FILE_TYPES)}")
+            uploads.append((i, (file_name, base64.b64decode(item["content"]), item["file_type"])))
+    parsed = parse_resumes([upload for _, upload in uploads], cache=ParseCache) if uploads else []
+    for (i, _), data in zip(uploads, parsed):
+        texts[i] = data
+    return [texts[i] for i in range(len(items))]
+
+def create_app(batcher=None):
+    """Starlette app serving the ranking engine; pass a batcher to tune or replace encoding"""
+    batcher = batcher or DynamicBatcher()
+    latencies = LatencyTracker()
+
+    def timed(endpoint, handler):
+        async def wrapped(request):
+            start = time.perf_counter()
+            try:
+                return await handler(request)
+            finally:
+                latencies.record(endpoint, time.perf_counter() - start)
+        return wrapped
+
+    async def analyze(request):
+        try:
+            payload = await request.json()
+            job_desc = payload["job_description"]
+            items = payload["resumes"]
+        except (ValueError, KeyError, TypeError):
+            return _error("Expected job_description and a list of resumes")
+        if not isinstance(job_desc, str) or not isinstance(items, list) \
+                or not all(isinstance(item, dict) for item in items):
+            return _error("Expected job_description and a list of resumes")
+        if not items:
+            return _error("No resumes given")
+        loop = asyncio.get_running_loop()
+        try:
+            resumes_data = await loop.run_in_executor(None, _resumes_from_payload, items)
+        except (KeyError, ValueError, TypeError, AttributeError) as e:
+            return _error(f"Invalid resume entry: {str(e)}")
+
+        # Files without text are reported, not scored as 0
+        readable = [data for data in resumes_data if not data.get('error')]
+        texts, owners, weights = scoring_texts(readable)
+        embeddings = await batcher.encode_many([job_desc] + texts)
+        scores = section_scores(embeddings, owners, weights, len(readable))
+        results, summary = await loop.run_in_executor(
+            None, rank_resumes, job_desc, readable, scores, get_skill_matcher(SKILLS_DB_PATH))
+        unreadable = [data['file_name'] for data in resumes_data
+                      if data.get('error') and not data.get('degraded')]
+        degraded = [{"file_name": data['file_name'], "scored": not data.get('error'), **data['degraded']}
+                    for data in resumes_data if data.get('degraded')]
+        return JSONResponse({"results": results, "summary": summary, "unreadable_files": unreadable,
+                             "degraded_files": degraded})
+
+    async def score(request):
+        try:
+            payload = await request.json()
+            job_desc = payload["job_description"]
+            resume_text = payload["resume_text"]
+        except (ValueError, KeyError, TypeError):
+            return _error("Expected job_description and resume_text")
+        if not isinstance(job_desc, str) or not isinstance(resume_text, str):
+            return _error("Expected job_description and resume_text")
+
+        try:
+            data = _resume_from_text(payload.get("file_name") or "resume", resume_text, payload)
+        except ValueError as e:
+            return _error(f"Invalid resume entry: {str(e)}")
+        texts, owners, weights = scoring_texts([data])
+        embeddings = await batcher.encode_many([job_desc] + texts)
+        results, _ = await asyncio.get_running_loop().run_in_executor(
+            None, rank_resumes, job_desc, [data], section_scores(embeddings, owners, weights, 1),
+            get_skill_matcher(SKILLS_DB_PATH))
+        return JSONResponse(results[0])
+
+    async def service_metrics(request):
+        return JSONResponse({"latency": latencies.percentiles(), "encoder": batcher.stats(),
+                             "scheduler": scheduler.stats()})
+
+    async def prometheus(request):
+        return PlainTextResponse(metrics.prometheus_text(), media_type="text/plain; version=0.0.4")
+
+    async def health(request):
+        return JSONResponse({"status": "ok"})
+
+    @asynccontextmanager
+    async def lifespan(app):
+        yield
+        batcher.close()
+
+    app = Starlette(routes=[
+        Route("/analyze", timed("/analyze", analyze), methods=["POST"]),
+        Route("/score", timed("/score", score), methods=["POST"]),
+        Route("/metrics", service_metrics, methods=["GET"]),
+        Route("/metrics/prometheus", prometheus, methods=["GET"]),
+        Route("/health", health, methods=["GET"]),
+    ], lifespan=lifespan)
+    app.state.batcher = batcher
+    app.state.latencies = latencies
+    return app
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve the ranking engine over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    args = parser.parse_args()
+
+    import uvicorn
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    init_db()
+    uvicorn.run(create_app(), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -1,87 +1,372 @@
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
-from sentence_transformers import SentenceTransformer
-import spacy
 import numpy as np
+import os
+import heapq
+import hashlib
 import logging
 import json
+import metrics
+import scheduler
+from collections import Counter
+from itertools import islice
+from embedding_store import EmbeddingStore, encode_with_store
+from encoders import encode_chunked, chunk_token_budget, configured_max_seq_length, load_sentence_encoder, \
+    model_dir_id, ENCODER_BACKEND, ENCODER_MODEL_DIR
+from model_registry import register_model, get_model
+from resume_parser import PARSER_VERSION, segment_resume, section_text
+from skill_matcher import as_skill_matcher
 
-nlp = spacy.load("en_core_web_md")
 logger = logging.getLogger(__name__)
 
-# Initialize models (cache for performance)
-tfidf_vectorizer = TfidfVectorizer(stop_words='english')
-sbert_model = SentenceTransformer('all-MiniLM-L6-v2')
+SBERT_MODEL_NAME = 'all-MiniLM-L6-v2'
 
-def calculate_similarity(job_desc, resumes, method='sbert'):
-    """Calculate similarity scores using selected method"""
+# Optional spaCy model with a custom skill NER component; the entity pass is skipped when unset
+SKILL_NER_MODEL = os.getenv("SKILL_NER_MODEL", "")
+SKILL_NER_LABELS = set(os.getenv("SKILL_NER_LABELS", "SKILL,TECH").split(","))
+SKILL_NER_BATCH_SIZE = int(os.getenv("SKILL_NER_BATCH_SIZE", 32))
+SKILL_NER_PROCESSES = int(os.getenv("SKILL_NER_PROCESSES", 1))
+
+# Resumes scored per micro-batch by analyze_resumes_iter
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", 16))
+
+def _parse_weights(spec):
+    weights = {}
+    for pair in filter(None, spec.split(",")):
+        name, weight = pair.split("=")
+        weights[name.strip()] = float(weight)
+    return weights
+
+# Resume sections (resume_parser.SECTIONS) searched for skills and embedded for scoring
+SKILL_SECTIONS = os.getenv("SKILL_SECTIONS", "summary,skills,experience,other").split(",")
+EMBED_SECTIONS = os.getenv("EMBED_SECTIONS", "summary,skills,experience").split(",")
+# Optional SBERT score weights such as "experience=0.6,skills=0.3,summary=0.1": each weighted
+# section is embedded on its own and a resume scores the weighted mean of the sections it has
+SECTION_WEIGHTS = _parse_weights(os.getenv("SECTION_WEIGHTS", ""))
+
+# Components the entity recognizer may depend on; everything else is disabled
+_NER_PIPES = {"ner", "entity_ruler", "span_ruler", "tok2vec", "transformer"}
+
+# Models are loaded lazily through the registry so importing this module stays cheap
+def _load_sbert():
+    return load_sentence_encoder(SBERT_MODEL_NAME)
+
+def _encoder_key():
+    # ONNX outputs differ slightly from PyTorch's, so each backend keeps its own vectors,
+    # and so does each local model directory
+    key = SBERT_MODEL_NAME if ENCODER_BACKEND == "torch" else f"{SBERT_MODEL_NAME}+{ENCODER_BACKEND}"
+    if ENCODER_MODEL_DIR:
+        key += f"@{model_dir_id(ENCODER_MODEL_DIR)}"
+    return key
+
+def _load_embedding_store():
+    # Stored vectors are chunk-pooled, so they are keyed separately from plain
+    # model outputs and by the chunk size that produced them
+    model = get_model("sbert")
+    return EmbeddingStore(
+        f"{_encoder_key()}+chunks",
+        chunk_token_budget(model),
+        model.get_sentence_embedding_dimension()
+    )
+
+def _load_tfidf_corpus():
+    from tfidf_engine import TfidfCorpus
+    return TfidfCorpus()
+
+def _load_skill_nlp():
+    """Skill NER pipeline with only the components NER needs enabled"""
+    import spacy
+    nlp = spacy.load(SKILL_NER_MODEL)
+    nlp.select_pipes(enable=[name for name in nlp.pipe_names if name in _NER_PIPES])
+    return nlp
+
+register_model("sbert", _load_sbert)
+register_model("embedding_store", _load_embedding_store)
+register_model("tfidf_corpus", _load_tfidf_corpus)
+if SKILL_NER_MODEL:
+    register_model("skill_ner", _load_skill_nlp)
+
+def calculate_similarity(job_desc, resumes, method='sbert', idf_as_of=None):
+    """Calculate similarity scores using selected method
+
+    For TF-IDF, idf_as_of is a TfidfCorpus.snapshot() to score against
+    instead of the corpus as it is now.
+    """
     if method == 'tfidf':
-        vectors = tfidf_vectorizer.fit_transform([job_desc] + resumes)
-        sim_matrix = cosine_similarity(vectors[0:1], vectors[1:])
-        scores = sim_matrix[0]
+        # Resumes join the shared corpus once; the JD is only transformed and scored
+        corpus = get_model("tfidf_corpus")
+        with metrics.span("tfidf.score"):
+            scores = corpus.score(job_desc, corpus.add_documents(resumes), as_of=idf_as_of)
     else:  # sBERT
-        embeddings = sbert_model.encode([job_desc] + resumes)
-        job_vector = embeddings[0:1]
-        resume_vectors = embeddings[1:]
-        scores = cosine_similarity(job_vector, resume_vectors)[0]
+        embeddings = encode_texts([job_desc] + resumes)
+        with metrics.span("sbert.score"):
+            return embedding_scores(embeddings)
     
     # Convert to 0-100 scale
     return (scores * 100).round(2)
 
+def embedding_scores(embeddings):
+    """0-100 similarity of the first embedding (the JD) to each of the others"""
+    return (_cosine_scores(embeddings[0], embeddings[1:]) * 100).round(2)
+
+def _sections(data):
+    return data.get('sections') or segment_resume(data['text'])
+
+def skill_text(data):
+    """The parts of a parsed resume searched for skills"""
+    return section_text(_sections(data), SKILL_SECTIONS)
+
+def embedding_text(data):
+    """The parts of a parsed resume embedded for scoring"""
+    return section_text(_sections(data), EMBED_SECTIONS)
+
+def scoring_texts(resumes_data):
+    """Texts to embed for the resumes, with the resume index and weight of each
+
+    One text per resume unless SECTION_WEIGHTS is set; then one per
+    weighted section the resume has, falling back to its embedding text.
+    """
+    texts, owners, weights = [], [], []
+    for i, data in enumerate(resumes_data):
+        sections = _sections(data)
+        parts = [(sections[name], weight) for name, weight in SECTION_WEIGHTS.items() if sections.get(name)]
+        for text, weight in parts or [(section_text(sections, EMBED_SECTIONS), 1.0)]:
+            texts.append(text)
+            owners.append(i)
+            weights.append(weight)
+    return texts, np.array(owners, dtype=int), np.array(weights, dtype=np.float64)
+
+def section_scores(embeddings, owners, weights, count):
+    """0-100 resume scores from the JD embedding (first row) and scoring_texts embeddings"""
+    with metrics.span("sbert.score"):
+        scores = _cosine_scores(embeddings[0], embeddings[1:]) * 100
+        totals = np.bincount(owners, weights=scores * weights, minlength=count)
+        norms = np.bincount(owners, weights=weights, minlength=count)
+        return (totals / np.where(norms == 0, 1, norms)).round(2)
+
+def resume_scores(job_desc, resumes_data, method='sbert', idf_as_of=None):
+    """0-100 scores of parsed resumes, using only their relevant sections"""
+    if method == 'tfidf':
+        return calculate_similarity(job_desc, [embedding_text(data) for data in resumes_data],
+                                    method='tfidf', idf_as_of=idf_as_of)
+    texts, owners, weights = scoring_texts(resumes_data)
+    return section_scores(encode_texts([job_desc] + texts), owners, weights, len(resumes_data))
+
+def encode_texts(texts):
+    """Chunked SBERT embeddings, encoding only texts missing from the store"""
+    with scheduler.slot():
+        model = get_model("sbert")
+        return encode_with_store(lambda batch: encode_chunked(model, batch), texts, get_model("embedding_store"))
+
+def _cosine_scores(query, vectors):
+    """Cosine similarity of one vector against each row of a matrix"""
+    norms = np.linalg.norm(vectors, axis=1) * np.linalg.norm(query)
+    return (vectors @ query) / np.where(norms == 0, 1, norms)
+
+def _extract_entity_skills(texts):
+    """Skill entities per text from one batched nlp.pipe pass"""
+    if not SKILL_NER_MODEL:
+        return [set() for _ in texts]
+    nlp = get_model("skill_ner")
+    
+    entity_skills = []
+    with scheduler.slot(), metrics.span("skills.ner"):
+        docs = nlp.pipe((text.lower() for text in texts),
+                        batch_size=SKILL_NER_BATCH_SIZE, n_process=SKILL_NER_PROCESSES)
+        for doc in docs:
+            entity_skills.append({
+                ent.text for ent in doc.ents
+                if ent.label_ in SKILL_NER_LABELS and len(ent.text.split()) < 4
+            })
+    return entity_skills
+
+def extract_skills_batch(texts, skills_db):
+    """Extract skills for many documents, batching the spaCy stage"""
+    matcher = as_skill_matcher(skills_db)
+    entity_skills = _extract_entity_skills(texts)
+    with metrics.span("skills.match"):
+        return [list(matcher.find(text) | entities) for text, entities in zip(texts, entity_skills)]
+
 def extract_skills(text, skills_db):
     """Extract skills using predefined database"""
-    doc = nlp(text.lower())
-    found_skills = set()
+    return extract_skills_batch([text], skills_db)[0]
+
+def _result(data, score, resume_skills, jd_skills):
+    return {
+        "file_name": data['file_name'],
+        "candidate_name": data['candidate_name'],
+        "contact": data['contact'],
+        "score": float(score),
+        "matched_skills": resume_skills,
+        "missing_skills": list(set(jd_skills) - set(resume_skills))
+    }
+
+def analyze_resumes(job_desc, resumes_data, skills_db, top_k=None):
+    """Full analysis pipeline"""
+    scores = resume_scores(job_desc, resumes_data)
+    return rank_resumes(job_desc, resumes_data, scores, skills_db, top_k=top_k)
+
+def top_k_order(scores, k=None):
+    """Indices of the k best scores, best first; all of them when k is None
+
+    Uses argpartition so only the k selected scores are sorted.
+    """
+    scores = np.asarray(scores)
+    if k is None or k >= len(scores):
+        return np.argsort(-scores, kind="stable")
+    if k <= 0:
+        return np.zeros(0, dtype=int)
+    selected = np.argpartition(-scores, k - 1)[:k]
+    return selected[np.argsort(-scores[selected], kind="stable")]
+
+def rank_resumes(job_desc, resumes_data, scores, skills_db, top_k=None):
+    """Skill gaps, ranking and summary for resumes whose 0-100 scores are already known
+
+    Only the top_k best results are built and returned (all when None);
+    the summary always covers every resume.
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    
+    # One skill extraction pass over the JD and the skill sections of every resume
+    all_skills = extract_skills_batch([job_desc] + [skill_text(data) for data in resumes_data], skills_db)
+    jd_skills = sorted(set(all_skills[0]))
     
-    # Match with skills database
-    for skill in skills_db:
-        if skill.lower() in text.lower():
-            found_skills.add(skill)
+    # Resume x JD-skill presence matrix; missing-skill counts are its column sums
+    has_skill = np.array([[skill in resume for skill in jd_skills]
+                          for resume in map(set, all_skills[1:])], dtype=bool).reshape(len(resumes_data), len(jd_skills))
+    missing_counts = (~has_skill).sum(axis=0)
     
-    # Extract entities
-    for ent in doc.ents:
-        if ent.label_ in ["SKILL", "TECH"] and len(ent.text.split()) < 4:
-            found_skills.add(ent.text)
+    results = [
+        _result(resumes_data[i], scores[i], all_skills[i + 1], jd_skills)
+        for i in top_k_order(scores, top_k)
+    ]
     
-    return list(found_skills)
+    top_missing = top_k_order(missing_counts, 5)
+    summary = {
+        "total_resumes": len(resumes_data),
+        "average_score": float(scores.mean()) if len(scores) else 0.0,
+        "top_missing_skills": [(jd_skills[j], int(missing_counts[j])) for j in top_missing if missing_counts[j] > 0]
+    }
+    
+    return results, summary
 
-def analyze_resumes(job_desc, resumes_data, skills_db):
-    """Full analysis pipeline"""
-    resume_texts = [data['text'] for data in resumes_data]
-    scores = calculate_similarity(job_desc, resume_texts, method='sbert')
+def analyze_multi(job_descs, resumes_data, skills_db, titles=None):
+    """Score one candidate pool against several job descriptions at once
+
+    The JDs and resumes are embedded together (the pool once, whatever the
+    number of openings), every pair is scored in one matrix product, and
+    skill gaps for all openings come from a single extraction pass.
+    Returns the candidate-by-opening score matrix, each candidate's best-fit
+    opening and gaps, and per-opening summaries.
+    """
+    titles = titles or [f"Role {j + 1}" for j in range(len(job_descs))]
+    texts, owners, weights = scoring_texts(resumes_data)
+    embeddings = encode_texts(list(job_descs) + texts)
+    jd_vectors, text_vectors = embeddings[:len(job_descs)], embeddings[len(job_descs):]
+    jd_vectors = jd_vectors / np.maximum(np.linalg.norm(jd_vectors, axis=1, keepdims=True), 1e-12)
+    text_vectors = text_vectors / np.maximum(np.linalg.norm(text_vectors, axis=1, keepdims=True), 1e-12)
+    with metrics.span("sbert.score"):
+        # Section scores are combined into one weighted row per resume
+        totals = np.zeros((len(resumes_data), len(job_descs)))
+        np.add.at(totals, owners, (text_vectors @ jd_vectors.T * 100) * weights[:, None])
+        norms = np.bincount(owners, weights=weights, minlength=len(resumes_data))
+        matrix = (totals / np.where(norms == 0, 1, norms)[:, None]).round(2)
     
-    jd_skills = extract_skills(job_desc, skills_db)
+    all_skills = extract_skills_batch(list(job_descs) + [skill_text(data) for data in resumes_data], skills_db)
+    jd_skills = [set(skills) for skills in all_skills[:len(job_descs)]]
+    resume_skills = [set(skills) for skills in all_skills[len(job_descs):]]
     
-    results = []
+    best = matrix.argmax(axis=1) if len(resumes_data) else np.zeros(0, dtype=int)
+    candidates = []
     for i, data in enumerate(resumes_data):
-        resume_skills = extract_skills(data['text'], skills_db)
-        missing_skills = set(jd_skills) - set(resume_skills)
-        
-        results.append({
+        candidates.append({
             "file_name": data['file_name'],
             "candidate_name": data['candidate_name'],
             "contact": data['contact'],
-            "score": float(scores[i]),
-            "matched_skills": resume_skills,
-            "missing_skills": list(missing_skills)
+            "scores": [float(score) for score in matrix[i]],
+            "best_role": titles[best[i]],
+            "best_score": float(matrix[i, best[i]]),
+            "matched_skills": [sorted(resume_skills[i] & required) for required in jd_skills],
+            "missing_skills": [sorted(required - resume_skills[i]) for required in jd_skills]
         })
     
-    # Sort by score descending
-    results.sort(key=lambda x: x['score'], reverse=True)
-    
-    # Generate summary stats
-    top_missing = {}
-    for res in results:
-        for skill in res['missing_skills']:
-            top_missing[skill] = top_missing.get(skill, 0) + 1
+    roles = []
+    for j, title in enumerate(titles):
+        order = np.argsort(-matrix[:, j], kind="stable")
+        missing_counts = Counter(skill for c in candidates for skill in c['missing_skills'][j])
+        roles.append({
+            "title": title,
+            "average_score": float(matrix[:, j].mean()) if len(resumes_data) else 0.0,
+            "ranking": [int(i) for i in order],
+            "best_fit_count": int((best == j).sum()),
+            "top_missing_skills": missing_counts.most_common(5)
+        })
     
-    summary = {
-        "total_resumes": len(results),
-        "average_score": float(np.mean(scores)),
-        "top_missing_skills": sorted(top_missing.items(), key=lambda x: x[1], reverse=True)[:5]
-    }
+    return {"titles": list(titles), "candidates": candidates, "roles": roles}
+
+def analyze_resumes_iter(job_desc, resumes_data, skills_db, batch_size=STREAM_BATCH_SIZE, top_k=10, method='sbert',
+                         idf_as_of=None):
+    """Streaming analysis pipeline that yields after every micro-batch
+
+    resumes_data may be any iterable, such as a generator that parses
+    files on demand, so only one batch of resume texts is held at a time.
+    Each update holds the batch's results, the running top-k leaderboard,
+    the running summary and the number of resumes processed so far.
+    idf_as_of is passed on to TF-IDF scoring (see calculate_similarity).
+    """
+    jd_skills = extract_skills_batch([job_desc], skills_db)[0]
+    leaderboard = []  # min-heap of (score, sequence, result)
+    processed, score_sum = 0, 0.0
+    missing_counts = Counter()
     
-    return results, summary
+    resumes = iter(resumes_data)
+    while True:
+        batch = list(islice(resumes, batch_size))
+        if not batch:
+            break
+        scores = resume_scores(job_desc, batch, method=method, idf_as_of=idf_as_of)
+        skills = extract_skills_batch([skill_text(data) for data in batch], skills_db)
+        
+        results = [_result(data, scores[i], skills[i], jd_skills) for i, data in enumerate(batch)]
+        for result in results:
+            processed += 1
+            score_sum += result['score']
+            missing_counts.update(result['missing_skills'])
+            entry = (result['score'], processed, result)
+            if len(leaderboard) < top_k:
+                heapq.heappush(leaderboard, entry)
+            else:
+                heapq.heappushpop(leaderboard, entry)
+        
+        yield {
+            "results": results,
+            "top": [entry[2] for entry in sorted(leaderboard, reverse=True)],
+            "summary": {
+                "total_resumes": processed,
+                "average_score": score_sum / processed,
+                "top_missing_skills": missing_counts.most_common(5)
+            },
+            "processed": processed
+        }
+
+def analysis_fingerprint(job_desc, content_hashes, skills_db, method='sbert'):
+    """Hash of everything an analysis result depends on
+
+    Covers the JD text, the resume file hashes (in any order), the scoring
+    method and model (with where it is loaded from and its chunk size), the
+    parser version, the section settings and the skills taxonomy, so editing
+    the skills file or switching the encoder yields a new key.
+    """
+    model = method
+    if method == 'sbert':
+        # From config rather than the loaded model, so checking for a stored result loads nothing
+        budget = chunk_token_budget(None, max_seq_length=configured_max_seq_length())
+        model = f"{_encoder_key()}+{ENCODER_MODEL_DIR or SBERT_MODEL_NAME}+{budget}"
+    skills = as_skill_matcher(skills_db).version
+    if SKILL_NER_MODEL:
+        skills = f"{skills}+{SKILL_NER_MODEL}"
+    sections = json.dumps([SKILL_SECTIONS, EMBED_SECTIONS, sorted(SECTION_WEIGHTS.items())])
+    parts = [hashlib.sha256(job_desc.encode('utf-8')).hexdigest(), method, model,
+             str(PARSER_VERSION), sections, skills] + sorted(content_hashes)
+    return hashlib.sha256("\n".join(parts).encode('utf-8')).hexdigest()
 
 def serialize_results(results, summary):
     """Serialize analysis results for storage"""
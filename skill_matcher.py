@@ -0,0 +1,129 @@
+import os
+import hashlib
+import threading
+from collections import deque
+from functools import lru_cache
+
+# Bump when matching rules change so results keyed on the matcher version are recomputed
+MATCHER_VERSION = 2
+
+_matchers = {}
+_matchers_lock = threading.Lock()
+
+def parse_skill_lines(lines):
+    """Parse taxonomy lines of the form "Canonical | alias | alias"
+
+    Blank lines and lines starting with "#" are ignored.
+    """
+    entries = []
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        names = [name.strip() for name in line.split("|") if name.strip()]
+        if names:
+            entries.append((names[0], names[1:]))
+    return entries
+
+class SkillMatcher:
+    """Aho-Corasick automaton over skill names and aliases
+
+    The automaton is built once; find() then makes a single pass over the
+    lowercased text and only reports matches that start and end on word
+    boundaries, so "Java" does not match inside "JavaScript". A dot between
+    word characters joins them, so "JS" does not match inside "Node.js".
+    """
+
+    def __init__(self, entries):
+        self.skills = []
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [[]]  # (term length, canonical skill, needs left boundary, needs right boundary)
+
+        digest = hashlib.sha256(f"{MATCHER_VERSION}\n".encode("utf-8"))
+        for canonical, aliases in entries:
+            self.skills.append(canonical)
+            digest.update(("|".join([canonical] + list(aliases)) + "\n").encode("utf-8"))
+            for term in [canonical] + list(aliases):
+                self._add(term.lower(), canonical)
+        self.version = digest.hexdigest()[:16]
+        self._build()
+
+    @classmethod
+    def from_list(cls, skills):
+        return cls(parse_skill_lines(skills))
+
+    def _add(self, term, canonical):
+        if not term:
+            return
+        state = 0
+        for ch in term:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[state][ch] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            state = nxt
+        self._out[state].append((len(term), canonical, term[0].isalnum(), term[-1].isalnum()))
+
+    def _build(self):
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(ch, 0)
+                self._fail[nxt] = target if target != nxt else 0
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """Return the set of canonical skills mentioned in text"""
+        text = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        size = len(text)
+        found = set()
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not out[state]:
+                continue
+            for length, canonical, left, right in out[state]:
+                start = i - length + 1
+                if left and start > 0 and (text[start - 1].isalnum() or (
+                        text[start - 1] == "." and start > 1 and text[start - 2].isalnum())):
+                    continue
+                if right and i + 1 < size and text[i + 1].isalnum():
+                    continue
+                found.add(canonical)
+        return found
+
+def get_skill_matcher(path):
+    """Matcher for a skills file, rebuilt only when the file changes"""
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with _matchers_lock:
+        cached = _matchers.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+    with open(path, encoding="utf-8") as f:
+        matcher = SkillMatcher(parse_skill_lines(f))
+    with _matchers_lock:
+        _matchers[path] = (mtime, matcher)
+    return matcher
+
+@lru_cache(maxsize=8)
+def _matcher_for_list(skills):
+    return SkillMatcher.from_list(skills)
+
+def as_skill_matcher(skills_db):
+    """Accept a SkillMatcher or a plain list of skill lines"""
+    if isinstance(skills_db, SkillMatcher):
+        return skills_db
+    return _matcher_for_list(tuple(skills_db))
@@ -0,0 +1,287 @@
+import os
+import re
+import time
+import logging
+import threading
+from contextlib import contextmanager
+import numpy as np
+from database import get_db_connection, transaction
+from model_registry import register_model, get_model
+from similarity import encode_texts, embedding_text
+from embedding_store import text_hash
+
+try:
+    import fcntl
+except ImportError:  # Windows: index saves are not serialized across processes
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+TALENT_POOL_DIR = os.getenv("TALENT_POOL_DIR", "talent_pool")
+TALENT_POOL_EF = int(os.getenv("TALENT_POOL_EF", 128))
+# Scopes with at most this many candidates are scored exactly instead of through the ANN graph
+TALENT_POOL_EXACT_LIMIT = int(os.getenv("TALENT_POOL_EXACT_LIMIT", 5000))
+# Unsaved additions are written out at most this often; workers also save at the end of each job
+TALENT_POOL_SAVE_SECONDS = float(os.getenv("TALENT_POOL_SAVE_SECONDS", 30))
+
+_INITIAL_CAPACITY = 10000
+
+class TalentPool:
+    """HNSW index over every candidate that has been part of a saved analysis
+
+    Labels in the index are candidates.id, so metadata and scope filters
+    live in SQLite while the graph only holds vectors. Additions are kept
+    in memory and the index file is replaced atomically by save(), which
+    merges them into any newer file another process has written. Other
+    processes reload the file when it changes on disk.
+    """
+
+    def __init__(self, store, directory=TALENT_POOL_DIR):
+        self.store = store
+        self.dim = store.dim
+        safe_name = re.sub(r'[^A-Za-z0-9_.-]', '_', f"{store.model_name}-{store.max_seq_length}")
+        self.path = os.path.join(directory, f"{safe_name}.hnsw")
+        self._index = None
+        self._stamp = None
+        self._pending = {}  # candidate id -> vector added here since the last save
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _new_index(self, capacity):
+        import hnswlib
+        index = hnswlib.Index(space='cosine', dim=self.dim)
+        index.init_index(max_elements=capacity, ef_construction=200, M=16, allow_replace_deleted=True)
+        index.set_ef(TALENT_POOL_EF)
+        return index
+
+    def _file_stamp(self):
+        # Saves replace the file, so a new inode marks a new version even within one mtime tick
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return stat.st_ino, stat.st_mtime_ns
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize index file writes across processes"""
+        if fcntl is None:
+            yield
+            return
+        with open(f"{self.path}.lock", "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _load(self):
+        """Current index, reloaded if another process has saved a newer one
+
+        Vectors added here since the last save are re-added to a reloaded
+        index, so they are not lost.
+        """
+        stamp = self._file_stamp()
+        if self._index is not None and stamp == self._stamp:
+            return self._index
+        if stamp is None:
+            self._index = self._new_index(_INITIAL_CAPACITY)
+            self._rebuild_from_rows()
+        else:
+            import hnswlib
+            index = hnswlib.Index(space='cosine', dim=self.dim)
+            index.load_index(self.path, allow_replace_deleted=True)
+            index.set_ef(TALENT_POOL_EF)
+            self._index = index
+        self._stamp = stamp
+        if self._pending:
+            self._add_vectors(np.vstack(list(self._pending.values())), list(self._pending))
+        return self._index
+
+    def _write(self):
+        # Callers hold both locks; readers only ever see a complete file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        self._index.save_index(tmp_path)
+        os.replace(tmp_path, self.path)
+        self._stamp = self._file_stamp()
+        self._pending.clear()
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def save(self):
+        """Write unsaved additions to the index file"""
+        with self._lock, self._file_lock():
+            if not self._dirty:
+                return
+            self._load()
+            self._write()
+
+    def _rebuild_from_rows(self):
+        """Recreate the graph from the candidates table and the embedding store"""
+        with get_db_connection() as conn:
+            rows = conn.execute('SELECT id, text_hash FROM candidates').fetchall()
+        if not rows:
+            return
+        vectors = self.store.get_many([row['text_hash'] for row in rows])
+        present = [row for row in rows if row['text_hash'] in vectors]
+        if len(present) < len(rows):
+            logger.warning(f"{len(rows) - len(present)} talent pool candidates have no stored embedding")
+        if present:
+            self._add_vectors(np.vstack([vectors[row['text_hash']] for row in present]),
+                              [row['id'] for row in present])
+            self._dirty = True
+
+    def _add_vectors(self, vectors, ids):
+        index = self._index
+        needed = index.get_current_count() + len(ids)
+        if needed > index.get_max_elements():
+            index.resize_index(max(needed, index.get_max_elements() * 2))
+        index.add_items(vectors, ids, replace_deleted=True)
+
+    def add_candidates(self, user_id, company, parsed_data, vectors):
+        """Insert candidates not yet in the pool for this user and index their vectors
+
+        Candidates are keyed by the hash of the text their vector was
+        embedded from, which is how the embedding store finds it again.
+        The index file is saved at most every TALENT_POOL_SAVE_SECONDS.
+        """
+        new_ids, new_vectors = [], []
+        with transaction() as conn:
+            for data, vector in zip(parsed_data, vectors):
+                if not data['text']:
+                    continue
+                cursor = conn.execute('''
+                    INSERT OR IGNORE INTO candidates
+                    (user_id, company, text_hash, file_name, candidate_name, email, phone)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (user_id, company, text_hash(embedding_text(data)), data['file_name'],
+                      data['candidate_name'], data['contact'].get('email'), data['contact'].get('phone')))
+                if cursor.rowcount:
+                    new_ids.append(cursor.lastrowid)
+                    new_vectors.append(vector)
+        if new_ids:
+            with self._lock:
+                self._load()
+                self._add_vectors(np.vstack(new_vectors), new_ids)
+                self._pending.update(zip(new_ids, new_vectors))
+                self._dirty = True
+            if time.monotonic() - self._saved_at >= TALENT_POOL_SAVE_SECONDS:
+                self.save()
+        return len(new_ids)
+
+    def remove_user(self, user_id):
+        """Drop every candidate a user added from the table and the index"""
+        with transaction() as conn:
+            ids = [row['id'] for row in conn.execute(
+                'SELECT id FROM candidates WHERE user_id = ?', (user_id,))]
+            conn.execute('DELETE FROM candidates WHERE user_id = ?', (user_id,))
+        if ids:
+            # Searches already skip labels without a row; this keeps them out of the file
+            with self._lock, self._file_lock():
+                index = self._load()
+                for label in ids:
+                    self._pending.pop(label, None)
+                    try:
+                        index.mark_deleted(label)
+                    except RuntimeError:
+                        pass  # never made it into the index
+                self._write()
+        return len(ids)
+
+    def search(self, query_vector, k=10, user_id=None, company=None):
+        """Top-k candidates by cosine similarity, limited to a user's or company's pool"""
+        where, params = [], []
+        if company:
+            where.append('company = ?')
+            params.append(company)
+        elif user_id is not None:
+            where.append('user_id = ?')
+            params.append(user_id)
+        sql = 'SELECT * FROM candidates' + (' WHERE ' + ' AND '.join(where) if where else '')
+        with get_db_connection() as conn:
+            rows = {row['id']: dict(row) for row in conn.execute(sql, params)}
+        if not rows:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32).reshape(1, -1)
+        if len(rows) <= TALENT_POOL_EXACT_LIMIT:
+            scored = self._exact(query[0], rows)
+        else:
+            scored = self._approximate(query, rows, k)
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return [{**rows[label], "score": round(float(score) * 100, 2)} for label, score in scored[:k]]
+
+    def _exact(self, query, rows):
+        vectors = self.store.get_many([row['text_hash'] for row in rows.values()])
+        labels = [label for label, row in rows.items() if row['text_hash'] in vectors]
+        if not labels:
+            return []
+        matrix = np.vstack([vectors[rows[label]['text_hash']] for label in labels])
+        norms = np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        scores = (matrix @ query) / np.where(norms == 0, 1, norms)
+        return list(zip(labels, scores))
+
+    def _approximate(self, query, rows, k):
+        with self._lock:
+            index = self._load()
+            k = min(k, len(rows), index.get_current_count())
+            while k > 0:
+                try:
+                    labels, distances = index.knn_query(query, k=k, filter=lambda label: label in rows)
+                    return [(int(label), 1 - distance) for label, distance in zip(labels[0], distances[0])]
+                except RuntimeError:
+                    # Filtered search found fewer than k neighbours
+                    k //= 2
+        return []
+
+def rekey_candidates(conn):
+    """Key candidates stored under their full-text hash by their embedded text instead
+
+    Run by the v4 migration. The text comes from the parse cache; candidates
+    whose text is no longer cached, or whose embedded text has no stored
+    vector, keep their key.
+    """
+    missing = {row['text_hash'] for row in conn.execute('''
+        SELECT DISTINCT c.text_hash FROM candidates c
+        WHERE NOT EXISTS (SELECT 1 FROM embedding_index e WHERE e.text_hash = c.text_hash)
+    ''')}
+    rekeyed = 0
+    if missing:
+        for row in conn.execute('SELECT text FROM parse_cache').fetchall():
+            old = text_hash(row['text'])
+            if old not in missing:
+                continue
+            new = text_hash(embedding_text({"text": row['text']}))
+            if conn.execute('SELECT 1 FROM embedding_index WHERE text_hash = ? LIMIT 1', (new,)).fetchone():
+                rekeyed += conn.execute('UPDATE OR IGNORE candidates SET text_hash = ? WHERE text_hash = ?',
+                                        (new, old)).rowcount
+    if rekeyed:
+        logger.info(f"Re-keyed {rekeyed} talent pool candidates by their embedded text")
+    return rekeyed
+
+def _load_talent_pool():
+    return TalentPool(get_model("embedding_store"))
+
+register_model("talent_pool", _load_talent_pool)
+
+def add_to_talent_pool(user_id, company, parsed_data):
+    """Index the resumes of a saved analysis; embeddings come from the store"""
+    parsed_data = [data for data in parsed_data if data['text']]
+    if not parsed_data:
+        return 0
+    vectors = encode_texts([embedding_text(data) for data in parsed_data])
+    return get_model("talent_pool").add_candidates(user_id, company, parsed_data, vectors)
+
+def save_talent_pool():
+    """Write candidates added by this process to the index file, e.g. at the end of a job"""
+    get_model("talent_pool").save()
+
+def search_talent_pool(job_desc, k=10, user_id=None, company=None):
+    """Past candidates best matching a job description"""
+    query = encode_texts([job_desc])[0]
+    return get_model("talent_pool").search(query, k=k, user_id=user_id, company=company)
+
+def remove_user_candidates(user_id):
+    return get_model("talent_pool").remove_user(user_id)
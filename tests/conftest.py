@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+import pytest
+
+# Settings are read at import time, so storage points at a scratch directory before any app module loads
+_scratch = tempfile.mkdtemp(prefix="resumeranker-tests-")
+os.environ["DB_PATH"] = os.path.join(_scratch, "app.db")
+os.environ["EMBEDDING_STORE_DIR"] = os.path.join(_scratch, "embeddings")
+os.environ["TALENT_POOL_DIR"] = os.path.join(_scratch, "talent_pool")
+os.environ["TFIDF_DIR"] = os.path.join(_scratch, "tfidf")
+os.environ["MODEL_WARMUP"] = "0"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import database
+
+def _close_connection():
+    conn = getattr(database._local, 'conn', None)
+    if conn is not None:
+        conn.close()
+        database._local.conn = None
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Path of an empty database that every connection opened during the test uses"""
+    path = str(tmp_path / "test.db")
+    _close_connection()
+    monkeypatch.setattr(database, "DB_PATH", path)
+    yield path
+    _close_connection()
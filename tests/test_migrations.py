@@ -0,0 +1,112 @@
+import json
+import sqlite3
+import database
+from embedding_store import text_hash
+from similarity import embedding_text
+
+RESUME_TEXT = "Jane Doe\nSkills\nPython, Docker\nExperience\nBackend developer at Acme"
+
+def create_legacy_db(path):
+    """A database as the app left it before schema versions were tracked"""
+    conn = sqlite3.connect(path)
+    conn.executescript('''
+        CREATE TABLE users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, email TEXT UNIQUE NOT NULL, password_hash TEXT NOT NULL,
+            company TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, subscription_level TEXT DEFAULT 'free');
+        CREATE TABLE jobs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, job_title TEXT NOT NULL,
+            job_description TEXT NOT NULL, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE analyses (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, job_id INTEGER NOT NULL,
+            results TEXT, created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE analysis_queue (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, job_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'queued', stage TEXT, progress REAL NOT NULL DEFAULT 0, details TEXT,
+            analysis_id INTEGER, error TEXT, attempts INTEGER NOT NULL DEFAULT 0, worker TEXT,
+            heartbeat_at REAL, submitted_at REAL NOT NULL, finished_at REAL);
+        CREATE TABLE parse_cache (
+            content_hash TEXT PRIMARY KEY, parser_version INTEGER NOT NULL, text TEXT NOT NULL,
+            candidate_name TEXT, email TEXT, phone TEXT, size_bytes INTEGER NOT NULL, last_used_at REAL NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP);
+        CREATE TABLE embedding_index (
+            text_hash TEXT NOT NULL, model_name TEXT NOT NULL, max_seq_length INTEGER NOT NULL,
+            dtype TEXT NOT NULL, row_index INTEGER NOT NULL,
+            PRIMARY KEY (text_hash, model_name, max_seq_length, dtype));
+        CREATE TABLE candidates (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id INTEGER NOT NULL, company TEXT, text_hash TEXT NOT NULL,
+            file_name TEXT, candidate_name TEXT, email TEXT, phone TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP, UNIQUE (user_id, text_hash));
+    ''')
+    conn.execute("INSERT INTO users (email, password_hash) VALUES ('a@b.c', 'x')")
+    conn.execute("INSERT INTO jobs (user_id, job_title, job_description) VALUES (1, 'Dev', 'Python developer')")
+    conn.execute("INSERT INTO analyses (user_id, job_id, results) VALUES (1, 1, ?)", (json.dumps({
+        "summary": {"total_resumes": 2, "average_score": 60.0, "top_missing_skills": [["AWS", 2]]},
+        "results": [
+            {"file_name": "a.pdf", "candidate_name": "Jane Doe", "contact": {"email": "jane@example.com"},
+             "score": 80.0, "matched_skills": ["Python"], "missing_skills": ["AWS"]},
+            {"file_name": "b.pdf", "candidate_name": "John Smith", "contact": {"phone": "555"},
+             "score": 40.0, "matched_skills": [], "missing_skills": ["AWS", "Python"]}
+        ]
+    }),))
+    conn.execute("INSERT INTO analyses (user_id, job_id, results) VALUES (1, 1, 'not json')")
+    conn.execute("INSERT INTO analysis_queue (user_id, job_id, submitted_at) VALUES (1, 1, 0)")
+    # A talent pool candidate still keyed by its full text, with a vector stored for its embedded sections
+    conn.execute("INSERT INTO parse_cache (content_hash, parser_version, text, size_bytes, last_used_at) "
+                 "VALUES ('file', 2, ?, 1, 0)", (RESUME_TEXT,))
+    conn.execute("INSERT INTO embedding_index VALUES (?, 'model', 256, 'float16', 0)",
+                 (text_hash(embedding_text({"text": RESUME_TEXT})),))
+    conn.execute("INSERT INTO candidates (user_id, text_hash, file_name) VALUES (1, ?, 'a.pdf')",
+                 (text_hash(RESUME_TEXT),))
+    conn.execute("INSERT INTO candidates (user_id, text_hash, file_name) VALUES (1, 'gone', 'old.pdf')")
+    conn.commit()
+    conn.close()
+
+def columns(conn, table):
+    return {row['name'] for row in conn.execute(f'PRAGMA table_info({table})')}
+
+def test_new_database_starts_at_the_latest_version(fresh_db):
+    database.init_db()
+    database.init_db()
+    with database.get_db_connection() as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == 5
+        assert {'fingerprint', 'priority', 'roles'} <= columns(conn, 'analysis_queue')
+
+def test_legacy_database_is_migrated(fresh_db):
+    create_legacy_db(fresh_db)
+    database.init_db()
+    with database.get_db_connection() as conn:
+        assert conn.execute('PRAGMA user_version').fetchone()[0] == 5
+
+        # v1: results move out of the JSON blob into rows; unreadable blobs are left alone
+        analyses = conn.execute('SELECT id, summary, results FROM analyses ORDER BY id').fetchall()
+        assert json.loads(analyses[0]['summary'])['total_resumes'] == 2
+        assert analyses[0]['results'] is None
+        assert analyses[1]['results'] == 'not json'
+        rows = conn.execute('''
+            SELECT rank, candidate_name, email, phone, score FROM analysis_results
+            WHERE analysis_id = ? ORDER BY rank
+        ''', (analyses[0]['id'],)).fetchall()
+        assert [tuple(row) for row in rows] == [(1, "Jane Doe", "jane@example.com", None, 80.0),
+                                                (2, "John Smith", None, "555", 40.0)]
+        skills = conn.execute('''
+            SELECT r.rank, s.name, rs.matched FROM analysis_result_skills rs
+            JOIN analysis_results r ON r.id = rs.result_id JOIN skills s ON s.id = rs.skill_id
+            ORDER BY r.rank, s.name
+        ''').fetchall()
+        assert [tuple(row) for row in skills] == [(1, "AWS", 0), (1, "Python", 1), (2, "AWS", 0), (2, "Python", 0)]
+
+        # v2, v3, v5: new queue columns with defaults for existing rows
+        assert 'fingerprint' in columns(conn, 'analyses')
+        queued = conn.execute('SELECT fingerprint, priority, roles FROM analysis_queue').fetchone()
+        assert tuple(queued) == (None, 0, None)
+
+        # v4: candidates are re-keyed by their embedded text when it has a stored vector
+        keys = dict(conn.execute('SELECT file_name, text_hash FROM candidates').fetchall())
+        assert keys == {"a.pdf": text_hash(embedding_text({"text": RESUME_TEXT})), "old.pdf": "gone"}
+
+def test_migrations_run_once(fresh_db):
+    create_legacy_db(fresh_db)
+    database.init_db()
+    database.init_db()
+    with database.get_db_connection() as conn:
+        assert conn.execute('SELECT COUNT(*) FROM analysis_results').fetchone()[0] == 2
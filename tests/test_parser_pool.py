@@ -0,0 +1,82 @@
+import os
+import time
+import fitz
+import pytest
+import resume_parser
+from resume_parser import ParserPool, parse_resumes
+
+def make_pdf(text):
+    doc = fitz.open()
+    doc.new_page().insert_text((50, 50), text)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def misbehaving_parse(data, file_type):
+    # Parser processes are forked, so this replacement runs inside them
+    if data == b"slow":
+        time.sleep(30)
+    if data == b"crash":
+        os._exit(1)
+    if data == b"hog":
+        return {"size": len(bytearray(2 * 1024 ** 3))}
+    return original_parse(data, file_type)
+
+original_parse = resume_parser.parse_resume
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(resume_parser, "parse_resume", misbehaving_parse)
+    pool = ParserPool(2)
+    yield pool
+    for worker in list(pool._idle):
+        pool._discard(worker)
+
+def test_parses_documents_in_order(pool):
+    results = pool.map([(make_pdf("Jane Doe\njane@example.com"), "pdf"), (make_pdf("John Smith"), "pdf")])
+    assert "Jane Doe" in results[0]["text"]
+    assert results[0]["contact"]["email"] == "jane@example.com"
+    assert "John Smith" in results[1]["text"]
+
+def test_timeout_kills_only_the_slow_document(pool):
+    start = time.monotonic()
+    results = pool.map([(b"slow", "pdf"), (make_pdf("Jane Doe"), "pdf")], timeout=1)
+    assert time.monotonic() - start < 10
+    assert results[0]["degraded"]["limit"] == "timeout"
+    assert results[0]["text"] == ""
+    assert "Jane Doe" in results[1]["text"]
+    # The killed process is replaced on demand
+    assert "Jane Doe" in pool.map([(make_pdf("Jane Doe"), "pdf")])[0]["text"]
+    assert pool._started <= pool.size
+
+def test_crash_loses_only_its_own_document(pool):
+    results = pool.map([(b"crash", "pdf"), (make_pdf("Jane Doe"), "pdf"), (make_pdf("John Smith"), "pdf")])
+    assert results[0]["degraded"]["limit"] == "crash"
+    assert "Jane Doe" in results[1]["text"]
+    assert "John Smith" in results[2]["text"]
+
+@pytest.mark.skipif(resume_parser.resource is None, reason="no address-space limits on this platform")
+def test_memory_limit_is_reported(pool, monkeypatch):
+    monkeypatch.setattr(resume_parser, "PARSE_MAX_MEMORY_MB", 256)
+    result = pool.map([(b"hog", "pdf")])[0]
+    assert result["degraded"]["limit"] == "memory"
+    assert result["text"] == ""
+
+def test_oversized_files_are_not_parsed(monkeypatch):
+    monkeypatch.setattr(resume_parser, "PARSE_WORKERS", 0)
+    small = make_pdf("Jane Doe")
+    monkeypatch.setattr(resume_parser, "PARSE_MAX_BYTES", len(small))
+    results = parse_resumes([("big.pdf", small + b" " * 10, "pdf"), ("small.pdf", small, "pdf")])
+    assert results[0]["degraded"]["limit"] == "size"
+    assert "Jane Doe" in results[1]["text"]
+
+def test_page_cap_keeps_the_first_pages(monkeypatch):
+    monkeypatch.setattr(resume_parser, "PARSE_MAX_PAGES", 2)
+    doc = fitz.open()
+    for number in range(5):
+        doc.new_page().insert_text((50, 50), f"Page {number}")
+    data = doc.tobytes()
+    doc.close()
+    result = resume_parser.parse_resume(data, "pdf")
+    assert "Page 1" in result["text"] and "Page 2" not in result["text"]
+    assert result["degraded"]["limit"] == "pages"
@@ -0,0 +1,56 @@
+import asyncio
+import numpy as np
+from scoring_service import DynamicBatcher
+
+class RecordingEncoder:
+    """Encode function that records each batch it is called with"""
+
+    def __init__(self):
+        self.batches = []
+
+    def __call__(self, texts):
+        self.batches.append(list(texts))
+        return np.array([[float(len(text))] for text in texts])
+
+def run_callers(batcher, callers):
+    async def main():
+        try:
+            return await asyncio.gather(*(batcher.encode_many(texts) for texts in callers))
+        finally:
+            batcher.close()
+    return asyncio.run(main())
+
+def caller_texts(count, sizes):
+    return [[f"caller{i}-text{j}" + "x" * i for j in range(sizes[i % len(sizes)])] for i in range(count)]
+
+def test_callers_get_their_own_vectors():
+    encoder = RecordingEncoder()
+    callers = caller_texts(12, [1, 3, 2])
+    results = run_callers(DynamicBatcher(encode=encoder, max_batch_size=4, max_wait_ms=50), callers)
+    for texts, vectors in zip(callers, results):
+        assert vectors[:, 0].tolist() == [float(len(text)) for text in texts]
+
+def test_texts_of_one_caller_are_never_split_across_batches():
+    encoder = RecordingEncoder()
+    callers = caller_texts(20, [3, 2, 1, 4])
+    run_callers(DynamicBatcher(encode=encoder, max_batch_size=5, max_wait_ms=50), callers)
+    for texts in callers:
+        holding = [batch for batch in encoder.batches if texts[0] in batch]
+        assert len(holding) == 1
+        start = holding[0].index(texts[0])
+        assert holding[0][start:start + len(texts)] == texts
+    assert sum(len(batch) for batch in encoder.batches) == sum(len(texts) for texts in callers)
+
+def test_batches_respect_the_size_limit_unless_one_caller_exceeds_it():
+    encoder = RecordingEncoder()
+    callers = caller_texts(10, [2, 3]) + [[f"big{j}" for j in range(9)]]
+    run_callers(DynamicBatcher(encode=encoder, max_batch_size=5, max_wait_ms=50), callers)
+    for batch in encoder.batches:
+        assert len(batch) <= 5 or batch == callers[-1]
+
+def test_concurrent_callers_share_batches():
+    encoder = RecordingEncoder()
+    batcher = DynamicBatcher(encode=encoder, max_batch_size=64, max_wait_ms=100)
+    run_callers(batcher, caller_texts(8, [1]))
+    assert len(encoder.batches) < 8
+    assert batcher.stats()["texts"] == 8
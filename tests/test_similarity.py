@@ -0,0 +1,29 @@
+import numpy as np
+import pytest
+from similarity import top_k_order
+
+SCORES = [40.0, 95.5, 12.0, 95.5, 70.0, 3.0, 88.0]
+
+def test_all_scores_best_first():
+    assert list(top_k_order(SCORES)) == [1, 3, 6, 4, 0, 2, 5]
+
+@pytest.mark.parametrize("k", [1, 2, 3, 5, 7])
+def test_top_k_is_a_prefix_of_the_full_order(k):
+    order = top_k_order(SCORES, k)
+    assert len(order) == k
+    assert [SCORES[i] for i in order] == sorted(SCORES, reverse=True)[:k]
+
+def test_ties_keep_input_order():
+    assert list(top_k_order([5.0, 7.0, 5.0, 7.0, 5.0])) == [1, 3, 0, 2, 4]
+    assert list(top_k_order([5.0, 7.0, 5.0, 7.0, 5.0], 2)) == [1, 3]
+
+def test_k_larger_than_input_returns_everything():
+    assert list(top_k_order(SCORES, 100)) == list(top_k_order(SCORES))
+
+@pytest.mark.parametrize("k", [0, -1])
+def test_non_positive_k_returns_nothing(k):
+    assert len(top_k_order(SCORES, k)) == 0
+
+def test_matches_a_full_sort_on_random_scores():
+    scores = np.random.default_rng(7).uniform(0, 100, 1000)
+    assert list(top_k_order(scores, 25)) == list(np.argsort(-scores, kind="stable")[:25])
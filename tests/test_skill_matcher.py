@@ -0,0 +1,50 @@
+import os
+from skill_matcher import SkillMatcher, get_skill_matcher, parse_skill_lines
+
+SKILLS = [
+    "Python",
+    "JavaScript | JS",
+    "Java",
+    "C++",
+    "C#",
+    "Node.js | NodeJS",
+    "Express",
+    "Kubernetes | K8s",
+    "Machine Learning | ML",
+]
+
+def matcher():
+    return SkillMatcher.from_list(SKILLS)
+
+def test_aliases_report_the_canonical_name():
+    assert matcher().find("Shipped JS services on K8s") == {"JavaScript", "Kubernetes"}
+
+def test_matching_ignores_case():
+    assert matcher().find("PYTHON and machine learning") == {"Python", "Machine Learning"}
+
+def test_no_match_inside_longer_words():
+    assert matcher().find("JavaScript developer from Javanese studies") == {"JavaScript"}
+    assert matcher().find("HTML5 and mljobs") == set()
+
+def test_symbol_skills_match_on_their_own():
+    assert matcher().find("Wrote C++ and C# tools") == {"C++", "C#"}
+
+def test_aliases_do_not_match_inside_dotted_names():
+    assert matcher().find("APIs built with Node.js and Express.js") == {"Node.js", "Express"}
+
+def test_trailing_dot_still_ends_a_word():
+    assert matcher().find("Mostly JS. Some Python.") == {"JavaScript", "Python"}
+
+def test_repo_taxonomy_keeps_node_js_apart_from_javascript():
+    path = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "skills_db.txt")
+    found = get_skill_matcher(path).find("Backend in Node.js and Vue.js")
+    assert "Node.js" in found
+    assert "JavaScript" not in found
+
+def test_version_follows_the_taxonomy():
+    assert matcher().version == matcher().version
+    assert SkillMatcher.from_list(SKILLS + ["Go | Golang"]).version != matcher().version
+
+def test_parse_skill_lines_skips_comments_and_blanks():
+    assert parse_skill_lines(["# header", "", " Python ", "JavaScript | JS | "]) == [
+        ("Python", []), ("JavaScript", ["JS"])]
@@ -0,0 +1,316 @@
+import os
+import re
+import logging
+import threading
+from collections import Counter, OrderedDict
+import numpy as np
+import scipy.sparse as sp
+from database import get_db_connection, transaction
+from embedding_store import text_hash
+
+logger = logging.getLogger(__name__)
+
+TFIDF_DIR = os.getenv("TFIDF_DIR", "tfidf")
+TFIDF_CORPUS = os.getenv("TFIDF_CORPUS", "resumes")
+# Small segments at the end of the corpus are merged into one once there are more than this many
+TFIDF_MERGE_SEGMENTS = int(os.getenv("TFIDF_MERGE_SEGMENTS", 8))
+# Segments with at least this many rows are not merged any further
+TFIDF_SEGMENT_ROWS = int(os.getenv("TFIDF_SEGMENT_ROWS", 20000))
+# Segment matrices kept in memory per process; others are read from disk when their rows are scored
+TFIDF_CACHED_SEGMENTS = int(os.getenv("TFIDF_CACHED_SEGMENTS", 4))
+
+def _df_file(file_name):
+    return file_name[:-len(".npz")] + ".df.npy"
+
+def _widen(matrix, width):
+    return sp.csr_matrix((matrix.data, matrix.indices, matrix.indptr), shape=(matrix.shape[0], width))
+
+class TfidfCorpus:
+    """TF-IDF statistics and term-count vectors for a growing document corpus
+
+    Documents are added once (deduplicated by text hash) as append-only
+    sparse segments on disk; vocabulary and document rows live in SQLite.
+    Each segment's document frequencies are stored next to it, so only
+    those are read at load time and segment matrices are read when their
+    rows are scored. Small segments are merged as they pile up.
+    Scoring a query is a transform plus two sparse mat-vec products.
+    """
+
+    def __init__(self, name=TFIDF_CORPUS, directory=TFIDF_DIR):
+        from sklearn.feature_extraction.text import TfidfVectorizer
+        self.name = name
+        self.directory = os.path.join(directory, re.sub(r'[^A-Za-z0-9_.-]', '_', name))
+        os.makedirs(self.directory, exist_ok=True)
+        self._analyze = TfidfVectorizer(stop_words='english').build_analyzer()
+        self._lock = threading.Lock()
+        self.vocabulary = {}
+        self.doc_rows = {}
+        self.df = np.zeros(0, dtype=np.int64)
+        self._segment_ids = []
+        self._segment_files = []
+        self._segment_starts = []
+        self._segment_rows = []
+        self._cache = OrderedDict()
+        self._frozen = None  # ((rows, terms), idf) of the last snapshot scored against
+        self._rows = 0
+        with get_db_connection() as conn:
+            self._refresh(conn)
+
+    def _refresh(self, conn):
+        """Pick up terms, documents and segments written by other processes"""
+        for row in conn.execute('''
+            SELECT term, column_index FROM tfidf_terms
+            WHERE corpus = ? AND column_index >= ? ORDER BY column_index
+        ''', (self.name, len(self.vocabulary))):
+            self.vocabulary[row['term']] = row['column_index']
+        for row in conn.execute('''
+            SELECT text_hash, row_index FROM tfidf_documents
+            WHERE corpus = ? AND row_index >= ?
+        ''', (self.name, self._rows)):
+            self.doc_rows[row['text_hash']] = row['row_index']
+        segments = conn.execute('''
+            SELECT segment_id, file_name, start_row, n_rows FROM tfidf_segments
+            WHERE corpus = ? ORDER BY segment_id
+        ''', (self.name,)).fetchall()
+        if [row['segment_id'] for row in segments[:len(self._segment_ids)]] != self._segment_ids:
+            # Another process merged segments this one had loaded
+            self.df = np.zeros(0, dtype=np.int64)
+            self._cache.clear()
+            for segment_list in (self._segment_ids, self._segment_files, self._segment_starts, self._segment_rows):
+                segment_list.clear()
+        for row in segments[len(self._segment_ids):]:
+            self._apply_segment(row['segment_id'], row['file_name'], row['start_row'], row['n_rows'])
+        if len(self.df) < len(self.vocabulary):
+            self.df = np.concatenate([self.df, np.zeros(len(self.vocabulary) - len(self.df), dtype=np.int64)])
+
+    def _apply_segment(self, segment_id, file_name, start_row, n_rows, df=None):
+        if df is None:
+            try:
+                df = np.load(os.path.join(self.directory, _df_file(file_name)))
+            except FileNotFoundError:
+                # Segments written before document frequencies were stored alongside them
+                segment = sp.load_npz(os.path.join(self.directory, file_name))
+                df = np.bincount(segment.tocsr().indices, minlength=segment.shape[1])
+        size = max(len(self.vocabulary), len(df))
+        if len(self.df) < size:
+            self.df = np.concatenate([self.df, np.zeros(size - len(self.df), dtype=np.int64)])
+        self.df[:len(df)] += df
+        self._append_segment(segment_id, file_name, start_row, n_rows)
+
+    def _append_segment(self, segment_id, file_name, start_row, n_rows):
+        self._segment_ids.append(segment_id)
+        self._segment_files.append(file_name)
+        self._segment_starts.append(start_row)
+        self._segment_rows.append(n_rows)
+        self._rows = start_row + n_rows
+
+    def _segment(self, i):
+        """Term-count matrix of the i-th segment, read from disk unless recently used"""
+        file_name = self._segment_files[i]
+        segment = self._cache.pop(file_name, None)
+        if segment is None:
+            segment = sp.load_npz(os.path.join(self.directory, file_name)).tocsr()
+        self._cache[file_name] = segment
+        while len(self._cache) > TFIDF_CACHED_SEGMENTS:
+            self._cache.popitem(last=False)
+        return segment
+
+    def _save_segment(self, file_name, segment, df):
+        sp.save_npz(os.path.join(self.directory, file_name), segment)
+        np.save(os.path.join(self.directory, _df_file(file_name)), df)
+
+    def _remove_segment_files(self, file_name):
+        for name in (file_name, _df_file(file_name)):
+            path = os.path.join(self.directory, name)
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _counts(self, text, vocabulary, new_terms=None):
+        """Term-count pairs (column, count); unseen terms are added to new_terms when given"""
+        pairs = []
+        for term, count in Counter(self._analyze(text)).items():
+            column = vocabulary.get(term)
+            if column is None and new_terms is not None:
+                column = new_terms.get(term)
+                if column is None:
+                    column = len(vocabulary) + len(new_terms)
+                    new_terms[term] = column
+            if column is not None:
+                pairs.append((column, count))
+        return pairs
+
+    def add_documents(self, texts):
+        """Add texts not already in the corpus; returns the row of every text"""
+        hashes = [text_hash(text) for text in texts]
+        with self._lock:
+            file_name = None
+            try:
+                # IMMEDIATE serializes row and column assignment across processes
+                with transaction() as conn:
+                    self._refresh(conn)
+                    new_docs = {}
+                    for h, text in zip(hashes, texts):
+                        if h not in self.doc_rows:
+                            new_docs.setdefault(h, text)
+                    if not new_docs:
+                        return [self.doc_rows[h] for h in hashes]
+
+                    new_terms = {}
+                    data, indices, indptr = [], [], [0]
+                    for text in new_docs.values():
+                        for column, count in self._counts(text, self.vocabulary, new_terms):
+                            indices.append(column)
+                            data.append(count)
+                        indptr.append(len(indices))
+                    width = len(self.vocabulary) + len(new_terms)
+                    segment = sp.csr_matrix((np.array(data, dtype=np.float32), indices, indptr),
+                                            shape=(len(new_docs), width))
+                    df = np.bincount(segment.indices, minlength=width)
+
+                    segment_id = self._segment_ids[-1] + 1 if self._segment_ids else 1
+                    file_name = f"segment-{segment_id:06d}.npz"
+                    self._save_segment(file_name, segment, df)
+                    conn.executemany('''
+                        INSERT INTO tfidf_terms (corpus, term, column_index) VALUES (?, ?, ?)
+                    ''', [(self.name, term, column) for term, column in new_terms.items()])
+                    conn.executemany('''
+                        INSERT INTO tfidf_documents (corpus, text_hash, row_index) VALUES (?, ?, ?)
+                    ''', [(self.name, h, self._rows + i) for i, h in enumerate(new_docs)])
+                    conn.execute('''
+                        INSERT INTO tfidf_segments (corpus, segment_id, file_name, start_row, n_rows)
+                        VALUES (?, ?, ?, ?, ?)
+                    ''', (self.name, segment_id, file_name, self._rows, len(new_docs)))
+            except Exception:
+                if file_name:
+                    self._remove_segment_files(file_name)
+                raise
+
+            self.vocabulary.update(new_terms)
+            for i, h in enumerate(new_docs):
+                self.doc_rows[h] = self._rows + i
+            self._apply_segment(segment_id, file_name, self._rows, len(new_docs), df)
+            self._cache[file_name] = segment
+            if len(self._segment_ids) - self._small_tail() > TFIDF_MERGE_SEGMENTS:
+                self._merge()
+            return [self.doc_rows[h] for h in hashes]
+
+    def _small_tail(self):
+        """Index of the first segment in the run of small segments at the end"""
+        first = len(self._segment_ids)
+        while first > 0 and self._segment_rows[first - 1] < TFIDF_SEGMENT_ROWS:
+            first -= 1
+        return first
+
+    def _merge(self):
+        """Merge the run of small segments at the end of the corpus into one segment
+
+        Replaced files are deleted by the next merge rather than this one,
+        so a process still reading them from before its next refresh does
+        not find them gone.
+        """
+        file_name = None
+        try:
+            with transaction() as conn:
+                self._refresh(conn)
+                first = self._small_tail()
+                if len(self._segment_ids) - first <= TFIDF_MERGE_SEGMENTS:
+                    return  # another process merged them first
+                referenced = {row['file_name'] for row in conn.execute(
+                    'SELECT file_name FROM tfidf_segments WHERE corpus = ?', (self.name,))}
+                for name in os.listdir(self.directory):
+                    if name.startswith("segment-") and name.split(".", 1)[0] + ".npz" not in referenced:
+                        os.remove(os.path.join(self.directory, name))
+
+                width = len(self.vocabulary)
+                merged = sp.vstack([_widen(self._segment(i), width)
+                                    for i in range(first, len(self._segment_ids))]).tocsr()
+                segment_id = self._segment_ids[-1] + 1
+                file_name = f"segment-{segment_id:06d}.npz"
+                self._save_segment(file_name, merged, np.bincount(merged.indices, minlength=width))
+                conn.execute('DELETE FROM tfidf_segments WHERE corpus = ? AND segment_id >= ?',
+                             (self.name, self._segment_ids[first]))
+                conn.execute('''
+                    INSERT INTO tfidf_segments (corpus, segment_id, file_name, start_row, n_rows)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', (self.name, segment_id, file_name, self._segment_starts[first], merged.shape[0]))
+        except Exception:
+            if file_name:
+                self._remove_segment_files(file_name)
+            raise
+
+        count = len(self._segment_ids) - first
+        start = self._segment_starts[first]
+        for name in self._segment_files[first:]:
+            self._cache.pop(name, None)
+        for segment_list in (self._segment_ids, self._segment_files, self._segment_starts, self._segment_rows):
+            del segment_list[first:]
+        # Document frequencies are unchanged by a merge
+        self._append_segment(segment_id, file_name, start, merged.shape[0])
+        self._cache[file_name] = merged
+        logger.info(f"Merged {count} TF-IDF segments into {file_name} ({merged.shape[0]} rows)")
+
+    def _select_rows(self, rows, width):
+        """Term-count matrix for the given corpus rows, in the given order"""
+        starts = np.array(self._segment_starts)
+        owners = np.searchsorted(starts, rows, side='right') - 1
+        parts, positions = [], []
+        for owner in np.unique(owners):
+            mask = owners == owner
+            part = self._segment(owner)[rows[mask] - starts[owner]]
+            parts.append(part[:, :width] if part.shape[1] > width else _widen(part, width))
+            positions.append(np.flatnonzero(mask))
+        stacked = sp.vstack(parts).tocsr()
+        return stacked[np.argsort(np.concatenate(positions))]
+
+    def snapshot(self):
+        """Corpus size as [rows, terms]; scoring with it as as_of keeps today's IDF"""
+        with self._lock:
+            with get_db_connection() as conn:
+                self._refresh(conn)
+            return [self._rows, len(self.vocabulary)]
+
+    def _idf_as_of(self, n_rows, width):
+        """IDF over the first n_rows documents and width terms, as at an earlier snapshot"""
+        if self._frozen is not None and self._frozen[0] == (n_rows, width):
+            return self._frozen[1]
+        if n_rows > self._rows or width > len(self.vocabulary):
+            raise ValueError(f"TF-IDF corpus '{self.name}' is smaller than the snapshot "
+                             f"({n_rows} rows, {width} terms) it is scored against")
+        df = np.zeros(width, dtype=np.int64)
+        for i, start in enumerate(self._segment_starts):
+            if start >= n_rows:
+                break
+            indices = self._segment(i)[:n_rows - start].indices
+            df += np.bincount(indices[indices < width], minlength=width)
+        idf = np.log((1 + n_rows) / (1 + df)) + 1
+        self._frozen = ((n_rows, width), idf)
+        return idf
+
+    def score(self, query, rows, as_of=None):
+        """Cosine similarity between the query and each corpus row
+
+        IDF is the current one, or the one at an earlier snapshot() when
+        as_of is given, so scores do not drift as documents are added.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        if len(rows) == 0:
+            return np.zeros(0)
+        with self._lock:
+            if as_of is None:
+                width = len(self.vocabulary)
+                idf = np.log((1 + self._rows) / (1 + self.df[:width])) + 1
+            else:
+                width = as_of[1]
+                idf = self._idf_as_of(*as_of)
+            matrix = self._select_rows(rows, width)
+            pairs = [(column, count) for column, count in self._counts(query, self.vocabulary) if column < width]
+
+        query_counts = np.zeros(width)
+        for column, count in pairs:
+            query_counts[column] = count
+        idf_sq = idf ** 2
+        dots = matrix @ (query_counts * idf_sq)
+        doc_norms = np.sqrt(matrix.power(2) @ idf_sq)
+        query_norm = np.sqrt((query_counts ** 2) @ idf_sq)
+        denom = doc_norms * query_norm
+        return np.divide(dots, denom, out=np.zeros_like(dots), where=denom > 0)
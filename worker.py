@@ -0,0 +1,183 @@
+import os
+import sys
+import time
+import socket
+import logging
+import argparse
+import threading
+
+# Add current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import metrics
+import scheduler
+from database import init_db
+from models import User, Job, Analysis, AnalysisQueue, ParseCache
+from archive_ingest import ARCHIVE_KINDS, count_members, parse_archive
+from resume_parser import parse_resumes
+from similarity import analyze_resumes_iter, analyze_multi, STREAM_BATCH_SIZE
+from skill_matcher import get_skill_matcher
+from talent_pool import add_to_talent_pool, save_talent_pool
+
+logger = logging.getLogger(__name__)
+
+SKILLS_DB_PATH = os.getenv("SKILLS_DB_PATH", "skills_db.txt")
+WORKER_POLL_SECONDS = float(os.getenv("WORKER_POLL_SECONDS", 1.0))
+# A running job without a heartbeat for this long is assumed abandoned and re-queued
+WORKER_STALE_SECONDS = float(os.getenv("WORKER_STALE_SECONDS", 60))
+WORKER_MAX_ATTEMPTS = int(os.getenv("WORKER_MAX_ATTEMPTS", 3))
+
+def _heartbeat(queue_id, stop):
+    while not stop.wait(WORKER_STALE_SECONDS / 3):
+        AnalysisQueue.update(queue_id)
+
+def _note_problems(parsed, unreadable, degraded):
+    for data in parsed:
+        if data.get('degraded'):
+            degraded.append({"file_name": data['file_name'], "scored": not data.get('error'), **data['degraded']})
+        elif data.get('error'):
+            unreadable.append(data['file_name'])
+
+def run_multi_job(queued):
+    """Parse the candidate pool of a multi-role job and match it against every role"""
+    queue_id = queued['id']
+    jobs = [Job.get(job_id) for job_id in queued['roles']]
+    user = User.get_by_id(queued['user_id'])
+    total = AnalysisQueue.count_files(queue_id)
+    details = {"unreadable_files": [], "degraded_files": []}
+    readable = []
+
+    with metrics.trace() as trace, scheduler.priority(user.subscription_level if user else None):
+        AnalysisQueue.update(queue_id, stage="parsing", progress=0.05)
+        parsed_count = 0
+        for files in AnalysisQueue.iter_files(queue_id, STREAM_BATCH_SIZE):
+            parsed = parse_resumes(files, cache=ParseCache)
+            _note_problems(parsed, details['unreadable_files'], details['degraded_files'])
+            # Files without text are reported, not scored as 0
+            readable.extend(data for data in parsed if not data.get('error'))
+            parsed_count += len(files)
+            AnalysisQueue.update(queue_id, progress=0.05 + 0.45 * parsed_count / max(total, 1), details=details)
+
+        AnalysisQueue.update(queue_id, stage="scoring", progress=0.5)
+        details['multi_result'] = analyze_multi(
+            [job['job_description'] for job in jobs], readable, get_skill_matcher(SKILLS_DB_PATH),
+            titles=[job['job_title'] for job in jobs])
+        details['performance'] = trace.summary()
+        AnalysisQueue.update(queue_id, stage="saving", progress=0.95, details=details)
+    AnalysisQueue.complete(queue_id, None)
+
+def run_job(queued):
+    """Parse, score and store one queued analysis, publishing partial results"""
+    if queued['roles']:
+        return run_multi_job(queued)
+    queue_id = queued['id']
+    job = Job.get(queued['job_id'])
+    user = User.get_by_id(queued['user_id'])
+    company = user.company if user else None
+    # The same inputs may have been analyzed since this job was queued
+    if queued['fingerprint']:
+        stored = Analysis.find_by_fingerprint(queued['fingerprint'], queued['user_id'], company)
+        analysis_id = Analysis.copy(stored['id'], queued['user_id'], queued['job_id']) if stored else None
+        if analysis_id:
+            AnalysisQueue.update(queue_id, details={"reused": True})
+            AnalysisQueue.complete(queue_id, analysis_id)
+            return analysis_id
+    total = AnalysisQueue.count_files(queue_id)
+    unreadable = []
+    degraded = []
+    skipped = []
+    # The lists fill in as files are parsed; every update publishes them as they stand
+    details = {"unreadable_files": unreadable, "degraded_files": degraded, "skipped_files": skipped}
+    batch_parsed = []
+
+    def parsed_batches():
+        nonlocal total
+        for files in AnalysisQueue.iter_files(queue_id, STREAM_BATCH_SIZE):
+            resumes = [f for f in files if f[2] not in ARCHIVE_KINDS]
+            if resumes:
+                yield parse_resumes(resumes, cache=ParseCache)
+            for file_name, data, kind in files:
+                if kind in ARCHIVE_KINDS:
+                    # Members are parsed as they are decompressed, never extracted to disk
+                    total += count_members(data, kind) - 1
+                    yield from parse_archive(file_name, data, kind, skipped, STREAM_BATCH_SIZE, cache=ParseCache)
+
+    def parsed_resumes():
+        # Files are read and parsed one micro-batch at a time as scoring asks for them
+        for parsed in parsed_batches():
+            _note_problems(parsed, unreadable, degraded)
+            # Files without text are reported, not scored as 0
+            readable = [data for data in parsed if not data.get('error')]
+            batch_parsed.extend(readable)
+            yield from readable
+
+    # Every stage timed on this thread while the job runs lands in the job's trace
+    with metrics.trace() as trace, scheduler.priority(user.subscription_level if user else None):
+        AnalysisQueue.update(queue_id, stage="parsing", progress=0.05)
+        results = []
+        summary = {"total_resumes": 0, "average_score": 0.0, "top_missing_skills": []}
+        updates = analyze_resumes_iter(job['job_description'], parsed_resumes(),
+                                       get_skill_matcher(SKILLS_DB_PATH), batch_size=STREAM_BATCH_SIZE)
+        for update in updates:
+            results.extend(update['results'])
+            summary = update['summary']
+            add_to_talent_pool(queued['user_id'], company, batch_parsed)
+            batch_parsed.clear()
+
+            details['leaderboard'] = [
+                {"candidate_name": r['candidate_name'], "file_name": r['file_name'], "score": r['score']}
+                for r in update['top']
+            ]
+            details['summary'] = summary
+            details['performance'] = trace.summary()
+            AnalysisQueue.update(queue_id, stage="scoring",
+                                 progress=0.05 + 0.85 * update['processed'] / max(total, 1), details=details)
+
+        AnalysisQueue.update(queue_id, stage="saving", progress=0.95)
+        save_talent_pool()
+        results.sort(key=lambda x: x['score'], reverse=True)
+        analysis_id = Analysis.save_results(queued['user_id'], queued['job_id'], results, summary,
+                                           fingerprint=queued['fingerprint'])
+        details['performance'] = trace.summary()
+        AnalysisQueue.update(queue_id, details=details)
+    AnalysisQueue.complete(queue_id, analysis_id)
+    return analysis_id
+
+def work(worker_name, once=False):
+    """Claim and run jobs until stopped; with once, exit when the queue is empty"""
+    while True:
+        queued = AnalysisQueue.claim(worker_name, WORKER_STALE_SECONDS, WORKER_MAX_ATTEMPTS)
+        if queued is None:
+            if once:
+                return
+            time.sleep(WORKER_POLL_SECONDS)
+            continue
+
+        logger.info(f"Running analysis job {queued['id']} (attempt {queued['attempts']})")
+        stop = threading.Event()
+        beat = threading.Thread(target=_heartbeat, args=(queued['id'], stop), daemon=True)
+        beat.start()
+        try:
+            run_job(queued)
+        except Exception as e:
+            logger.exception(f"Analysis job {queued['id']} failed")
+            AnalysisQueue.fail(queued['id'], str(e))
+        finally:
+            stop.set()
+            beat.join()
+        try:
+            metrics.write_prometheus()
+        except OSError as e:
+            logger.error(f"Error writing metrics file: {str(e)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Run queued resume analyses")
+    parser.add_argument("--once", action="store_true", help="exit when the queue is empty")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    init_db()
+    work(f"{socket.gethostname()}:{os.getpid()}", once=args.once)
+
+if __name__ == "__main__":
+    main()